@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from badges.models import UserContribution, UserContributionStats
+from datetime import datetime
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user contribution stats from the raw contribution records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of users written per bulk write')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started_at = datetime.utcnow()
+        stats_collection = UserContributionStats._get_collection()
+
+        # Results arrive sorted by user so each user's totals can be flushed
+        # as soon as the next user starts, without holding everything in memory
+        pipeline = [
+            {'$group': {
+                '_id': {'user': '$user', 'type': '$contribution_type'},
+                'count': {'$sum': 1},
+                'points': {'$sum': '$points_earned'}
+            }},
+            {'$sort': {'_id.user': 1}}
+        ]
+        rows = UserContribution._get_collection().aggregate(pipeline, allowDiskUse=True)
+
+        operations = []
+        users_written = 0
+        current_user = None
+        current = None
+
+        def flush_user():
+            operations.append(UpdateOne(
+                {'_id': current_user},
+                {'$set': {
+                    'total_points': current['total_points'],
+                    'contribution_counts': current['contribution_counts'],
+                    'contribution_points': current['contribution_points'],
+                    'updated_at': datetime.utcnow()
+                }},
+                upsert=True
+            ))
+
+        for row in rows:
+            user_id = row['_id']['user']
+            if user_id != current_user:
+                if current_user is not None:
+                    flush_user()
+                    users_written += 1
+                current_user = user_id
+                current = {'total_points': 0, 'contribution_counts': {}, 'contribution_points': {}}
+            contribution_type = row['_id']['type']
+            points = int(row['points'] or 0)
+            current['total_points'] += points
+            current['contribution_counts'][contribution_type] = row['count']
+            current['contribution_points'][contribution_type] = points
+
+            if len(operations) >= batch_size:
+                stats_collection.bulk_write(operations, ordered=False)
+                operations = []
+
+        if current_user is not None:
+            flush_user()
+            users_written += 1
+        if operations:
+            stats_collection.bulk_write(operations, ordered=False)
+
+        # Anything not touched by this run belongs to users without contributions
+        removed = stats_collection.delete_many({'updated_at': {'$lt': started_at}}).deleted_count
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt contribution stats for {users_written} users. '
+                f'Removed {removed} stale entries.'
+            )
+        )
@@ -1,5 +1,6 @@
-from mongoengine import Document, StringField, DateTimeField, ReferenceField, IntField, ListField
+from mongoengine import Document, StringField, DateTimeField, ReferenceField, IntField, ListField, DictField
 from users.models import User
+from utils.helpers import reference_id
 import uuid
 from datetime import datetime
 
@@ -28,7 +29,16 @@ class Badge(Document):
     def save(self, *args, **kwargs):
         if not self.id:
             self.id = str(uuid.uuid4())
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        from badges.services.badge_engine import invalidate_badge_catalog
+        invalidate_badge_catalog()
+        return result
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from badges.services.badge_engine import invalidate_badge_catalog
+        invalidate_badge_catalog()
+        return result
 
 class UserBadge(Document):
     id = StringField(primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -39,7 +49,9 @@ class UserBadge(Document):
     meta = {
         'collection': 'user_badges',
         'indexes': [
-            'user',
+            # Concurrent evaluations of the same user can both try to award a
+            # badge; the unique index lets only one of them in
+            {'fields': ['user', 'badge'], 'unique': True},
             'badge',
             'assigned_at'
         ]
@@ -77,14 +89,61 @@ class UserContribution(Document):
     def save(self, *args, **kwargs):
         if not self.id:
             self.id = str(uuid.uuid4())
-        return super().save(*args, **kwargs)
+        is_new = self._created
+        result = super().save(*args, **kwargs)
+        if is_new:
+            UserContributionStats.record(reference_id(self, 'user'), self.contribution_type, self.points_earned)
+        return result
     
     @classmethod
     def get_user_points(cls, user_id):
-        contributions = cls.objects(user=user_id)
-        return sum(cont.points_earned for cont in contributions)
+        return UserContributionStats.for_user(user_id).total_points
     
     @classmethod
     def check_badge_eligibility(cls, user_id, badge):
         user_points = cls.get_user_points(user_id)
         return user_points >= badge.points_required
+
+class UserContributionStats(Document):
+    """Per-user contribution totals, kept up to date with $inc as contributions are recorded"""
+    id = StringField(primary_key=True)  # The user's id
+    total_points = IntField(default=0)
+    contribution_counts = DictField()  # contribution_type -> number of contributions
+    contribution_points = DictField()  # contribution_type -> points earned
+    updated_at = DateTimeField(default=datetime.utcnow)
+    
+    meta = {
+        'collection': 'user_contribution_stats'
+    }
+    
+    def __str__(self):
+        return f"Stats for {self.id}"
+    
+    def count_for(self, contribution_type):
+        return self.contribution_counts.get(contribution_type, 0)
+    
+    def points_for(self, contribution_type):
+        return self.contribution_points.get(contribution_type, 0)
+    
+    @classmethod
+    def record(cls, user_id, contribution_type, points):
+        """Fold one new contribution into the user's totals"""
+        points = int(points or 0)
+        cls._get_collection().update_one(
+            {'_id': str(user_id)},
+            {
+                '$inc': {
+                    'total_points': points,
+                    f'contribution_counts.{contribution_type}': 1,
+                    f'contribution_points.{contribution_type}': points
+                },
+                '$set': {'updated_at': datetime.utcnow()}
+            },
+            upsert=True
+        )
+    
+    @classmethod
+    def for_user(cls, user_id):
+        """Return the user's stats, or an empty set of stats if they have none yet"""
+        return cls.objects(id=str(user_id)).first() or cls(id=str(user_id))
+
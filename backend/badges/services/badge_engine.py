@@ -0,0 +1,93 @@
+from pymongo.errors import BulkWriteError
+from badges.models import Badge, UserBadge, UserContributionStats
+from utils.cache import TTLCache
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+BADGE_CATALOG_TTL = 300
+DUPLICATE_KEY_ERROR = 11000
+
+# Contribution thresholds for badges, keyed by badge slug ("Pet Guardian" -> "pet-guardian").
+# Each rule is an alternative way to earn the badge on top of its points_required;
+# a rule matches when all of its thresholds are met.
+CONTRIBUTION_RULES = {
+    'pet-guardian': [{'counts': {'adoption': 1}}],
+    'super-helper': [{'counts': {'adoption': 5}}],
+    'generous-donor': [{'points': {'donation': 500}}],
+    'item-supporter': [{'counts': {'item_donation': 10}}],
+    'community-leader': [{'counts': {'blog_post': 5}}],
+}
+
+_catalog_cache = TTLCache(maxsize=1, ttl=BADGE_CATALOG_TTL)
+
+def badge_slug(name):
+    return '-'.join((name or '').lower().split())
+
+def build_badge_rules(badge):
+    """Compile a badge's thresholds into a list of declarative rules"""
+    rules = list(CONTRIBUTION_RULES.get(badge_slug(badge.name), []))
+    if badge.points_required:
+        rules.append({'total_points': badge.points_required})
+    return rules
+
+def get_badge_catalog():
+    """Return every badge with its compiled rules, loaded once per process and TTL"""
+    catalog = _catalog_cache.get('catalog')
+    if catalog is None:
+        catalog = [(badge, build_badge_rules(badge)) for badge in Badge.objects.all()]
+        _catalog_cache.set('catalog', catalog)
+    return catalog
+
+def invalidate_badge_catalog():
+    _catalog_cache.clear()
+
+def rule_matches(rule, stats):
+    if stats.total_points < rule.get('total_points', 0):
+        return False
+    for contribution_type, required in rule.get('counts', {}).items():
+        if stats.count_for(contribution_type) < required:
+            return False
+    for contribution_type, required in rule.get('points', {}).items():
+        if stats.points_for(contribution_type) < required:
+            return False
+    return True
+
+def award_eligible_badges(user, stats=None):
+    """Evaluate every badge for a user in one pass and bulk insert the new ones.
+
+    Costs one read for the stats (unless given), one distinct() for the badges
+    the user already holds and at most one insert, whatever the catalog size.
+    """
+    if stats is None:
+        stats = UserContributionStats.for_user(user.id)
+    owned = set(UserBadge._get_collection().distinct('badge', {'user': str(user.id)}))
+
+    new_badges = []
+    for badge, rules in get_badge_catalog():
+        if badge.id in owned or not rules:
+            continue
+        if any(rule_matches(rule, stats) for rule in rules):
+            new_badges.append(UserBadge(user=user, badge=badge))
+
+    if new_badges:
+        new_badges = insert_user_badges(new_badges)
+    if new_badges:
+        logger.info("Auto-assigned badges %s to user %s", [ub.badge.name for ub in new_badges], user.username)
+    return new_badges
+
+def insert_user_badges(user_badges):
+    """Insert UserBadge rows in one unordered write, returning those not already held.
+
+    Another worker evaluating the same user may have inserted some of them
+    first; the unique (user, badge) index rejects those and they are skipped.
+    """
+    try:
+        UserBadge._get_collection().insert_many([user_badge.to_mongo() for user_badge in user_badges], ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(error.get('code') != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+        duplicates = {error['index'] for error in errors}
+        return [user_badge for index, user_badge in enumerate(user_badges) if index not in duplicates]
+    return user_badges
@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.utils.module_loading import import_string
+from pymongo import ASCENDING
+from badges.models import UserContributionStats
+from badges.services.badge_engine import award_eligible_badges
+from users.models import User
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+class LocalQueueBackend:
+    """In-memory queue of users awaiting badge evaluation, one entry per user"""
+
+    def __init__(self):
+        self._pending = OrderedDict()  # user_id -> enqueued_at
+        self._condition = threading.Condition()
+
+    def enqueue(self, user_id):
+        with self._condition:
+            # A user already waiting keeps their original position and timestamp,
+            # so a burst of contributions collapses into one evaluation
+            if user_id not in self._pending:
+                self._pending[user_id] = time.time()
+                self._condition.notify()
+
+    def dequeue(self, timeout=None):
+        """Return (user_id, enqueued_at) for the oldest pending user, or None on timeout"""
+        with self._condition:
+            if not self._pending and not self._condition.wait_for(lambda: self._pending, timeout):
+                return None
+            return self._pending.popitem(last=False)
+
+    def depth(self):
+        with self._condition:
+            return len(self._pending)
+
+    def oldest_enqueued_at(self):
+        with self._condition:
+            return next(iter(self._pending.values()), None)
+
+class MongoQueueBackend:
+    """Queue shared by every worker process, stored in the pending_badge_evaluations collection"""
+
+    poll_interval = 0.5
+
+    def __init__(self):
+        self.collection = UserContributionStats._get_db()['pending_badge_evaluations']
+        self.collection.create_index([('enqueued_at', ASCENDING)])
+
+    def enqueue(self, user_id):
+        # The user id is the document id, so repeated enqueues coalesce on upsert
+        self.collection.update_one(
+            {'_id': user_id},
+            {'$setOnInsert': {'enqueued_at': time.time()}},
+            upsert=True
+        )
+
+    def dequeue(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            entry = self.collection.find_one_and_delete({}, sort=[('enqueued_at', ASCENDING)])
+            if entry:
+                return entry['_id'], entry['enqueued_at']
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def depth(self):
+        return self.collection.estimated_document_count()
+
+    def oldest_enqueued_at(self):
+        entry = self.collection.find_one({}, sort=[('enqueued_at', ASCENDING)])
+        return entry['enqueued_at'] if entry else None
+
+class BadgeEvaluationQueue:
+    """Evaluates badges for queued users on a pool of background worker threads"""
+
+    def __init__(self, backend, workers=2):
+        self.backend = backend
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def enqueue(self, user_id):
+        self.backend.enqueue(str(user_id))
+        self._ensure_workers()
+
+    def _ensure_workers(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f'badge-worker-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            entry = self.backend.dequeue(timeout=5)
+            if entry:
+                self.evaluate(*entry)
+
+    def evaluate(self, user_id, enqueued_at):
+        lag = max(time.time() - enqueued_at, 0.0)
+        failed = False
+        try:
+            award_eligible_badges(User.objects.get(id=user_id))
+        except User.DoesNotExist:
+            pass  # Deleted since it was queued; nothing to award
+        except Exception:
+            logger.exception("Error evaluating badges for user %s", user_id)
+            failed = True
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.processed += 1
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def process_pending(self):
+        """Evaluate everything queued right now on the calling thread instead of waiting for the workers"""
+        while True:
+            entry = self.backend.dequeue(timeout=0)
+            if not entry:
+                return
+            self.evaluate(*entry)
+
+    def metrics(self):
+        oldest = self.backend.oldest_enqueued_at()
+        with self._lock:
+            return {
+                'depth': self.backend.depth(),
+                'oldest_pending_seconds': round(time.time() - oldest, 3) if oldest else 0.0,
+                'last_lag_seconds': round(self.last_lag, 3),
+                'max_lag_seconds': round(self.max_lag, 3),
+                'processed': self.processed,
+                'failed': self.failed,
+                'workers': len(self._threads),
+            }
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_badge_queue():
+    """Return the process-wide queue, built from BADGE_QUEUE_BACKEND on first use"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                backend_class = import_string(getattr(settings, 'BADGE_QUEUE_BACKEND', 'badges.services.badge_queue.LocalQueueBackend'))
+                _queue = BadgeEvaluationQueue(backend_class(), workers=getattr(settings, 'BADGE_QUEUE_WORKERS', 2))
+    return _queue
+
+def enqueue_badge_evaluation(user_id):
+    """Schedule a badge evaluation for a user; returns immediately"""
+    get_badge_queue().enqueue(user_id)
@@ -1,3 +1,114 @@
-from django.test import TestCase
+from badges.models import Badge, UserBadge, UserContribution, UserContributionStats
+from badges.services.badge_engine import award_eligible_badges, insert_user_badges
+from badges.services.badge_queue import get_badge_queue
+from badges.views.badge_views import record_contribution
+from utils.benchmark import best_time
+from utils.testing import MongoTestCase, count_queries
 
-# Create your tests here.
+def per_badge_awards(user):
+    """The evaluation award_eligible_badges replaced: one lookup per badge in the catalog"""
+    points = UserContribution.get_user_points(user.id)
+    for badge in Badge.objects.all():
+        if UserBadge.objects(user=user, badge=badge).first():
+            continue
+        if badge.points_required and points >= badge.points_required:
+            UserBadge(user=user, badge=badge).save()
+
+class BadgeAwardTests(MongoTestCase):
+    """Badges are awarded from the user's contribution stats in one pass over the catalog"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('alice')
+
+    def contribute(self, contribution_type, points=0, times=1):
+        for index in range(times):
+            UserContribution(user=self.user, contribution_type=contribution_type, contribution_id=f'{contribution_type}-{index}', points_earned=points).save()
+
+    def held_badges(self):
+        return sorted(user_badge.badge.name for user_badge in UserBadge.objects(user=self.user))
+
+    def test_points_and_contribution_rules_award_matching_badges(self):
+        for name, points in (('Pet Guardian', 0), ('Generous Donor', 0), ('Super Helper', 0), ('Centurion', 100), ('Legend', 1000)):
+            Badge(name=name, points_required=points).save()
+        self.contribute('adoption', points=20)
+        self.contribute('donation', points=300, times=2)
+
+        awarded = award_eligible_badges(self.user)
+
+        self.assertEqual(sorted(user_badge.badge.name for user_badge in awarded), ['Centurion', 'Generous Donor', 'Pet Guardian'])
+        self.assertEqual(self.held_badges(), ['Centurion', 'Generous Donor', 'Pet Guardian'])
+
+    def test_evaluating_again_awards_nothing_new(self):
+        Badge(name='Pet Guardian').save()
+        self.contribute('adoption')
+        self.assertEqual(len(award_eligible_badges(self.user)), 1)
+        self.assertEqual(award_eligible_badges(self.user), [])
+        self.assertEqual(UserBadge.objects(user=self.user).count(), 1)
+
+    def test_badges_without_rules_are_never_awarded(self):
+        Badge(name='Hand Picked').save()
+        self.contribute('volunteer', points=50)
+        self.assertEqual(award_eligible_badges(self.user), [])
+
+    def test_badges_already_inserted_by_another_worker_are_skipped(self):
+        first, second = Badge(name='First', points_required=1), Badge(name='Second', points_required=1)
+        first.save()
+        second.save()
+        UserBadge(user=self.user, badge=first).save()
+
+        inserted = insert_user_badges([UserBadge(user=self.user, badge=first), UserBadge(user=self.user, badge=second)])
+
+        self.assertEqual([user_badge.badge.name for user_badge in inserted], ['Second'])
+        self.assertEqual(self.held_badges(), ['First', 'Second'])
+
+    def test_query_count_does_not_grow_with_the_catalog(self):
+        counts = {}
+        for size in (10, 150):
+            for index in range(size - Badge.objects.count()):
+                Badge(name=f'Badge {size}-{index}', points_required=10_000).save()
+            award_eligible_badges(self.user)  # Loads the catalog
+            with count_queries() as queries:
+                award_eligible_badges(self.user)
+            counts[size] = queries['count']
+        self.assertEqual(counts[10], counts[150], counts)
+        # The stats and the badges the user already holds
+        self.assertLessEqual(counts[150], 2, counts)
+
+    def test_one_pass_beats_the_per_badge_loop_on_a_large_catalog(self):
+        for index in range(120):
+            Badge(name=f'Badge {index}', points_required=10_000).save()
+        self.contribute('donation', points=10)
+        award_eligible_badges(self.user)
+
+        with count_queries() as loop_queries:
+            per_badge_awards(self.user)
+        with count_queries() as pass_queries:
+            award_eligible_badges(self.user)
+        self.assertGreater(loop_queries['count'], 120)
+        self.assertLessEqual(pass_queries['count'], 2)
+
+        loop = best_time(lambda: per_badge_awards(self.user), repeat=3)
+        one_pass = best_time(lambda: award_eligible_badges(self.user), repeat=3)
+        self.assertLess(one_pass * 5, loop, f'one pass {one_pass * 1e3:.2f} ms, per badge {loop * 1e3:.2f} ms')
+
+class BadgeQueueTests(MongoTestCase):
+    """Recording a contribution queues one evaluation that awards the badge when processed"""
+
+    def test_contributions_are_evaluated_once_per_user_when_processed(self):
+        Badge(name='Community Leader').save()
+        user = self.make_user('bob')
+        headers = self.auth(user)
+        for index in range(5):
+            request = self.factory.post('/api/badges/contributions/', {'contribution_type': 'blog_post', 'contribution_id': f'blog-{index}', 'points_earned': 5}, format='json', **headers)
+            self.assertEqual(record_contribution(request).status_code, 200)
+
+        queue = get_badge_queue()
+        self.assertEqual(queue.metrics()['depth'], 1)
+        self.assertEqual(UserBadge.objects(user=user).count(), 0)
+
+        queue.process_pending()
+
+        self.assertEqual(queue.metrics()['processed'], 1)
+        self.assertEqual(UserContributionStats.for_user(user.id).total_points, 25)
+        self.assertEqual([user_badge.badge.name for user_badge in UserBadge.objects(user=user)], ['Community Leader'])
@@ -6,7 +6,8 @@ from badges.views.badge_views import (
     get_user_badges_public,
     assign_badge,
     record_contribution,
-    get_user_stats
+    get_user_stats,
+    get_badge_queue_metrics
 )
 
 urlpatterns = [
@@ -17,4 +18,5 @@ urlpatterns = [
     path('assign/', assign_badge, name='assign_badge'),
     path('contribution/', record_contribution, name='record_contribution'),
     path('stats/', get_user_stats, name='get_user_stats'),
+    path('queue/metrics/', get_badge_queue_metrics, name='get_badge_queue_metrics'),
 ]
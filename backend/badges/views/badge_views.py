@@ -2,10 +2,13 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from badges.models import Badge, UserBadge, UserContribution
+from mongoengine.errors import NotUniqueError
+from badges.models import Badge, UserBadge, UserContribution, UserContributionStats
+from badges.services.badge_queue import enqueue_badge_evaluation, get_badge_queue
 from badges.serializers.badge_serializer import BadgeSerializer, UserBadgeSerializer
 from users.models import User
 from utils.jwt_auth import get_user_from_token
+from utils.etag import make_etag, conditional_response
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -14,18 +17,21 @@ def get_badges(request):
         category = request.GET.get('category')
         limit = int(request.GET.get('limit', 50))
         
-        query = Badge.objects
-        if category:
-            query = query.filter(category=category)
-        
-        badges = query.order_by('name').limit(limit)
-        serializer = BadgeSerializer(badges, many=True)
-        
-        return Response({
-            'data': serializer.data,
-            'total': len(serializer.data),
-            'success': True
-        })
+        query = {'category': category} if category else {}
+        documents = list(Badge._get_collection().find(query).sort('name', 1).limit(limit))
+        # Badges carry no updated_at, so the ETag hashes their stored content;
+        # the same documents are reused to build the body when it changed
+        etag = make_etag(documents)
+        
+        def build_response():
+            serializer = BadgeSerializer([Badge._from_son(document) for document in documents], many=True)
+            return Response({
+                'data': serializer.data,
+                'total': len(serializer.data),
+                'success': True
+            })
+        
+        return conditional_response(request, etag, build_response)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -108,7 +114,11 @@ def assign_badge(request):
         
         # Assign badge
         user_badge = UserBadge(user=target_user, badge=badge)
-        user_badge.save()
+        try:
+            user_badge.save()
+        except NotUniqueError:
+            # A background evaluation awarded it since the check above
+            return Response({'error': 'User already has this badge'}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'data': UserBadgeSerializer(user_badge).data,
@@ -144,8 +154,8 @@ def record_contribution(request):
         )
         contribution.save()
         
-        # Check for badge eligibility
-        check_badge_eligibility(user.id)
+        # Badge eligibility is evaluated in the background
+        enqueue_badge_evaluation(user.id)
         
         return Response({
             'data': {
@@ -159,81 +169,6 @@ def record_contribution(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-def check_badge_eligibility(user_id):
-    """Check if user is eligible for any new badges based on their contributions"""
-    try:
-        user = User.objects.get(id=user_id)
-        user_points = UserContribution.get_user_points(user_id)
-        
-        # Get all badges
-        all_badges = Badge.objects.all()
-        
-        for badge in all_badges:
-            # Check if user already has this badge
-            existing_badge = UserBadge.objects(user=user, badge=badge).first()
-            if existing_badge:
-                continue
-            
-            # Check if user meets criteria
-            if badge.points_required and user_points >= badge.points_required:
-                # Auto-assign badge
-                user_badge = UserBadge(user=user, badge=badge)
-                user_badge.save()
-                print(f"Auto-assigned badge '{badge.name}' to user {user.username}")
-        
-        # Check specific contribution-based badges
-        check_contribution_badges(user_id)
-        
-    except Exception as e:
-        print(f"Error checking badge eligibility: {e}")
-
-def check_contribution_badges(user_id):
-    """Check for badges based on specific contribution types"""
-    try:
-        user = User.objects.get(id=user_id)
-        
-        # Check adoption badges
-        adoption_count = UserContribution.objects(user=user, contribution_type='adoption').count()
-        if adoption_count >= 1:
-            assign_badge_if_eligible(user, 'pet-guardian')
-        if adoption_count >= 5:
-            assign_badge_if_eligible(user, 'super-helper')
-        
-        # Check donation badges
-        donation_contributions = UserContribution.objects(user=user, contribution_type='donation')
-        total_donation_points = sum(c.points_earned for c in donation_contributions)
-        if total_donation_points >= 500:
-            assign_badge_if_eligible(user, 'generous-donor')
-        
-        # Check item donation badges
-        item_count = UserContribution.objects(user=user, contribution_type='item_donation').count()
-        if item_count >= 10:
-            assign_badge_if_eligible(user, 'item-supporter')
-        
-        # Check community badges
-        blog_count = UserContribution.objects(user=user, contribution_type='blog_post').count()
-        if blog_count >= 5:
-            assign_badge_if_eligible(user, 'community-leader')
-        
-    except Exception as e:
-        print(f"Error checking contribution badges: {e}")
-
-def assign_badge_if_eligible(user, badge_name):
-    """Assign a badge to a user if they don't already have it"""
-    try:
-        badge = Badge.objects.get(name__icontains=badge_name)
-        existing_badge = UserBadge.objects(user=user, badge=badge).first()
-        
-        if not existing_badge:
-            user_badge = UserBadge(user=user, badge=badge)
-            user_badge.save()
-            print(f"Auto-assigned badge '{badge.name}' to user {user.username}")
-            
-    except Badge.DoesNotExist:
-        pass
-    except Exception as e:
-        print(f"Error assigning badge: {e}")
-
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def record_contribution(request):
@@ -261,8 +196,8 @@ def record_contribution(request):
         )
         contribution.save()
         
-        # Check for badge eligibility
-        check_badge_eligibility(str(user.id))
+        # Badge eligibility is evaluated in the background
+        enqueue_badge_evaluation(user.id)
         
         return Response({
             'data': {
@@ -283,18 +218,17 @@ def get_user_stats(request):
         if not user:
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        total_points = UserContribution.get_user_points(user.id)
+        stats = UserContributionStats.for_user(user.id)
         badge_count = UserBadge.objects(user=user).count()
         
         # Get contribution counts by type
         contribution_stats = {}
         for contribution_type in ['adoption', 'donation', 'item_donation', 'blog_post', 'volunteer']:
-            count = UserContribution.objects(user=user, contribution_type=contribution_type).count()
-            contribution_stats[contribution_type] = count
+            contribution_stats[contribution_type] = stats.count_for(contribution_type)
         
         return Response({
             'data': {
-                'total_points': total_points,
+                'total_points': stats.total_points,
                 'badge_count': badge_count,
                 'contribution_stats': contribution_stats
             },
@@ -302,3 +236,16 @@ def get_user_stats(request):
         })
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_badge_queue_metrics(request):
+    """Queue depth and lag of the background badge evaluation workers"""
+    user = get_user_from_token(request)
+    if not user or not user.is_staff:
+        return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+    
+    return Response({
+        'data': get_badge_queue().metrics(),
+        'success': True
+    })
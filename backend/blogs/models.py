@@ -20,7 +20,7 @@ class Blog(Document):
             'title',
             'author',
             'published_at',
-            'created_at'
+            ('-created_at', '-id')
         ]
     }
     
@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from blogs.models import Blog
-from users.serializers.user_serializer import UserSerializer
+from users.serializers.user_serializer import UserSerializer, UserCardSerializer
+from utils.fieldsets import SparseFieldsetMixin
 
-class BlogSerializer(serializers.Serializer):
+class BlogSerializer(SparseFieldsetMixin, serializers.Serializer):
     id = serializers.CharField(read_only=True)
     title = serializers.CharField(read_only=True)
     content = serializers.CharField(read_only=True)
@@ -13,6 +14,11 @@ class BlogSerializer(serializers.Serializer):
     created_at = serializers.DateTimeField(read_only=True)
     updated_at = serializers.DateTimeField(read_only=True)
 
+class BlogCardSerializer(BlogSerializer):
+    """Slim blog representation for list cards"""
+    author = UserCardSerializer(read_only=True)
+    default_fields = ('id', 'title', 'author', 'image', 'tags', 'published_at', 'created_at')
+
 class BlogCreateSerializer(serializers.Serializer):
     title = serializers.CharField(max_length=255)
     content = serializers.CharField()
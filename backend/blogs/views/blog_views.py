@@ -6,24 +6,51 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from blogs.models import Blog
-from blogs.serializers.blog_serializer import BlogSerializer, BlogCreateSerializer
+from blogs.serializers.blog_serializer import BlogSerializer, BlogCardSerializer, BlogCreateSerializer
 from utils.jwt_auth import get_user_from_token
+from utils.pagination import paginate_queryset, InvalidCursor
+from utils.etag import make_etag, fetch_versions, conditional_response
+from users.models import User
+from utils.fieldsets import select_serializer, document_projection, nested_projection, InvalidFieldset
+from utils.helpers import prefetch_references
 from django.conf import settings
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def list_blogs(request):
-    blogs = Blog.objects.all()
-    serializer = BlogSerializer(blogs, many=True)
-    return Response(serializer.data)
+    try:
+        serializer_class, fields = select_serializer(request, BlogSerializer, BlogCardSerializer)
+        query = Blog.objects.all()
+        projection = document_projection(Blog, fields)
+        if projection:
+            query = query.only(*projection)
+        blogs, next_cursor = paginate_queryset(query, request)
+    except (InvalidCursor, InvalidFieldset) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if fields is None or 'author' in fields:
+        prefetch_references(blogs, 'author', User, only=nested_projection(serializer_class, 'author'))
+    serializer = serializer_class(blogs, many=True, fields=fields)
+    response = Response(serializer.data)
+    # The body stays a bare list for existing clients, so the cursor travels in a header
+    if next_cursor:
+        response['X-Next-Cursor'] = next_cursor
+    return response
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_blog_detail(request, blog_id):
     try:
-        blog = Blog.objects.get(id=blog_id)
-        serializer = BlogSerializer(blog)
-        return Response(serializer.data)
+        blog_version = Blog._get_collection().find_one({'_id': blog_id}, {'updated_at': 1, 'author': 1})
+        if not blog_version:
+            raise Blog.DoesNotExist
+        etag = make_etag(blog_version, fetch_versions(User, {'_id': blog_version.get('author')}))
+        
+        def build_response():
+            serializer = BlogSerializer(Blog.objects.get(id=blog_id))
+            return Response(serializer.data)
+        
+        return conditional_response(request, etag, build_response)
     except Blog.DoesNotExist:
         return Response({'error': 'Blog not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -66,6 +66,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # JWT Settings
 JWT_SECRET_KEY = config('JWT_SECRET_KEY', default='your-jwt-secret-key-change-in-production')
+JWT_USER_CACHE_SIZE = config('JWT_USER_CACHE_SIZE', default=1024, cast=int)
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=60, cast=int)
 
 # MongoDB Settings
 DB_NAME = config('DB_NAME', default='pet_adoption_db')
@@ -108,9 +110,88 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Badge evaluation queue
+# LocalQueueBackend keeps the queue in process memory; MongoQueueBackend shares
+# it between worker processes through the pending_badge_evaluations collection.
+BADGE_QUEUE_BACKEND = config('BADGE_QUEUE_BACKEND', default='badges.services.badge_queue.LocalQueueBackend')
+BADGE_QUEUE_WORKERS = config('BADGE_QUEUE_WORKERS', default=2, cast=int)
+
+# Response cache for anonymous feed requests
+# LocalCacheBackend keeps entries in process memory; SharedCacheBackend stores them
+# in the Django cache named by RESPONSE_CACHE_ALIAS (point it at Redis/Memcached
+# to share entries between workers).
+RESPONSE_CACHE_BACKEND = config('RESPONSE_CACHE_BACKEND', default='utils.response_cache.LocalCacheBackend')
+RESPONSE_CACHE_ALIAS = config('RESPONSE_CACHE_ALIAS', default='default')
+RESPONSE_CACHE_SIZE = config('RESPONSE_CACHE_SIZE', default=1024, cast=int)
+RESPONSE_CACHE_TTL = config('RESPONSE_CACHE_TTL', default=60, cast=int)
+RESPONSE_CACHE_STALE_TTL = config('RESPONSE_CACHE_STALE_TTL', default=30, cast=int)
+
+# Dependents of deleted posts, users and stores are removed in batches of this size
+# by a background worker, started with the app unless CASCADE_WORKER_AUTOSTART is
+# off; run_cascade_deletions runs queued and interrupted jobs by hand.
+CASCADE_DELETE_BATCH_SIZE = config('CASCADE_DELETE_BATCH_SIZE', default=500, cast=int)
+CASCADE_WORKER_AUTOSTART = config('CASCADE_WORKER_AUTOSTART', default=True, cast=bool)
+
+# Facet counts for /api/posts/browse/ are reused for this many seconds
+POST_FACET_CACHE_SIZE = config('POST_FACET_CACHE_SIZE', default=512, cast=int)
+POST_FACET_CACHE_TTL = config('POST_FACET_CACHE_TTL', default=30, cast=int)
+
+# Locations are geocoded offline from this name,latitude,longitude CSV.
+# Nearby searches default to NEARBY_DEFAULT_RADIUS_KM and are capped at
+# NEARBY_MAX_RADIUS_KM, which also bounds the distance sort per page.
+GAZETTEER_PATH = config('GAZETTEER_PATH', default=str(BASE_DIR / 'data' / 'gazetteer.csv'))
+NEARBY_DEFAULT_RADIUS_KM = config('NEARBY_DEFAULT_RADIUS_KM', default=25, cast=float)
+NEARBY_MAX_RADIUS_KM = config('NEARBY_MAX_RADIUS_KM', default=200, cast=float)
+
+# "Similar pets" lists keep this many neighbors per post. Incremental refreshes
+# score a changed post against this many recent active posts of its pet type;
+# rebuild_similar_posts recomputes every list against all of them.
+SIMILAR_POSTS_COUNT = config('SIMILAR_POSTS_COUNT', default=10, cast=int)
+SIMILAR_POSTS_CANDIDATES = config('SIMILAR_POSTS_CANDIDATES', default=5000, cast=int)
+
+# ?sort=for_you ranks up to this many of the newest posts per request. A ranking
+# slower than FEED_RANKING_BUDGET_MS is logged and shrinks the candidate count for
+# later requests (not below FEED_RANKING_MIN_CANDIDATES); fast rankings let it grow
+# back. Preference weights are cached per process for FEED_PREFERENCE_CACHE_TTL seconds.
+FEED_RANKING_CANDIDATES = config('FEED_RANKING_CANDIDATES', default=500, cast=int)
+FEED_RANKING_MIN_CANDIDATES = config('FEED_RANKING_MIN_CANDIDATES', default=100, cast=int)
+FEED_RANKING_BUDGET_MS = config('FEED_RANKING_BUDGET_MS', default=50, cast=float)
+FEED_PREFERENCE_CACHE_SIZE = config('FEED_PREFERENCE_CACHE_SIZE', default=4096, cast=int)
+FEED_PREFERENCE_CACHE_TTL = config('FEED_PREFERENCE_CACHE_TTL', default=300, cast=int)
+
+# Logging
+# Backend apps log through utils.log.get_logger; records are written as JSON
+# lines from a background thread so request threads never block on stdout.
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {
+            '()': 'utils.log.StructuredFormatter',
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'utils.log.QueueStreamHandler',
+            'formatter': 'structured',
+        },
+    },
+    'loggers': {
+        'pet_adoption': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Next-Cursor']
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from donations.models import Donation, DonationRollup
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly and daily donation rollup buckets from the raw donations collection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of donations folded into each bulk write')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        rollups = DonationRollup._get_collection()
+
+        # Buckets are rebuilt from zero; run this while donation writes are paused
+        removed = rollups.delete_many({}).deleted_count
+        self.stdout.write(f'Cleared {removed} existing rollup buckets')
+
+        projection = {'post': 1, 'payment_method': 1, 'amount': 1, 'status': 1, 'created_at': 1}
+        cursor = Donation._get_collection().find({}, projection).sort('_id', 1).batch_size(batch_size)
+
+        processed = 0
+        pending = {}
+        increments = {}
+
+        def flush():
+            if pending:
+                rollups.bulk_write(
+                    [DonationRollup.build_update(bucket_id, fields, increments[bucket_id]) for bucket_id, fields in pending.items()],
+                    ordered=False
+                )
+                pending.clear()
+                increments.clear()
+
+        for donation in cursor:
+            buckets = DonationRollup.bucket_increments(
+                donation['created_at'],
+                donation['post'],
+                donation.get('payment_method'),
+                float(donation.get('amount') or 0),
+                {donation.get('status', 'verified'): 1}
+            )
+            # Donations that share a bucket within a batch collapse into one $inc
+            for bucket_id, fields, inc in buckets:
+                pending[bucket_id] = fields
+                totals = increments.setdefault(bucket_id, {})
+                for key, value in inc.items():
+                    totals[key] = totals.get(key, 0) + value
+
+            processed += 1
+            if processed % batch_size == 0:
+                flush()
+                self.stdout.write(f'Processed {processed} donations...')
+        flush()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Backfilled rollups from {processed} donations.')
+        )
@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from donations.models import Donation
+from donations.services.summary_service import post_donation_totals, summarize_post_donations
+from users.models import User
+from utils.benchmark import benchmark_database, best_time
+
+def python_totals(post_id):
+    """The replaced path: load every verified donation and sum the amounts in Python"""
+    donations = Donation.objects(post=post_id, status='verified').order_by('-created_at')
+    return {'total_amount': round(float(sum(d.amount for d in donations)), 2), 'total_donations': donations.count()}
+
+class Command(BaseCommand):
+    help = 'Time per-post donation totals summed in Python against the aggregations, on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donations', type=int, default=50000, help='Number of verified donations to seed for one post')
+        parser.add_argument('--donors', type=int, default=2000, help='Number of distinct donors among them')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path; the fastest is reported')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Number of donations inserted per batch')
+
+    def handle(self, *args, **options):
+        with benchmark_database(Donation, User):
+            post_id = str(uuid.uuid4())
+            donor_ids = [str(uuid.uuid4()) for _ in range(options['donors'])]
+            User._get_collection().insert_many([
+                {'_id': donor_id, 'username': f'donor{index}', 'email': f'donor{index}@example.com', 'password': '-'}
+                for index, donor_id in enumerate(donor_ids)
+            ])
+            started = datetime.utcnow() - timedelta(days=90)
+            for offset in range(0, options['donations'], options['batch_size']):
+                Donation._get_collection().insert_many([
+                    {
+                        '_id': str(uuid.uuid4()),
+                        'post': post_id,
+                        'donor': donor_ids[index % len(donor_ids)],
+                        'amount': float(10 + index % 490),
+                        'payment_method': 'bkash',
+                        'reference_id': f'benchmark-{index}',
+                        'status': 'verified',
+                        'created_at': started + timedelta(minutes=index * 2)
+                    }
+                    for index in range(offset, min(offset + options['batch_size'], options['donations']))
+                ])
+
+            expected = post_donation_totals(post_id)
+            if python_totals(post_id) != expected:
+                self.stderr.write(self.style.ERROR('The two paths disagree on the totals'))
+                return
+
+            self.stdout.write(f"{expected['total_donations']} verified donations, {expected['total_amount']:.2f} in total")
+            for label, function in (
+                ('Sum in Python', python_totals),
+                ('Totals aggregation (list pages)', post_donation_totals),
+                ('Summary aggregation (?summary=1)', summarize_post_donations),
+            ):
+                elapsed = best_time(lambda: function(post_id), repeat=options['repeat'])
+                self.stdout.write(self.style.SUCCESS(f'{label}: {elapsed * 1000:.1f} ms'))
@@ -1,6 +1,8 @@
-from mongoengine import Document, StringField, DecimalField, DateTimeField, ReferenceField, BooleanField
+from mongoengine import Document, StringField, DecimalField, DateTimeField, ReferenceField, BooleanField, DictField
+from pymongo import UpdateOne, ReturnDocument
 from users.models import User
 from posts.models import Post
+from utils.helpers import reference_id
 import uuid
 from datetime import datetime
 
@@ -23,9 +25,14 @@ class Donation(Document):
         'collection': 'donations',
         'indexes': [
             'post',
-            'donor',
+            # Also serves lookups by donor alone; ranking reads a donor's newest verified donations
+            ('donor', 'status', '-created_at', '-id'),
             'status',
-            'created_at'
+            ('-created_at', '-id'),
+            ('post', '-created_at', '-id'),
+            ('post', 'status', '-created_at', '-id'),
+            ('post', 'donor', 'status'),
+            ('status', '-created_at', '-id')
         ]
     }
     
@@ -41,20 +48,126 @@ class Donation(Document):
             if not self.verified_by:
                 self.verified_by = self.donor
         
-        return super().save(*args, **kwargs)
+        is_new = self._created
+        result = super().save(*args, **kwargs)
+        if is_new:
+            DonationRollup.record(self, {self.status: 1})
+            if self.status == 'verified':
+                self._update_donor_count(1)
+                self._record_preference(1)
+        return result
     
-    def verify(self, verified_by_user):
-        self.status = 'verified'
+    @property
+    def post_id(self):
+        return reference_id(self, 'post')
+    
+    def _transition(self, new_status, verified_by_user):
+        """Atomically move to new_status, returning the previous status or None if already there"""
+        verified_at = datetime.utcnow()
+        previous = Donation._get_collection().find_one_and_update(
+            {'_id': self.id, 'status': {'$ne': new_status}},
+            {'$set': {'status': new_status, 'verified_by': verified_by_user.id, 'verified_at': verified_at}},
+            projection={'status': 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        self.status = new_status
         self.verified_by = verified_by_user
-        self.verified_at = datetime.utcnow()
-        self.save()
-        
-        post = self.post
-        if post:
-            post.update_donation_amount(self.amount)
+        self.verified_at = verified_at
+        if previous is None:
+            return None
+        DonationRollup.record(self, {previous['status']: -1, new_status: 1})
+        if new_status == 'verified':
+            self._update_donor_count(1)
+            self._record_preference(1)
+        elif previous['status'] == 'verified':
+            # Leaving verified undoes everything verifying added, so a later
+            # re-verification counts the amount once again rather than twice
+            self._update_donor_count(-1)
+            self._record_preference(-1)
+            if self.post_id:
+                Post.add_donation_amount(self.post_id, -self.amount)
+        return previous['status']
+    
+    def _update_donor_count(self, delta):
+        # A donor counts once per post: only their first verified donation adds
+        # to the post's donor_count and only losing their last one removes it
+        other_verified = Donation.objects(
+            post=self.post_id,
+            donor=reference_id(self, 'donor'),
+            status='verified',
+            id__ne=self.id
+        ).only('id').first()
+        if other_verified is None:
+            Post.increment_counters(self.post_id, donor_count=delta)
+    
+    def _record_preference(self, sign):
+        from posts.services.ranking_service import record_interaction
+        record_interaction(reference_id(self, 'donor'), self.post_id, 'donation', sign)
+    
+    def verify(self, verified_by_user):
+        # Only the call that actually flips the status counts the amount, so
+        # repeated or concurrent verifications can't add it twice
+        if self._transition('verified', verified_by_user) and self.post_id:
+            Post.add_donation_amount(self.post_id, self.amount)
     
     def reject(self, verified_by_user):
-        self.status = 'rejected'
-        self.verified_by = verified_by_user
-        self.verified_at = datetime.utcnow()
-        self.save()
+        self._transition('rejected', verified_by_user)
+
+def truncate_to_bucket(moment, granularity):
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+class DonationRollup(Document):
+    """Hourly and daily donation counts and amounts per post and payment method, by status"""
+    id = StringField(primary_key=True)  # granularity|bucket_start|post|payment_method
+    granularity = StringField(choices=['hour', 'day'], required=True)
+    bucket_start = DateTimeField(required=True)
+    post = ReferenceField(Post, required=True)
+    payment_method = StringField(max_length=100)
+    counts = DictField()  # status -> number of donations
+    amounts = DictField()  # status -> summed amount
+    
+    meta = {
+        'collection': 'donation_rollups',
+        'indexes': [
+            ('granularity', 'bucket_start'),
+            ('granularity', 'post', 'bucket_start')
+        ]
+    }
+    
+    def __str__(self):
+        return self.id
+    
+    @classmethod
+    def bucket_increments(cls, created_at, post_id, payment_method, amount, deltas):
+        """Yield (bucket_id, bucket_fields, $inc document) for each granularity"""
+        for granularity in ('hour', 'day'):
+            bucket_start = truncate_to_bucket(created_at, granularity)
+            inc = {}
+            for donation_status, sign in deltas.items():
+                inc[f'counts.{donation_status}'] = sign
+                inc[f'amounts.{donation_status}'] = sign * amount
+            bucket_id = f"{granularity}|{bucket_start.isoformat()}|{post_id}|{payment_method}"
+            fields = {
+                'granularity': granularity,
+                'bucket_start': bucket_start,
+                'post': post_id,
+                'payment_method': payment_method
+            }
+            yield bucket_id, fields, inc
+    
+    @classmethod
+    def build_update(cls, bucket_id, fields, inc):
+        return UpdateOne({'_id': bucket_id}, {'$inc': inc, '$setOnInsert': fields}, upsert=True)
+    
+    @classmethod
+    def record(cls, donation, deltas):
+        """Apply status count/amount changes for one donation to its hourly and daily buckets"""
+        operations = [
+            cls.build_update(*increment)
+            for increment in cls.bucket_increments(
+                donation.created_at, donation.post_id, donation.payment_method, float(donation.amount), deltas
+            )
+        ]
+        cls._get_collection().bulk_write(operations, ordered=False)
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from donations.models import Donation
 from posts.serializers.post_serializer import PostSerializer
-from users.serializers.user_serializer import UserSerializer
+from users.serializers.user_serializer import UserSerializer, UserCardSerializer
 
 class DonationSerializer(serializers.Serializer):
     id = serializers.CharField(read_only=True)
@@ -17,6 +17,15 @@ class DonationSerializer(serializers.Serializer):
     created_at = serializers.DateTimeField(read_only=True)
     verified_at = serializers.DateTimeField(read_only=True)
 
+class DonationCardSerializer(serializers.Serializer):
+    """Public view of a verified donation, for post timelines"""
+    id = serializers.CharField(read_only=True)
+    donor = UserCardSerializer(read_only=True)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    message = serializers.CharField(read_only=True)
+    is_manual = serializers.BooleanField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+
 class DonationCreateSerializer(serializers.Serializer):
     post_id = serializers.CharField(required=True)
     amount = serializers.DecimalField(max_digits=10, decimal_places=2)
@@ -0,0 +1,46 @@
+from donations.models import DonationRollup
+from posts.models import Post
+
+ANALYTICS_GROUPS = {
+    'time': '$bucket_start',
+    'payment_method': '$payment_method',
+    'post': '$post',
+}
+
+def query_donation_rollups(start, end, granularity='day', group_by='time', donation_status='verified', post_id=None):
+    """Answer a donation range query from the pre-aggregated rollup buckets"""
+    match = {
+        'granularity': granularity,
+        'bucket_start': {'$gte': start, '$lt': end}
+    }
+    if post_id:
+        match['post'] = post_id
+
+    pipeline = [
+        {'$match': match},
+        {'$group': {
+            '_id': ANALYTICS_GROUPS[group_by],
+            'total_amount': {'$sum': {'$ifNull': [f'$amounts.{donation_status}', 0]}},
+            'donations': {'$sum': {'$ifNull': [f'$counts.{donation_status}', 0]}}
+        }},
+        {'$match': {'donations': {'$ne': 0}}},
+        {'$sort': {'_id': 1} if group_by == 'time' else {'total_amount': -1}}
+    ]
+    rows = list(DonationRollup._get_collection().aggregate(pipeline))
+
+    titles = {}
+    if group_by == 'post' and rows:
+        posts = Post.objects.only('id', 'title').in_bulk([row['_id'] for row in rows])
+        titles = {post_id: post.title for post_id, post in posts.items()}
+
+    results = []
+    for row in rows:
+        entry = {
+            'key': row['_id'].isoformat() if group_by == 'time' else row['_id'],
+            'total_amount': round(float(row['total_amount']), 2),
+            'donations': row['donations']
+        }
+        if group_by == 'post':
+            entry['title'] = titles.get(row['_id'])
+        results.append(entry)
+    return results
@@ -0,0 +1,79 @@
+from donations.models import Donation
+from users.models import User
+
+GROUP_TOTALS = {'total_amount': {'$sum': '$amount'}, 'donations': {'$sum': 1}}
+
+def verified_donations_match(post_id):
+    return {'$match': {'post': str(post_id), 'status': 'verified'}}
+
+def post_donation_totals(post_id):
+    """Total amount and number of a post's verified donations, from one $group"""
+    totals = next(Donation._get_collection().aggregate([
+        verified_donations_match(post_id),
+        {'$group': {'_id': None, **GROUP_TOTALS}}
+    ]), {})
+    return {
+        'total_amount': round(float(totals.get('total_amount', 0)), 2),
+        'total_donations': totals.get('donations', 0)
+    }
+
+def summarize_post_donations(post_id, top_donors=5):
+    """Totals, top donors and a daily histogram of a post's verified donations.
+
+    Everything is computed by one $facet aggregation, so no donation documents
+    are loaded into Python however many the post has.
+    """
+    pipeline = [
+        verified_donations_match(post_id),
+        {'$facet': {
+            'totals': [
+                {'$group': {'_id': None, **GROUP_TOTALS}}
+            ],
+            'top_donors': [
+                {'$group': {'_id': '$donor', **GROUP_TOTALS}},
+                {'$sort': {'total_amount': -1, '_id': 1}},
+                {'$limit': top_donors}
+            ],
+            'daily': [
+                {'$group': {'_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$created_at'}}, **GROUP_TOTALS}},
+                {'$sort': {'_id': 1}}
+            ]
+        }}
+    ]
+    result = next(Donation._get_collection().aggregate(pipeline), {})
+    totals = (result.get('totals') or [{}])[0]
+
+    donor_rows = result.get('top_donors', [])
+    donor_ids = [row['_id'] for row in donor_rows]
+    donors = User.objects.only('id', 'username', 'first_name', 'last_name', 'profile_photo').in_bulk(donor_ids) if donor_ids else {}
+
+    return {
+        'total_amount': round(float(totals.get('total_amount', 0)), 2),
+        'total_donations': totals.get('donations', 0),
+        'top_donors': [
+            {
+                'donor': donor_summary(donors.get(row['_id']), row['_id']),
+                'total_amount': round(float(row['total_amount']), 2),
+                'donations': row['donations']
+            }
+            for row in donor_rows
+        ],
+        'daily': [
+            {
+                'date': row['_id'],
+                'total_amount': round(float(row['total_amount']), 2),
+                'donations': row['donations']
+            }
+            for row in result.get('daily', [])
+        ]
+    }
+
+def donor_summary(user, user_id):
+    if user is None:
+        return {'id': user_id, 'username': None}
+    return {
+        'id': user.id,
+        'username': user.username,
+        'full_name': user.full_name,
+        'profile_photo': user.profile_photo
+    }
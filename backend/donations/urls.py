@@ -8,7 +8,8 @@ from donations.views.donation_views import (
     get_user_donations,
     get_post_donations,
     get_pending_manual_donations,
-    review_manual_donation
+    review_manual_donation,
+    get_donation_analytics
 )
 
 urlpatterns = [
@@ -16,6 +17,7 @@ urlpatterns = [
     path('create/', create_donation, name='create_donation'),
     path('create-manual/', create_manual_donation, name='create_manual_donation'),
     path('admin/pending/', get_pending_manual_donations, name='get_pending_manual_donations'),
+    path('admin/analytics/', get_donation_analytics, name='get_donation_analytics'),
     path('<str:donation_id>/', get_donation_detail, name='get_donation_detail'),
     path('<str:donation_id>/verify/', verify_donation, name='verify_donation'),
     path('<str:donation_id>/review/', review_manual_donation, name='review_manual_donation'),
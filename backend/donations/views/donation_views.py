@@ -4,12 +4,17 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from donations.models import Donation
 from donations.serializers.donation_serializer import DonationSerializer, DonationCreateSerializer
+from donations.services.summary_service import post_donation_totals, summarize_post_donations
+from donations.services.analytics_service import query_donation_rollups, ANALYTICS_GROUPS
 from posts.models import Post
 from users.models import User
 from utils.jwt_auth import get_user_from_token
+from utils.pagination import paginate_queryset, InvalidCursor
+from utils.helpers import prefetch_references
 import uuid
 import os
 from django.conf import settings
+from datetime import datetime, timedelta
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -17,7 +22,6 @@ def get_donations(request):
     try:
         post_id = request.GET.get('post_id')
         status_filter = request.GET.get('status', 'all')
-        limit = int(request.GET.get('limit', 20))
         
         query = Donation.objects
         if post_id:
@@ -25,14 +29,17 @@ def get_donations(request):
         if status_filter != 'all':
             query = query.filter(status=status_filter)
         
-        donations = query.order_by('-created_at').limit(limit)
+        donations, next_cursor = paginate_queryset(query, request)
         serializer = DonationSerializer(donations, many=True)
         
         return Response({
             'data': serializer.data,
             'total': len(serializer.data),
+            'next_cursor': next_cursor,
             'success': True
         })
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -217,17 +224,29 @@ def get_user_donations(request):
 @permission_classes([AllowAny])
 def get_post_donations(request, post_id):
     try:
-        donations = Donation.objects(post=post_id, status='verified').order_by('-created_at')
+        # Summary mode skips the donation list entirely
+        if request.GET.get('summary', '').lower() in ('1', 'true'):
+            return Response({
+                'data': summarize_post_donations(post_id),
+                'success': True
+            })
+        
+        # List pages only need the two totals, not the top donors and histogram
+        totals = post_donation_totals(post_id)
+        donations, next_cursor = paginate_queryset(Donation.objects(post=post_id, status='verified'), request)
+        prefetch_references(donations, 'post', Post)
+        prefetch_references(donations, 'donor', User)
         serializer = DonationSerializer(donations, many=True)
         
-        total_amount = sum(d.amount for d in donations)
-        
         return Response({
             'data': serializer.data,
-            'total_amount': float(total_amount),
-            'total_donations': len(serializer.data),
+            'total_amount': totals['total_amount'],
+            'total_donations': totals['total_donations'],
+            'next_cursor': next_cursor,
             'success': True
         })
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -375,3 +394,45 @@ def review_manual_donation(request, donation_id):
         return Response({'error': 'Donation not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_donation_analytics(request):
+    """Donation totals over a date range, answered from the rollup buckets"""
+    try:
+        user = get_user_from_token(request)
+        if not user or not user.is_staff:
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        
+        granularity = request.GET.get('granularity', 'day')
+        group_by = request.GET.get('group_by', 'time')
+        donation_status = request.GET.get('status', 'verified')
+        if granularity not in ('hour', 'day'):
+            return Response({'error': 'granularity must be "hour" or "day"'}, status=status.HTTP_400_BAD_REQUEST)
+        if group_by not in ANALYTICS_GROUPS:
+            return Response({'error': f'group_by must be one of {", ".join(ANALYTICS_GROUPS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        if donation_status not in ('pending', 'verified', 'rejected'):
+            return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            end = datetime.fromisoformat(request.GET['end']) if request.GET.get('end') else datetime.utcnow()
+            start = datetime.fromisoformat(request.GET['start']) if request.GET.get('start') else end - timedelta(days=30)
+        except ValueError:
+            return Response({'error': 'start and end must be ISO dates'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rows = query_donation_rollups(
+            start, end,
+            granularity=granularity,
+            group_by=group_by,
+            donation_status=donation_status,
+            post_id=request.GET.get('post_id')
+        )
+        
+        return Response({
+            'data': rows,
+            'total_amount': round(sum(row['total_amount'] for row in rows), 2),
+            'total_donations': sum(row['donations'] for row in rows),
+            'success': True
+        })
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,5 +1,6 @@
-from mongoengine import Document, StringField, DateTimeField, ReferenceField, BooleanField, DecimalField
+from mongoengine import Document, StringField, DateTimeField, ReferenceField, BooleanField, DecimalField, PointField
 from users.models import User
+from utils.geo import update_point
 import uuid
 from datetime import datetime
 
@@ -10,6 +11,7 @@ class Item(Document):
     item_type = StringField(choices=['food', 'toy', 'accessory'], required=True)
     donor = ReferenceField(User, required=True)
     location = StringField(max_length=255)
+    location_point = PointField()  # Geocoded from location on save
     contact_info = StringField(max_length=255)
     status = StringField(choices=['available', 'claimed', 'collected'], default='available')
     claimed_by = ReferenceField(User)
@@ -23,7 +25,9 @@ class Item(Document):
             'donor',
             'item_type',
             'status',
-            'created_at'
+            'created_at',
+            ('status', '-created_at', '-id'),
+            '(location_point'
         ]
     }
     
@@ -33,6 +37,7 @@ class Item(Document):
     def save(self, *args, **kwargs):
         if not self.id:
             self.id = str(uuid.uuid4())
+        update_point(self, 'location', 'location_point')
         self.updated_at = datetime.utcnow()
         return super().save(*args, **kwargs)
 
@@ -44,6 +49,7 @@ class VolunteerDonation(Document):
     quantity = StringField(max_length=100)  # e.g., "5 bags", "10 pieces"
     estimated_value = DecimalField(precision=2)  # Optional estimated value
     pickup_location = StringField(required=True, max_length=500)
+    pickup_point = PointField()  # Geocoded from pickup_location on save
     contact_number = StringField(required=True, max_length=50)
     available_times = StringField(max_length=500)  # When donor is available
     special_instructions = StringField(max_length=1000)
@@ -61,7 +67,8 @@ class VolunteerDonation(Document):
             'status',
             'item_type',
             'assigned_volunteer',
-            'created_at'
+            'created_at',
+            '(pickup_point'
         ]
     }
     
@@ -71,6 +78,7 @@ class VolunteerDonation(Document):
     def save(self, *args, **kwargs):
         if not self.id:
             self.id = str(uuid.uuid4())
+        update_point(self, 'pickup_location', 'pickup_point')
         self.updated_at = datetime.utcnow()
         return super().save(*args, **kwargs)
 
@@ -120,7 +128,8 @@ class Product(Document):
             'store',
             'category',
             'is_active',
-            'created_at'
+            'created_at',
+            ('is_active', '-created_at', '-id')
         ]
     }
     
@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from items.models import Item, Store, Product, Order
-from users.serializers.user_serializer import UserSerializer
+from users.serializers.user_serializer import UserSerializer, UserCardSerializer
+from utils.fieldsets import SparseFieldsetMixin
 from decimal import Decimal
 
-class ItemSerializer(serializers.Serializer):
+class ItemSerializer(SparseFieldsetMixin, serializers.Serializer):
     id = serializers.CharField(read_only=True)
     post = serializers.CharField()
     donor = UserSerializer(read_only=True)
@@ -28,7 +29,15 @@ class ItemSerializer(serializers.Serializer):
         item.save()
         return item
 
-class StoreSerializer(serializers.Serializer):
+class ItemCardSerializer(ItemSerializer):
+    """Slim item representation for list cards"""
+    title = serializers.CharField(read_only=True)
+    location = serializers.CharField(read_only=True)
+    donor = UserCardSerializer(read_only=True)
+    claimed_by = UserCardSerializer(read_only=True)
+    default_fields = ('id', 'title', 'item_type', 'location', 'donor', 'status', 'created_at')
+
+class StoreSerializer(SparseFieldsetMixin, serializers.Serializer):
     id = serializers.CharField(read_only=True)
     name = serializers.CharField(max_length=255)
     description = serializers.CharField(required=False, allow_blank=True)
@@ -47,6 +56,11 @@ class StoreSerializer(serializers.Serializer):
         store.save()
         return store
 
+class StoreCardSerializer(StoreSerializer):
+    """Slim store representation for list cards"""
+    owner = UserCardSerializer(read_only=True)
+    default_fields = ('id', 'name', 'owner', 'is_active', 'created_at')
+
 class ProductSerializer(serializers.Serializer):
     id = serializers.CharField(read_only=True)
     store = serializers.CharField()
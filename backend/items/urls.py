@@ -4,6 +4,7 @@ from items.views import item_views
 urlpatterns = [
     path('', item_views.get_items, name='get_items'),
     path('create/', item_views.create_item, name='create_item'),
+    path('nearby/', item_views.get_nearby_items, name='get_nearby_items'),
     path('<str:item_id>/claim/', item_views.claim_item, name='claim_item'),
     path('stores/', item_views.get_stores, name='get_stores'),
     path('products/', item_views.get_all_products, name='get_all_products'),
@@ -18,6 +19,7 @@ urlpatterns = [
     path('orders/', item_views.get_user_orders, name='get_user_orders'),
     path('orders/<str:order_id>/status/', item_views.update_order_status, name='update_order_status'),
     path('volunteer-donations/', item_views.get_volunteer_donations, name='get_volunteer_donations'),
+    path('volunteer-donations/nearby/', item_views.get_nearby_volunteer_donations, name='get_nearby_volunteer_donations'),
     path('volunteer-donations/create/', item_views.create_volunteer_donation, name='create_volunteer_donation'),
     path('volunteer-donations/<str:donation_id>/assign/', item_views.assign_volunteer_donation, name='assign_volunteer_donation'),
     path('volunteer-donations/<str:donation_id>/status/', item_views.update_volunteer_donation_status, name='update_volunteer_donation_status'),
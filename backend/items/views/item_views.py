@@ -3,9 +3,15 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from items.models import Item, Store, Product, Order, VolunteerDonation
-from items.serializers.item_serializer import ItemSerializer, StoreSerializer, ProductSerializer, OrderSerializer
+from items.serializers.item_serializer import ItemSerializer, ItemCardSerializer, StoreSerializer, StoreCardSerializer, ProductSerializer, OrderSerializer
 from users.models import User
 from utils.jwt_auth import get_user_from_token
+from utils.pagination import paginate_queryset, InvalidCursor
+from utils.etag import make_etag, fetch_versions, conditional_response
+from utils.fieldsets import select_serializer, document_projection, nested_projection, fieldset_key, InvalidFieldset
+from utils.helpers import prefetch_references
+from utils.geo import parse_nearby, nearby_documents, InvalidLocation
+from utils.cascade import cascade_deletion
 import os
 import uuid
 from django.conf import settings
@@ -15,12 +21,50 @@ from datetime import datetime
 @permission_classes([AllowAny])
 def get_items(request):
     try:
-        items = Item.objects.filter(status='available').order_by('-created_at')
-        serializer = ItemSerializer(items, many=True)
+        serializer_class, fields = select_serializer(request, ItemSerializer, ItemCardSerializer)
+        query = Item.objects.filter(status='available')
+        projection = document_projection(Item, fields)
+        if projection:
+            query = query.only(*projection)
+        
+        items, next_cursor = paginate_queryset(query, request)
+        for field_name in ('donor', 'claimed_by'):
+            if fields is None or field_name in fields:
+                prefetch_references(items, field_name, User, only=nested_projection(serializer_class, field_name))
+        serializer = serializer_class(items, many=True, fields=fields)
         return Response({
             'data': serializer.data,
+            'next_cursor': next_cursor,
             'success': True
         })
+    except (InvalidCursor, InvalidFieldset) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_nearby_items(request):
+    try:
+        point, max_distance = parse_nearby(request)
+        query = {'status': 'available'}
+        if request.GET.get('item_type'):
+            query['item_type'] = request.GET['item_type']
+        
+        results, next_cursor = nearby_documents(Item, 'location_point', point, max_distance, query, request)
+        items = [item for item, _ in results]
+        prefetch_references(items, 'donor', User, only=nested_projection(ItemCardSerializer, 'donor'))
+        data = ItemCardSerializer(items, many=True).data
+        for item_data, (_, distance) in zip(data, results):
+            item_data['distance_km'] = round(distance / 1000, 2)
+        
+        return Response({
+            'data': data,
+            'next_cursor': next_cursor,
+            'success': True
+        })
+    except (InvalidLocation, InvalidCursor) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -78,12 +122,32 @@ def claim_item(request, item_id):
 @permission_classes([AllowAny])
 def get_stores(request):
     try:
-        stores = Store.objects.filter(is_active=True).order_by('-created_at')
-        serializer = StoreSerializer(stores, many=True)
-        return Response({
-            'data': serializer.data,
-            'success': True
-        })
+        serializer_class, fields = select_serializer(request, StoreSerializer, StoreCardSerializer)
+        store_versions = fetch_versions(Store, {'is_active': True}, fields=('updated_at', 'owner'), sort=[('created_at', -1)])
+        owner_ids = sorted({version.get('owner') for version in store_versions})
+        etag = make_etag(
+            fieldset_key(serializer_class, fields),
+            store_versions,
+            fetch_versions(User, {'_id': {'$in': owner_ids}}, sort=[('_id', 1)])
+        )
+        
+        def build_response():
+            stores = Store.objects.filter(is_active=True).order_by('-created_at')
+            projection = document_projection(Store, fields)
+            if projection:
+                stores = stores.only(*projection)
+            stores = list(stores)
+            if fields is None or 'owner' in fields:
+                prefetch_references(stores, 'owner', User, only=nested_projection(serializer_class, 'owner'))
+            serializer = serializer_class(stores, many=True, fields=fields)
+            return Response({
+                'data': serializer.data,
+                'success': True
+            })
+        
+        return conditional_response(request, etag, build_response)
+    except InvalidFieldset as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -91,12 +155,15 @@ def get_stores(request):
 @permission_classes([AllowAny])
 def get_all_products(request):
     try:
-        products = Product.objects.filter(is_active=True).order_by('-created_at')
+        products, next_cursor = paginate_queryset(Product.objects.filter(is_active=True), request)
         serializer = ProductSerializer(products, many=True)
         return Response({
             'data': serializer.data,
+            'next_cursor': next_cursor,
             'success': True
         })
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -166,7 +233,9 @@ def delete_store(request, store_id):
         if str(store.owner.id) != str(user.id) and not user.is_staff:
             return Response({'error': 'Not authorized to delete this store'}, status=status.HTTP_403_FORBIDDEN)
         
-        store.delete()
+        # Products and orders are removed in the background
+        with cascade_deletion('store', store.id):
+            store.delete()
         return Response({'message': 'Store deleted successfully', 'success': True})
     except Store.DoesNotExist:
         return Response({'error': 'Store not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -427,6 +496,41 @@ def get_volunteer_donations(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_nearby_volunteer_donations(request):
+    try:
+        user = get_user_from_token(request)
+        if not user or not user.is_staff:
+            return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
+        
+        point, max_distance = parse_nearby(request)
+        query = {'status': request.GET.get('status', 'pending')}
+        results, next_cursor = nearby_documents(VolunteerDonation, 'pickup_point', point, max_distance, query, request)
+        
+        data = [{
+            'id': donation.id,
+            'item_type': donation.item_type,
+            'description': donation.description,
+            'quantity': donation.quantity,
+            'pickup_location': donation.pickup_location,
+            'contact_number': donation.contact_number,
+            'available_times': donation.available_times,
+            'status': donation.status,
+            'distance_km': round(distance / 1000, 2),
+            'created_at': donation.created_at.isoformat()
+        } for donation, distance in results]
+        
+        return Response({
+            'data': data,
+            'next_cursor': next_cursor,
+            'success': True
+        })
+    except (InvalidLocation, InvalidCursor) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['PUT'])
 @permission_classes([AllowAny])
 def assign_volunteer_donation(request, donation_id):
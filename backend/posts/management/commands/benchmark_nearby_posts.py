@@ -0,0 +1,84 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from posts.models import Post
+from utils.benchmark import benchmark_database, best_time
+from utils.geo import geohash_encode, nearby_documents
+
+# Roughly Bangladesh, where the gazetteer's places are
+BOUNDS = {'west': 88.0, 'south': 20.7, 'east': 92.7, 'north': 26.6}
+# (label, [longitude, latitude]) search points
+CENTRES = [('Dhaka', [90.4125, 23.8103]), ('Khulna', [89.5403, 22.8456]), ('Sylhet', [91.8687, 24.8949])]
+EARTH_RADIUS_KM = 6378.1
+
+def unindexed_within(point, max_distance):
+    """What the search costs without the 2dsphere index: a $centerSphere match over every active post"""
+    return Post._get_collection().count_documents({
+        'status': 'active',
+        'location_point': {'$geoWithin': {'$centerSphere': [point, max_distance / 1000 / EARTH_RADIUS_KM]}}
+    }, hint={'_id': 1})
+
+class Command(BaseCommand):
+    help = 'Time nearby post searches on a million generated locations in a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000, help='Number of located posts to generate')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Number of posts inserted per batch')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the fastest is reported')
+        parser.add_argument('--pages', type=int, default=5, help='Page depth timed after following the cursor')
+        parser.add_argument('--radius', type=float, action='append', dest='radii', help='Search radius in km to time; repeatable')
+        parser.add_argument('--skip-scan', action='store_true', help="Don't time the unindexed scan the 2dsphere index replaces")
+
+    def handle(self, *args, **options):
+        generator = random.Random(7)
+        factory = RequestFactory()
+        with benchmark_database(Post):
+            collection = Post._get_collection()
+            started = datetime.utcnow() - timedelta(days=365)
+            for offset in range(0, options['posts'], options['batch_size']):
+                documents = []
+                for index in range(offset, min(offset + options['batch_size'], options['posts'])):
+                    # Half the posts cluster around a gazetteer place, as geocoded locations do
+                    if generator.random() < 0.5:
+                        lng, lat = generator.choice(CENTRES)[1]
+                        lng, lat = lng + generator.gauss(0, 0.05), lat + generator.gauss(0, 0.05)
+                    else:
+                        lng = generator.uniform(BOUNDS['west'], BOUNDS['east'])
+                        lat = generator.uniform(BOUNDS['south'], BOUNDS['north'])
+                    documents.append({
+                        '_id': str(uuid.uuid4()),
+                        'type': 'adoption',
+                        'title': f'Post {index}',
+                        'status': 'active' if generator.random() < 0.9 else 'completed',
+                        'location_point': {'type': 'Point', 'coordinates': [lng, lat]},
+                        'location_geohash': geohash_encode(lng, lat),
+                        'created_at': started + timedelta(seconds=index * 30)
+                    })
+                collection.insert_many(documents, ordered=False)
+            self.stdout.write(f"{collection.estimated_document_count()} located posts generated")
+
+            query = {'status': 'active'}
+            for label, point in CENTRES:
+                for radius in options['radii'] or [5, 25, 200]:
+                    max_distance = radius * 1000
+
+                    def page(cursor=None):
+                        params = {'cursor': cursor} if cursor else {}
+                        return nearby_documents(Post, 'location_point', point, max_distance, query, factory.get('/api/posts/nearby/', params))
+
+                    first_page = best_time(page, repeat=options['repeat'])
+                    cursor = None
+                    for _ in range(options['pages'] - 1):
+                        _, cursor = page(cursor)
+                        if not cursor:
+                            break
+                    line = f'{label}, {radius:g} km: first page {first_page * 1000:.1f} ms'
+                    if cursor:
+                        line += f", page {options['pages']} {best_time(lambda: page(cursor), repeat=options['repeat']) * 1000:.1f} ms"
+                    else:
+                        line += ', fewer pages of results'
+                    if not options['skip_scan']:
+                        line += f', unindexed scan {best_time(lambda: unindexed_within(point, max_distance), repeat=1) * 1000:.1f} ms'
+                    self.stdout.write(self.style.SUCCESS(line))
@@ -0,0 +1,95 @@
+import random
+import re
+import uuid
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from posts.models import Bookmark, Post, PostImage
+from posts.services.search_service import search_posts
+from users.models import User
+from utils.benchmark import benchmark_database, best_time
+
+# (pet_type, species) pairs and words the generated titles and descriptions draw from
+PETS = [
+    ('Dog', 'Golden Retriever'), ('Dog', 'German Shepherd'), ('Dog', 'Labrador'), ('Dog', 'Mixed Breed'),
+    ('Cat', 'Persian'), ('Cat', 'Siamese'), ('Cat', 'Bengal'), ('Cat', 'Domestic Shorthair'),
+    ('Bird', 'Parrot'), ('Bird', 'Budgie'), ('Rabbit', 'Lionhead'), ('Rabbit', 'Dutch'),
+]
+NAMES = ['Luna', 'Rocky', 'Milo', 'Bella', 'Max', 'Coco', 'Simba', 'Daisy', 'Oscar', 'Kiwi', 'Tiger', 'Pepper']
+TITLE_WORDS = ['sweet', 'playful', 'gentle', 'senior', 'young', 'rescued', 'shy', 'friendly', 'needs home', 'needs surgery']
+DESCRIPTION_WORDS = (
+    'loves children and other pets house trained knows basic commands vaccinated neutered calm energetic '
+    'found near the market injured leg recovering well needs a quiet home with a garden eats well sleeps indoors '
+    'treatment fund vet bills medicine shelter volunteer foster family walks daily good with cats good with dogs'
+).split()
+
+DEFAULT_QUERIES = ['golden retriever', 'playful kitten', 'surgery', 'senior cat -persian', 'parrot needs home']
+
+def regex_scan(query):
+    """What matching costs without the text index: a case-insensitive regex over every active post"""
+    pattern = '|'.join(re.escape(word) for word in query.split() if not word.startswith('-'))
+    return Post._get_collection().count_documents({
+        'status': 'active',
+        '$or': [{'title': {'$regex': pattern, '$options': 'i'}}, {'description': {'$regex': pattern, '$options': 'i'}}]
+    })
+
+class Command(BaseCommand):
+    help = 'Time relevance-ranked post search on a generated collection in a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000, help='Number of posts to generate')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Number of posts inserted per batch')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the fastest is reported')
+        parser.add_argument('--pages', type=int, default=5, help='Page depth timed after following the cursor')
+        parser.add_argument('--query', action='append', dest='queries', help='Search query to time; repeatable')
+        parser.add_argument('--skip-scan', action='store_true', help="Don't time the unindexed regex scan the index replaces")
+
+    def handle(self, *args, **options):
+        generator = random.Random(7)
+        factory = RequestFactory()
+        with benchmark_database(Post, User, PostImage, Bookmark):
+            owner_ids = [str(uuid.uuid4()) for _ in range(100)]
+            User._get_collection().insert_many([
+                {'_id': owner_id, 'username': f'owner{index}', 'email': f'owner{index}@example.com', 'password': '-'}
+                for index, owner_id in enumerate(owner_ids)
+            ])
+
+            # Getting the collection creates its indexes, the weighted text
+            # index included, so the posts are indexed as they are inserted
+            collection = Post._get_collection()
+            started = datetime.utcnow() - timedelta(days=365)
+            for offset in range(0, options['posts'], options['batch_size']):
+                documents = []
+                for index in range(offset, min(offset + options['batch_size'], options['posts'])):
+                    pet_type, species = generator.choice(PETS)
+                    documents.append({
+                        '_id': str(uuid.uuid4()),
+                        'user': generator.choice(owner_ids),
+                        'type': generator.choice(['adoption', 'adoption', 'donation']),
+                        'title': f'{generator.choice(NAMES)} - {generator.choice(TITLE_WORDS)} {species}',
+                        'description': ' '.join(generator.choices(DESCRIPTION_WORDS, k=25)),
+                        'pet_type': pet_type,
+                        'pet_species': species,
+                        'status': 'active' if generator.random() < 0.9 else 'completed',
+                        'created_at': started + timedelta(seconds=index * 30)
+                    })
+                collection.insert_many(documents, ordered=False)
+            self.stdout.write(f"{collection.estimated_document_count()} posts generated")
+
+            for query in options['queries'] or DEFAULT_QUERIES:
+                first_page = best_time(lambda: search_posts(query, factory.get('/api/posts/search/', {'q': query})), repeat=options['repeat'])
+
+                cursor = None
+                for _ in range(options['pages'] - 1):
+                    _, cursor = search_posts(query, factory.get('/api/posts/search/', {'q': query, 'cursor': cursor or ''}))
+                    if not cursor:
+                        break
+                deep_page = None
+                if cursor:
+                    deep_page = best_time(lambda: search_posts(query, factory.get('/api/posts/search/', {'q': query, 'cursor': cursor})), repeat=options['repeat'])
+
+                line = f'{query!r}: first page {first_page * 1000:.1f} ms'
+                line += f", page {options['pages']} {deep_page * 1000:.1f} ms" if deep_page is not None else ', fewer pages of results'
+                if not options['skip_scan']:
+                    line += f', regex scan {best_time(lambda: regex_scan(query), repeat=1) * 1000:.1f} ms'
+                self.stdout.write(self.style.SUCCESS(line))
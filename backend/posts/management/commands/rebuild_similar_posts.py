@@ -0,0 +1,33 @@
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from posts.models import Post, PostNeighbors, PostTermFrequency
+from posts.services.similarity_service import rebuild_partition
+
+class Command(BaseCommand):
+    help = 'Recompute the "similar pets" neighbor lists of every active post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=512, help='Number of posts scored per matrix product')
+        parser.add_argument('--chunk-size', type=int, default=2048, help='Number of posts read, vectorized and compared against per step')
+
+    def handle(self, *args, **options):
+        started_at = datetime.utcnow()
+        collection = Post._get_collection()
+
+        # Posts are only compared within their pet type, one partition at a time
+        pet_types = set(collection.distinct('pet_type', {'status': 'active'})) | {None}
+        written = 0
+        for pet_type in pet_types:
+            written += rebuild_partition(pet_type, settings.SIMILAR_POSTS_COUNT, options['batch_size'], options['chunk_size'])
+
+        # Lists and term counts not rewritten belong to posts or pet types that are no longer active
+        removed = PostNeighbors._get_collection().delete_many({'updated_at': {'$lt': started_at}}).deleted_count
+        PostTermFrequency._get_collection().delete_many({'updated_at': {'$lt': started_at}})
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt similar posts for {written} posts in {len(pet_types)} pet types. '
+                f'Removed {removed} stale lists.'
+            )
+        )
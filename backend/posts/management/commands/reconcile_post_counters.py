@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from posts.models import Post, Comment, Bookmark
+from donations.models import Donation
+
+COUNTERS = ('comment_count', 'bookmark_count', 'donor_count')
+
+class Command(BaseCommand):
+    help = 'Recompute the comment, bookmark and donor counters stored on posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of post updates per bulk write')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # One grouped aggregation per source collection
+        expected = {
+            'comment_count': self.count_by_post(Comment, [
+                {'$group': {'_id': '$post', 'count': {'$sum': 1}}}
+            ]),
+            'bookmark_count': self.count_by_post(Bookmark, [
+                {'$group': {'_id': '$post', 'count': {'$sum': 1}}}
+            ]),
+            'donor_count': self.count_by_post(Donation, [
+                {'$match': {'status': 'verified'}},
+                {'$group': {'_id': {'post': '$post', 'donor': '$donor'}}},
+                {'$group': {'_id': '$_id.post', 'count': {'$sum': 1}}}
+            ]),
+        }
+
+        posts = Post._get_collection()
+        operations = []
+        checked = 0
+        fixed = 0
+        # Only posts whose stored counters drifted are written
+        for post in posts.find({}, {counter: 1 for counter in COUNTERS}).batch_size(batch_size):
+            checked += 1
+            changes = {}
+            for counter in COUNTERS:
+                actual = expected[counter].get(post['_id'], 0)
+                if post.get(counter) != actual:
+                    changes[counter] = actual
+            if changes:
+                operations.append(UpdateOne({'_id': post['_id']}, {'$set': changes}))
+                fixed += 1
+            if len(operations) >= batch_size:
+                posts.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            posts.bulk_write(operations, ordered=False)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Checked {checked} posts. Corrected counters on {fixed}.')
+        )
+
+    def count_by_post(self, document_cls, pipeline):
+        rows = document_cls._get_collection().aggregate(pipeline, allowDiskUse=True)
+        return {row['_id']: row['count'] for row in rows}
@@ -1,8 +1,17 @@
-from mongoengine import Document, StringField, IntField, DecimalField, DateTimeField, ReferenceField, ListField, BooleanField
+from mongoengine import Document, StringField, IntField, DecimalField, FloatField, DateTimeField, ReferenceField, ListField, BooleanField, PointField, DictField
 from users.models import User
+from utils.helpers import reference_id
+from utils.geo import update_point, point_coordinates, geohash_encode
 import uuid
 from datetime import datetime
 from decimal import Decimal
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Fields shown on the post map; changing one refreshes the tiles covering the post
+MAP_FIELDS = {'status', 'type', 'title', 'pet_type', 'pet_species', 'location_point'}
+# Fields the similar-pets vectors are built from; changing one refreshes the post's neighbors
+SIMILARITY_FIELDS = {'status', 'title', 'description', 'pet_type', 'pet_species', 'pet_size', 'pet_age'}
 
 class Post(Document):
     id = StringField(primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -18,6 +27,13 @@ class Post(Document):
     current_amount = DecimalField(precision=2, default=Decimal('0.00'))
     status = StringField(max_length=20, choices=['active', 'completed', 'cancelled'], default='active')
     donations_enabled = BooleanField(default=True)
+    location = StringField(max_length=255)
+    location_point = PointField()  # Geocoded from location on save
+    location_geohash = StringField(max_length=12)  # Cell of location_point, for map clustering
+    # Denormalized counters kept current with $inc; reconcile_post_counters rebuilds them
+    comment_count = IntField(default=0)
+    bookmark_count = IntField(default=0)
+    donor_count = IntField(default=0)
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
     
@@ -28,7 +44,23 @@ class Post(Document):
             'type',
             'status',
             'pet_type',
-            'created_at'
+            ('-created_at', '-id'),
+            ('status', '-created_at', '-id'),
+            ('status', 'type', '-created_at', '-id'),
+            ('status', 'pet_type', '-created_at', '-id'),
+            ('status', 'pet_species', '-created_at', '-id'),
+            ('status', 'pet_size', '-created_at', '-id'),
+            ('status', 'pet_age'),
+            '(location_point',
+            ('status', 'location_geohash'),
+            {
+                # Search always filters on status, so it leads the text index
+                # and each query only scores posts with that status
+                'fields': ['status', '$title', '$description', '$pet_type', '$pet_species'],
+                'name': 'post_text_search',
+                'default_language': 'english',
+                'weights': {'title': 10, 'pet_type': 5, 'pet_species': 5, 'description': 1}
+            }
         ]
     }
     
@@ -44,15 +76,124 @@ class Post(Document):
                 self.donations_enabled = False
                 self.status = 'completed'
         
+        update_point(self, 'location', 'location_point')
+        is_new = self._created
+        changed = set(self._get_changed_fields())
+        map_cells = []
+        if is_new or 'location_point' in changed:
+            if not is_new:
+                # The cell the post is leaving also needs its tiles refreshed
+                previous = Post._get_collection().find_one({'_id': self.id}, {'location_geohash': 1})
+                map_cells.append((previous or {}).get('location_geohash'))
+            coordinates = point_coordinates(self.location_point)
+            self.location_geohash = geohash_encode(*coordinates) if coordinates else None
+        
         self.updated_at = datetime.utcnow()
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        from posts.services.feed_service import invalidate_post_feed
+        invalidate_post_feed()
+        if is_new or changed & MAP_FIELDS:
+            from posts.services.map_service import invalidate_post_map_cells
+            invalidate_post_map_cells(self.location_geohash, *map_cells)
+        if is_new or changed & SIMILARITY_FIELDS:
+            from posts.services.similarity_service import schedule_similarity_refresh
+            schedule_similarity_refresh(self.id)
+        return result
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from posts.services.feed_service import invalidate_post_feed
+        from posts.services.map_service import invalidate_post_map_cells
+        from posts.services.similarity_service import schedule_similarity_refresh
+        invalidate_post_feed()
+        invalidate_post_map_cells(self.location_geohash)
+        schedule_similarity_refresh(self.id)
+        return result
     
     def update_donation_amount(self, amount):
-        self.current_amount += amount
-        if self.donation_goal and self.current_amount >= self.donation_goal:
-            self.donations_enabled = False
-            self.status = 'completed'
-        self.save()
+        updated = Post.add_donation_amount(self.id, amount)
+        if updated:
+            # Mirror the stored totals without marking them as changed, so a
+            # later save() can't write back a stale amount
+            for field in ('current_amount', 'status', 'donations_enabled', 'updated_at'):
+                self._data[field] = self._fields[field].to_python(updated.get(field))
+    
+    @classmethod
+    def increment_counters(cls, post_id, **deltas):
+        """Atomically adjust counters, e.g. Post.increment_counters(post_id, comment_count=1)"""
+        if post_id:
+            cls._get_collection().update_one({'_id': post_id}, {'$inc': deltas})
+            # Feed cards show the counters, so cached pages would serve stale counts
+            from posts.services.feed_service import invalidate_post_feed
+            invalidate_post_feed()
+    
+    @classmethod
+    def add_donation_amount(cls, post_id, amount):
+        """Atomically add to a post's donation total and close it once the goal is reached"""
+        goal_reached = {'$and': [
+            {'$gt': ['$donation_goal', 0]},
+            {'$gte': ['$current_amount', '$donation_goal']}
+        ]}
+        # A pipeline update runs as one atomic find_one_and_update, so the
+        # completion check always sees the amount this increment produced
+        updated = cls._get_collection().find_one_and_update(
+            {'_id': post_id},
+            [
+                {'$set': {'current_amount': {'$add': [{'$ifNull': ['$current_amount', 0]}, float(amount)]}}},
+                {'$set': {
+                    'donations_enabled': {'$cond': [goal_reached, False, '$donations_enabled']},
+                    'status': {'$cond': [goal_reached, 'completed', '$status']},
+                    'updated_at': datetime.utcnow()
+                }}
+            ],
+            return_document=ReturnDocument.AFTER
+        )
+        from posts.services.feed_service import invalidate_post_feed
+        invalidate_post_feed()
+        if updated and updated.get('status') == 'completed':
+            # Reaching the goal takes the post off the adoption map and out of
+            # other posts' similar-pets lists
+            from posts.services.map_service import invalidate_post_map_cells
+            from posts.services.similarity_service import schedule_similarity_refresh
+            invalidate_post_map_cells(updated.get('location_geohash'))
+            schedule_similarity_refresh(post_id)
+        return updated
+
+class PostNeighbors(Document):
+    """Most similar active posts for a post, kept by posts.services.similarity_service"""
+    id = StringField(primary_key=True)  # The post's id
+    neighbors = ListField(StringField())  # Post ids, most similar first
+    scores = ListField(FloatField())
+    updated_at = DateTimeField(default=datetime.utcnow)
+    
+    meta = {
+        'collection': 'post_neighbors',
+        'indexes': [
+            'neighbors',
+            'updated_at'
+        ]
+    }
+
+class PostTermFrequency(Document):
+    """How many of a pet type's active posts use each hashed text feature, for similarity IDF"""
+    id = StringField(primary_key=True)  # The pet type, '' for posts without one
+    document_count = IntField(default=0)
+    document_frequency = ListField(IntField())
+    updated_at = DateTimeField(default=datetime.utcnow)
+    
+    meta = {
+        'collection': 'post_term_frequencies'
+    }
+
+class FeedPreference(Document):
+    """A user's accumulated interest in post attributes, for the ranked feed"""
+    id = StringField(primary_key=True)  # The user's id
+    weights = DictField()  # 'field:value' -> summed interaction weight
+    updated_at = DateTimeField(default=datetime.utcnow)
+    
+    meta = {
+        'collection': 'feed_preferences'
+    }
 
 class PostImage(Document):
     id = StringField(primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -75,7 +216,16 @@ class PostImage(Document):
     def save(self, *args, **kwargs):
         if not self.id:
             self.id = str(uuid.uuid4())
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        from posts.services.feed_service import invalidate_post_feed
+        invalidate_post_feed()
+        return result
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from posts.services.feed_service import invalidate_post_feed
+        invalidate_post_feed()
+        return result
 
 class PostUpdate(Document):
     id = StringField(primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -91,7 +241,8 @@ class PostUpdate(Document):
         'indexes': [
             'post',
             'user',
-            'created_at'
+            'created_at',
+            ('post', '-created_at', '-id')
         ]
     }
     
@@ -115,8 +266,10 @@ class Comment(Document):
         'collection': 'comments',
         'indexes': [
             'post',
-            'user',
-            'created_at'
+            # Also serves lookups by user alone; ranking reads a user's newest comments
+            ('user', '-created_at', '-id'),
+            ('-created_at', '-id'),
+            ('post', '-created_at', '-id')
         ]
     }
     
@@ -127,7 +280,20 @@ class Comment(Document):
         if not self.id:
             self.id = str(uuid.uuid4())
         self.updated_at = datetime.utcnow()
-        return super().save(*args, **kwargs)
+        is_new = self._created
+        result = super().save(*args, **kwargs)
+        if is_new:
+            Post.increment_counters(reference_id(self, 'post'), comment_count=1)
+            from posts.services.ranking_service import record_interaction
+            record_interaction(reference_id(self, 'user'), reference_id(self, 'post'), 'comment')
+        return result
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Post.increment_counters(reference_id(self, 'post'), comment_count=-1)
+        from posts.services.ranking_service import record_interaction
+        record_interaction(reference_id(self, 'user'), reference_id(self, 'post'), 'comment', -1)
+        return result
 
 class Bookmark(Document):
     id = StringField(primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -138,9 +304,10 @@ class Bookmark(Document):
     meta = {
         'collection': 'bookmarks',
         'indexes': [
-            'user',
             'post',
-            'created_at'
+            'created_at',
+            {'fields': ('user', 'post'), 'unique': True},
+            ('user', '-created_at', '-id')
         ]
     }
     
@@ -150,4 +317,50 @@ class Bookmark(Document):
     def save(self, *args, **kwargs):
         if not self.id:
             self.id = str(uuid.uuid4())
-        return super().save(*args, **kwargs)
+        is_new = self._created
+        result = super().save(*args, **kwargs)
+        if is_new:
+            Post.increment_counters(reference_id(self, 'post'), bookmark_count=1)
+            from posts.services.ranking_service import record_interaction
+            record_interaction(reference_id(self, 'user'), reference_id(self, 'post'), 'bookmark')
+        return result
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Post.increment_counters(reference_id(self, 'post'), bookmark_count=-1)
+        from posts.services.ranking_service import record_interaction
+        record_interaction(reference_id(self, 'user'), reference_id(self, 'post'), 'bookmark', -1)
+        return result
+    
+    @property
+    def post_id(self):
+        return reference_id(self, 'post')
+    
+    @classmethod
+    def add(cls, user_id, post_id):
+        """Bookmark a post in one upsert; returns True only if this call created it"""
+        try:
+            result = cls._get_collection().update_one(
+                {'user': user_id, 'post': post_id},
+                {'$setOnInsert': {'_id': str(uuid.uuid4()), 'created_at': datetime.utcnow()}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent request inserted the same bookmark first
+            return False
+        created = result.upserted_id is not None
+        if created:
+            Post.increment_counters(post_id, bookmark_count=1)
+            from posts.services.ranking_service import record_interaction
+            record_interaction(user_id, post_id, 'bookmark')
+        return created
+    
+    @classmethod
+    def remove(cls, user_id, post_id):
+        """Remove a bookmark in one delete; returns True only if this call removed it"""
+        removed = cls._get_collection().delete_one({'user': user_id, 'post': post_id}).deleted_count > 0
+        if removed:
+            Post.increment_counters(post_id, bookmark_count=-1)
+            from posts.services.ranking_service import record_interaction
+            record_interaction(user_id, post_id, 'bookmark', -1)
+        return removed
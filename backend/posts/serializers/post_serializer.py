@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from posts.models import Post, PostImage, PostUpdate, Comment, Bookmark
-from users.serializers.user_serializer import UserSerializer
+from posts.models import Post, PostImage, PostUpdate, Comment
+from users.serializers.user_serializer import UserSerializer, UserCardSerializer
+from utils.fieldsets import SparseFieldsetMixin
 from decimal import Decimal
 
 class PostImageSerializer(serializers.Serializer):
@@ -9,7 +10,7 @@ class PostImageSerializer(serializers.Serializer):
     caption = serializers.CharField(required=False, allow_blank=True)
     uploaded_at = serializers.DateTimeField(read_only=True)
 
-class PostSerializer(serializers.Serializer):
+class PostSerializer(SparseFieldsetMixin, serializers.Serializer):
     id = serializers.CharField(read_only=True)
     user = UserSerializer(read_only=True)
     type = serializers.ChoiceField(choices=['adoption', 'donation'])
@@ -19,10 +20,14 @@ class PostSerializer(serializers.Serializer):
     pet_age = serializers.IntegerField(required=False, min_value=0)
     pet_size = serializers.ChoiceField(choices=['small', 'medium', 'large'], required=False)
     pet_species = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    location = serializers.CharField(max_length=255, required=False, allow_blank=True)
     donation_goal = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, min_value=Decimal('0'))
     current_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     status = serializers.CharField(max_length=20, read_only=True)
     donations_enabled = serializers.BooleanField(read_only=True)
+    comment_count = serializers.IntegerField(read_only=True)
+    bookmark_count = serializers.IntegerField(read_only=True)
+    donor_count = serializers.IntegerField(read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
     updated_at = serializers.DateTimeField(read_only=True)
     images = PostImageSerializer(many=True, read_only=True)
@@ -42,6 +47,15 @@ class PostSerializer(serializers.Serializer):
         post.save()
         return post
 
+class PostCardSerializer(PostSerializer):
+    """Slim post representation for feed cards"""
+    user = UserCardSerializer(read_only=True)
+    default_fields = (
+        'id', 'user', 'type', 'title', 'pet_type', 'pet_age', 'pet_size', 'pet_species', 'location',
+        'donation_goal', 'current_amount', 'status', 'donations_enabled',
+        'comment_count', 'bookmark_count', 'donor_count', 'created_at', 'images'
+    )
+
 class PostUpdateSerializer(serializers.Serializer):
     id = serializers.CharField(read_only=True)
     post = serializers.CharField()
@@ -51,6 +65,10 @@ class PostUpdateSerializer(serializers.Serializer):
     update_type = serializers.ChoiceField(choices=['text', 'image', 'both'], read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
 
+class PostUpdateListSerializer(PostUpdateSerializer):
+    """Post update with a lightweight author, for post timelines"""
+    user = UserCardSerializer(read_only=True)
+
 class CommentSerializer(serializers.Serializer):
     id = serializers.CharField(read_only=True)
     post = serializers.CharField()
@@ -69,16 +87,12 @@ class CommentSerializer(serializers.Serializer):
         comment.save()
         return comment
 
+class CommentListSerializer(CommentSerializer):
+    """Comment with a lightweight author, for paginated comment threads"""
+    user = UserCardSerializer(read_only=True)
+
 class BookmarkSerializer(serializers.Serializer):
     id = serializers.CharField(read_only=True)
     user = UserSerializer(read_only=True)
-    post = serializers.CharField()
+    post = serializers.CharField(source='post_id', read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
-
-    def create(self, validated_data):
-        user = self.context.get('user')
-        if not user:
-            raise serializers.ValidationError("User is required")
-        
-        validated_data['user'] = user
-        return Bookmark(**validated_data)
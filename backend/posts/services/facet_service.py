@@ -0,0 +1,150 @@
+from datetime import datetime
+from django.conf import settings
+from posts.models import Post
+from posts.services.feed_service import serialize_posts
+from utils.cache import TTLCache
+from utils.pagination import decode_cursor, encode_cursor, get_page_size
+
+FACET_FIELDS = ('type', 'pet_type', 'pet_size', 'pet_species')
+
+# (label, lower bound inclusive, upper bound exclusive) for the pet_age facet
+AGE_RANGES = (
+    ('0-1', 0, 1),
+    ('1-3', 1, 3),
+    ('3-7', 3, 7),
+    ('7+', 7, None),
+)
+
+# Facet counts keyed by (status, filters); the page itself is never cached
+_facet_cache = TTLCache(
+    maxsize=getattr(settings, 'POST_FACET_CACHE_SIZE', 512),
+    ttl=getattr(settings, 'POST_FACET_CACHE_TTL', 30)
+)
+
+class InvalidFacetFilter(ValueError):
+    """Raised when a facet filter value cannot be applied"""
+
+def parse_facet_filters(params):
+    """Read the facet filters from query params; each accepts comma-separated values"""
+    filters = {}
+    for field in FACET_FIELDS + ('pet_age',):
+        raw = params.get(field)
+        if not raw:
+            continue
+        values = sorted({value.strip() for value in raw.split(',') if value.strip()})
+        if field == 'pet_age':
+            labels = {label for label, _, _ in AGE_RANGES}
+            unknown = [value for value in values if value not in labels]
+            if unknown:
+                raise InvalidFacetFilter(f"Invalid pet_age range: {', '.join(unknown)}")
+        if values:
+            filters[field] = values
+    return filters
+
+def _age_condition(labels):
+    ranges = []
+    for label, low, high in AGE_RANGES:
+        if label in labels:
+            bounds = {'$gte': low}
+            if high is not None:
+                bounds['$lt'] = high
+            ranges.append({'pet_age': bounds})
+    return ranges[0] if len(ranges) == 1 else {'$or': ranges}
+
+def build_match(filters, exclude=None):
+    """Mongo conditions for every active filter except `exclude`"""
+    conditions = []
+    for field, values in filters.items():
+        if field == exclude:
+            continue
+        if field == 'pet_age':
+            conditions.append(_age_condition(values))
+        else:
+            conditions.append({field: values[0]} if len(values) == 1 else {field: {'$in': values}})
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {'$and': conditions}
+
+def _facet_pipeline(field, filters):
+    # Each facet ignores its own filter, so the other options of a selected
+    # facet keep showing how many posts picking them would add
+    stages = []
+    match = build_match(filters, exclude=field)
+    if match:
+        stages.append({'$match': match})
+    if field == 'pet_age':
+        stages.append({'$bucket': {
+            'groupBy': '$pet_age',
+            'boundaries': [low for _, low, _ in AGE_RANGES] + [float('inf')],
+            'default': 'unknown',
+            'output': {'count': {'$sum': 1}}
+        }})
+    else:
+        stages.append({'$group': {'_id': f'${field}', 'count': {'$sum': 1}}})
+        stages.append({'$sort': {'count': -1, '_id': 1}})
+    return stages
+
+def _format_facets(raw):
+    bucket_labels = {low: label for label, low, _ in AGE_RANGES}
+    facets = {}
+    for field in FACET_FIELDS:
+        facets[field] = [
+            {'value': row['_id'], 'count': row['count']}
+            for row in raw[field] if row['_id'] not in (None, '')
+        ]
+    facets['pet_age'] = [
+        {'value': bucket_labels[row['_id']], 'count': row['count']}
+        for row in raw['pet_age'] if row['_id'] in bucket_labels
+    ]
+    facets['total'] = raw['total'][0]['count'] if raw['total'] else 0
+    return facets
+
+def _page_match(filters, cursor):
+    match = build_match(filters)
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        after = {'$or': [
+            {'created_at': {'$lt': created_at}},
+            {'created_at': created_at, '_id': {'$lt': post_id}}
+        ]}
+        match = {'$and': [match, after]} if match else after
+    return match
+
+def browse_posts(request, status_filter='active'):
+    """Return one page of filtered posts, the facet counts and the next-page cursor.
+
+    On a cache miss the page, the total and every facet's counts come from a
+    single $facet aggregation; while the counts are cached only the page is queried.
+    """
+    filters = parse_facet_filters(request.GET)
+    limit = get_page_size(request)
+    page_match = _page_match(filters, request.GET.get('cursor'))
+    page_stages = [
+        {'$sort': {'created_at': -1, '_id': -1}},
+        {'$limit': limit + 1}
+    ]
+    if page_match:
+        page_stages.insert(0, {'$match': page_match})
+
+    cache_key = (status_filter, tuple((field, tuple(values)) for field, values in sorted(filters.items())))
+    facets = _facet_cache.get(cache_key)
+    collection = Post._get_collection()
+
+    if facets is None:
+        facet_stages = {field: _facet_pipeline(field, filters) for field in FACET_FIELDS + ('pet_age',)}
+        match = build_match(filters)
+        facet_stages['total'] = ([{'$match': match}] if match else []) + [{'$count': 'count'}]
+        facet_stages['page'] = page_stages
+        raw = next(collection.aggregate([
+            {'$match': {'status': status_filter}},
+            {'$facet': facet_stages}
+        ]))
+        documents = raw.pop('page')
+        facets = _format_facets(raw)
+        _facet_cache.set(cache_key, facets)
+    else:
+        documents = list(collection.aggregate([{'$match': {'status': status_filter}}] + page_stages))
+
+    posts = [Post._from_son(document) for document in documents]
+    next_cursor = encode_cursor(posts[limit - 1]) if len(posts) > limit else None
+    return serialize_posts(posts[:limit]), facets, next_cursor
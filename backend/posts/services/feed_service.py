@@ -0,0 +1,61 @@
+from collections import defaultdict
+from posts.models import PostImage, Bookmark
+from posts.serializers.post_serializer import PostSerializer, PostImageSerializer
+from users.models import User
+from utils.fieldsets import nested_projection
+from utils.helpers import prefetch_references
+from utils.response_cache import get_response_cache
+
+# Tag carried by every cached feed response; any post write invalidates it
+POST_FEED_TAG = 'post-feed'
+
+def load_post_images(post_ids):
+    """Fetch the images for many posts in one query, grouped by post id"""
+    images_by_post = defaultdict(list)
+    if not post_ids:
+        return images_by_post
+
+    # no_dereference keeps image.post as a DBRef so grouping doesn't fetch the post again
+    images = PostImage.objects(post__in=list(post_ids)).no_dereference().order_by('uploaded_at')
+    for image in images:
+        images_by_post[image.post.id].append(image)
+    return images_by_post
+
+def serialize_posts(posts, serializer_class=PostSerializer, fields=None):
+    """Serialize posts with their owners and images using one query per collection"""
+    posts = list(posts)
+    if not posts:
+        return []
+
+    if fields is None or 'user' in fields:
+        prefetch_references(posts, 'user', User, only=nested_projection(serializer_class, 'user'))
+    include_images = fields is None or 'images' in fields
+    images_by_post = load_post_images([post.id for post in posts]) if include_images else {}
+
+    posts_data = serializer_class(posts, many=True, fields=fields).data
+    if include_images:
+        for post, post_data in zip(posts, posts_data):
+            post_data['images'] = PostImageSerializer(images_by_post.get(post.id, []), many=True).data
+    return posts_data
+
+def bookmarked_post_ids(user, post_ids):
+    """Which of post_ids the user has bookmarked, answered from the (user, post) index"""
+    if not post_ids:
+        return set()
+    rows = Bookmark._get_collection().find(
+        {'user': user.id, 'post': {'$in': list(post_ids)}},
+        {'post': 1, '_id': 0}
+    )
+    return {row['post'] for row in rows}
+
+def serialize_post(post):
+    """Serialize a single post with its owner and images"""
+    return serialize_posts([post])[0]
+
+def get_cached_feed_page(cache_key, build):
+    """Return a feed page from the shared response cache, building it on a miss"""
+    return get_response_cache().get_or_build(cache_key, [POST_FEED_TAG], build)
+
+def invalidate_post_feed():
+    """Retire every cached feed response after a post, image, counter or donation total changes"""
+    get_response_cache().invalidate_tags(POST_FEED_TAG)
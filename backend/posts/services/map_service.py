@@ -0,0 +1,102 @@
+import math
+import re
+from posts.models import Post
+from utils.geo import GEOHASH_PRECISION, geohash_bounds, geohash_cell_size, geohash_cover
+from utils.response_cache import get_response_cache
+
+# Carried by every cached map tile; invalidating it retires all of them
+POST_MAP_TAG = 'post-map'
+MAX_ZOOM = 20
+# Tiles are also tagged with the geohash cells they cover, at the precision
+# whose cells are about a tile wide; a post change retires its cell at every
+# precision up to this one, which reaches the tiles of every zoom level
+MAX_TAG_PRECISION = 7
+
+class InvalidTile(ValueError):
+    """Raised for tile coordinates outside the map"""
+
+def tile_bounds(zoom, x, y):
+    """(west, south, east, north) in degrees of a web mercator tile"""
+    if not 0 <= zoom <= MAX_ZOOM or not (0 <= x < 2 ** zoom and 0 <= y < 2 ** zoom):
+        raise InvalidTile('Invalid tile coordinates')
+    n = 2 ** zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, latitude(y + 1), (x + 1) / n * 360 - 180, latitude(y)
+
+def cluster_precision(zoom):
+    """Geohash precision of the clusters at a zoom level, about 8 cells across a tile"""
+    return next((precision for precision in range(1, GEOHASH_PRECISION + 1) if geohash_cell_size(precision)[0] <= 360 / 2 ** (zoom + 3)), GEOHASH_PRECISION)
+
+def tag_precision(zoom):
+    """Geohash precision of the cells a tile is tagged with, whose width is at least the tile's"""
+    return max((precision for precision in range(1, MAX_TAG_PRECISION + 1) if geohash_cell_size(precision)[0] >= 360 / 2 ** zoom), default=1)
+
+def tile_tags(zoom, x, y):
+    west, south, east, north = tile_bounds(zoom, x, y)
+    return [POST_MAP_TAG] + [f'{POST_MAP_TAG}:{cell}' for cell in geohash_cover(west, south, east, north, tag_precision(zoom))]
+
+def build_clusters(zoom, x, y, post_type=None):
+    """Group the active posts in a tile into geohash cells with counts and their newest post"""
+    west, south, east, north = tile_bounds(zoom, x, y)
+    precision = cluster_precision(zoom)
+    cells = geohash_cover(west, south, east, north, tag_precision(zoom))
+
+    # Anchored prefixes are ranges on the (status, location_geohash) index
+    match = {'status': 'active', 'location_geohash': {'$in': [re.compile(f'^{cell}') for cell in cells]}}
+    if post_type:
+        match['type'] = post_type
+    pipeline = [
+        {'$match': match},
+        {'$project': {'location_geohash': 1, 'location_point': 1, 'created_at': 1}},
+        {'$sort': {'created_at': -1}},
+        {'$group': {
+            '_id': {'$substrBytes': ['$location_geohash', 0, precision]},
+            'count': {'$sum': 1},
+            'lng': {'$avg': {'$arrayElemAt': ['$location_point.coordinates', 0]}},
+            'lat': {'$avg': {'$arrayElemAt': ['$location_point.coordinates', 1]}},
+            'post': {'$first': '$_id'}
+        }}
+    ]
+    rows = []
+    for row in Post._get_collection().aggregate(pipeline, allowDiskUse=True):
+        # The tagged cells overhang the tile; keep only clusters inside it
+        cell_west, cell_south, cell_east, cell_north = geohash_bounds(row['_id'])
+        if cell_west < east and cell_east > west and cell_south < north and cell_north > south:
+            rows.append(row)
+
+    posts = Post.objects.only('id', 'title', 'type', 'pet_type', 'pet_species').in_bulk([row['post'] for row in rows])
+    clusters = []
+    for row in sorted(rows, key=lambda row: row['_id']):
+        post = posts.get(row['post'])
+        clusters.append({
+            'geohash': row['_id'],
+            'count': row['count'],
+            'lat': round(row['lat'], 6),
+            'lng': round(row['lng'], 6),
+            'post': {
+                'id': post.id,
+                'title': post.title,
+                'type': post.type,
+                'pet_type': post.pet_type,
+                'pet_species': post.pet_species
+            } if post else None
+        })
+    return {'zoom': zoom, 'precision': precision, 'clusters': clusters}
+
+def get_post_map_tile(zoom, x, y, post_type=None):
+    """Return a tile's clusters from the shared response cache, building them on a miss"""
+    key = f'{POST_MAP_TAG}:{zoom}/{x}/{y}:{post_type or "*"}'
+    return get_response_cache().get_or_build(key, tile_tags(zoom, x, y), lambda: build_clusters(zoom, x, y, post_type))
+
+def invalidate_post_map_cells(*geohashes):
+    """Retire the cached tiles covering the cells these post geohashes fall in"""
+    tags = {f'{POST_MAP_TAG}:{geohash[:precision]}' for geohash in geohashes if geohash for precision in range(1, MAX_TAG_PRECISION + 1)}
+    if tags:
+        get_response_cache().invalidate_tags(*tags)
+
+def invalidate_post_map():
+    """Retire every cached map tile, e.g. after posts were removed or geocoded in bulk"""
+    get_response_cache().invalidate_tags(POST_MAP_TAG)
@@ -0,0 +1,217 @@
+import base64
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+from django.conf import settings
+from donations.models import Donation
+from posts.models import Post, Comment, Bookmark, FeedPreference
+from posts.services.facet_service import AGE_RANGES
+from utils.cache import TTLCache
+from utils.log import get_logger
+from utils.pagination import InvalidCursor, get_page_size
+
+logger = get_logger(__name__)
+
+PREFERENCE_FIELDS = ('type', 'pet_type', 'pet_species', 'pet_size', 'pet_age')
+INTERACTION_WEIGHTS = {'bookmark': 3.0, 'comment': 1.0, 'donation': 4.0}
+# Interactions of each kind read when a user's preferences are first built
+HISTORY_LIMIT = 200
+SCORE_WEIGHTS = {'affinity': 0.6, 'recency': 0.25, 'popularity': 0.15}
+RECENCY_HALF_LIFE_HOURS = 72
+CANDIDATE_FIELDS = {field: 1 for field in (*PREFERENCE_FIELDS, 'created_at', 'comment_count', 'bookmark_count', 'donor_count')}
+
+# Preference weights by user id; a user's own interactions drop their entry
+_preference_cache = TTLCache(
+    maxsize=getattr(settings, 'FEED_PREFERENCE_CACHE_SIZE', 4096),
+    ttl=getattr(settings, 'FEED_PREFERENCE_CACHE_TTL', 300)
+)
+
+def post_features(post):
+    """'field:value' keys describing a raw post document"""
+    features = []
+    for field in PREFERENCE_FIELDS:
+        value = post.get(field)
+        if value is None or value == '':
+            continue
+        if field == 'pet_age':
+            value = next((label for label, low, high in AGE_RANGES if value >= low and (high is None or value < high)), None)
+            if value is None:
+                continue
+        # Keys become field paths in $inc updates, which can't contain . or $
+        features.append(f"{field}:{str(value).strip().lower().replace('.', '').replace('$', '')}")
+    return features
+
+def build_preference_weights(user_id):
+    """Sum the features of the posts a user recently bookmarked, commented on or donated to"""
+    newest_first = [('created_at', -1), ('_id', -1)]
+    interactions = [
+        ('bookmark', Bookmark._get_collection().find({'user': user_id}, {'post': 1}).sort(newest_first).limit(HISTORY_LIMIT)),
+        ('comment', Comment._get_collection().find({'user': user_id}, {'post': 1}).sort(newest_first).limit(HISTORY_LIMIT)),
+        ('donation', Donation._get_collection().find({'donor': user_id, 'status': 'verified'}, {'post': 1}).sort(newest_first).limit(HISTORY_LIMIT)),
+    ]
+    post_kinds = defaultdict(list)
+    for kind, rows in interactions:
+        for row in rows:
+            post_kinds[row.get('post')].append(kind)
+
+    weights = defaultdict(float)
+    for post in Post._get_collection().find({'_id': {'$in': [post_id for post_id in post_kinds if post_id]}}, CANDIDATE_FIELDS):
+        weight = sum(INTERACTION_WEIGHTS[kind] for kind in post_kinds[post['_id']])
+        for feature in post_features(post):
+            weights[feature] += weight
+    return dict(weights)
+
+def get_preference_weights(user_id):
+    """Return a user's preference weights from the cache, the database, or their history"""
+    weights = _preference_cache.get(user_id)
+    if weights is not None:
+        return weights
+    stored = FeedPreference._get_collection().find_one({'_id': user_id}, {'weights': 1})
+    if stored is not None:
+        weights = stored.get('weights', {})
+    else:
+        weights = build_preference_weights(user_id)
+        FeedPreference._get_collection().update_one(
+            {'_id': user_id},
+            {'$set': {'weights': weights, 'updated_at': datetime.utcnow()}},
+            upsert=True
+        )
+    _preference_cache.set(user_id, weights)
+    return weights
+
+def record_interaction(user_id, post_id, kind, sign=1):
+    """Fold one bookmark, comment or donation (or its removal) into the user's stored weights.
+
+    Users without stored weights are skipped: their first ranked feed builds
+    the weights from history, which already includes this interaction.
+    """
+    if not user_id or not post_id:
+        return
+    post = Post._get_collection().find_one({'_id': post_id}, CANDIDATE_FIELDS)
+    if not post:
+        return
+    weight = sign * INTERACTION_WEIGHTS[kind]
+    FeedPreference._get_collection().update_one(
+        {'_id': user_id},
+        {'$inc': {f'weights.{feature}': weight for feature in post_features(post)}, '$set': {'updated_at': datetime.utcnow()}}
+    )
+    _preference_cache.delete(user_id)
+
+def score_candidates(candidates, weights, now):
+    """Score raw candidate posts for a user: attribute affinity, recency and popularity.
+
+    A feature's affinity is its share of the user's weight within its field,
+    so someone who bookmarked nine dogs and one cat scores dog posts at 0.9
+    on pet_type; the fields are averaged.
+    """
+    field_totals = defaultdict(float)
+    for feature, weight in weights.items():
+        if weight > 0:
+            field_totals[feature.split(':', 1)[0]] += weight
+    columns = {feature: index for index, feature in enumerate(feature for feature, weight in weights.items() if weight > 0)}
+    shares = np.array([weights[feature] / field_totals[feature.split(':', 1)[0]] for feature in columns], dtype=np.float32)
+
+    count = len(candidates)
+    matches = np.zeros((count, len(columns)), dtype=np.float32)
+    created = np.empty(count, dtype=np.float64)
+    engagement = np.empty(count, dtype=np.float32)
+    for row, post in enumerate(candidates):
+        for feature in post_features(post):
+            column = columns.get(feature)
+            if column is not None:
+                matches[row, column] = 1
+        created[row] = post['created_at'].timestamp()
+        engagement[row] = (post.get('comment_count') or 0) + (post.get('bookmark_count') or 0) + (post.get('donor_count') or 0)
+
+    affinity = matches @ shares / len(PREFERENCE_FIELDS) if columns else np.zeros(count, dtype=np.float32)
+    age_hours = np.maximum(now.timestamp() - created, 0) / 3600
+    recency = np.power(0.5, age_hours / RECENCY_HALF_LIFE_HOURS)
+    popularity = np.log1p(np.maximum(engagement, 0))
+    if count and popularity.max() > 0:
+        popularity /= popularity.max()
+    return (
+        SCORE_WEIGHTS['affinity'] * affinity
+        + SCORE_WEIGHTS['recency'] * recency
+        + SCORE_WEIGHTS['popularity'] * popularity
+    )
+
+def encode_rank_cursor(offset, candidate_limit):
+    """Build an opaque cursor pointing at a position in the ranked candidates.
+
+    It carries the candidate count the first page was ranked over, so later
+    pages rank the same candidates even if the budget has moved since.
+    """
+    return base64.urlsafe_b64encode(json.dumps(['rank', offset, candidate_limit]).encode()).decode()
+
+def decode_rank_cursor(cursor):
+    try:
+        marker, offset, candidate_limit = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if marker != 'rank' or not isinstance(offset, int) or offset < 0 or not isinstance(candidate_limit, int) or candidate_limit < 1:
+            raise ValueError(cursor)
+        return offset, min(candidate_limit, settings.FEED_RANKING_CANDIDATES)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+class CandidateBudget:
+    """How many candidates a ranking reads, adapted to keep it within FEED_RANKING_BUDGET_MS.
+
+    An over-budget ranking shrinks the count in proportion to the overrun,
+    down to FEED_RANKING_MIN_CANDIDATES; rankings well inside the budget let
+    it grow back towards FEED_RANKING_CANDIDATES a quarter at a time.
+    """
+
+    def __init__(self):
+        self._limit = None
+        self._lock = threading.Lock()
+
+    def limit(self):
+        return min(self._limit or settings.FEED_RANKING_CANDIDATES, settings.FEED_RANKING_CANDIDATES)
+
+    def observe(self, elapsed_ms, candidates):
+        budget = settings.FEED_RANKING_BUDGET_MS
+        maximum = settings.FEED_RANKING_CANDIDATES
+        minimum = min(settings.FEED_RANKING_MIN_CANDIDATES, maximum)
+        with self._lock:
+            current = self.limit()
+            if elapsed_ms > budget:
+                self._limit = max(minimum, min(current, int(candidates * budget / elapsed_ms)))
+            elif elapsed_ms < budget / 2 and current < maximum:
+                self._limit = min(maximum, current + max(current // 4, 1))
+            return self.limit()
+
+_candidate_budget = CandidateBudget()
+
+def rank_posts(user, request, post_type=None, status_filter='active'):
+    """Return one page of post ids with this status ranked for the user, and the cursor for the next page.
+
+    Candidates are the newest posts with the status, as many as the candidate
+    budget allows, read with one projected range scan on the
+    (status, -created_at, -id) index.
+    """
+    started = time.perf_counter()
+    limit = get_page_size(request)
+    cursor = request.GET.get('cursor')
+    offset, candidate_limit = decode_rank_cursor(cursor) if cursor else (0, _candidate_budget.limit())
+
+    weights = get_preference_weights(user.id)
+    query = {'status': status_filter}
+    if post_type:
+        query['type'] = post_type
+    candidates = list(
+        Post._get_collection().find(query, CANDIDATE_FIELDS)
+        .sort([('created_at', -1), ('_id', -1)])
+        .limit(candidate_limit)
+    )
+    scores = score_candidates(candidates, weights, datetime.utcnow())
+    # Stable, so equally scored posts stay newest first
+    order = np.argsort(-scores, kind='stable')[offset:offset + limit]
+    next_cursor = encode_rank_cursor(offset + limit, candidate_limit) if offset + limit < len(candidates) else None
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    next_limit = _candidate_budget.observe(elapsed_ms, len(candidates))
+    if elapsed_ms > settings.FEED_RANKING_BUDGET_MS:
+        logger.warning("Ranked feed took %.1f ms for %d candidates; next rankings read %d", elapsed_ms, len(candidates), next_limit)
+    return [candidates[row]['_id'] for row in order], next_cursor
@@ -0,0 +1,110 @@
+import base64
+import json
+import re
+from django.utils.html import escape
+from posts.models import Post
+from posts.services.feed_service import serialize_posts
+from utils.pagination import InvalidCursor, get_page_size
+
+SNIPPET_LENGTH = 160
+
+def encode_search_cursor(score, post_id):
+    """Build an opaque cursor pointing just past the result with this score and id"""
+    payload = json.dumps([score, str(post_id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_search_cursor(cursor):
+    """Turn a search cursor back into its (score, id) position"""
+    try:
+        score, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), str(post_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+def query_terms(query):
+    """Words from a search query that should be highlighted, skipping negated terms"""
+    terms = []
+    for word in re.findall(r'-?\w+', query.lower()):
+        if word.startswith('-'):
+            continue
+        # The text index stems words, so highlight "puppies" for "puppy" and vice versa
+        if len(word) > 3 and word.endswith('s'):
+            word = word[:-1]
+        if len(word) > 3 and word.endswith('ie'):
+            word = word[:-2]
+        terms.append(word)
+    return terms
+
+def highlight(text, terms, length=SNIPPET_LENGTH):
+    """Cut a window of text around the first matching term and wrap matches in <mark>"""
+    if not text:
+        return ''
+    if not terms:
+        return escape(text[:length])
+
+    pattern = re.compile(r'\b(?:%s)\w*' % '|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    match = pattern.search(text)
+    start = 0
+    if match and match.start() > length // 3:
+        # Start on a word boundary a little before the first match
+        start = text.rfind(' ', 0, match.start() - length // 3) + 1
+    snippet = text[start:start + length]
+
+    parts = ['…'] if start > 0 else []
+    position = 0
+    for found in pattern.finditer(snippet):
+        parts.append(escape(snippet[position:found.start()]))
+        parts.append(f'<mark>{escape(found.group())}</mark>')
+        position = found.end()
+    parts.append(escape(snippet[position:]))
+    if start + length < len(text):
+        parts.append('…')
+    return ''.join(parts)
+
+def search_posts(query, request, post_type=None, status_filter='active'):
+    """Return one relevance-ranked page of posts matching query and the cursor for the next page.
+
+    Matching and scoring run on the weighted text index; pages are keyed on
+    (score, id) so later pages don't re-sort and skip the earlier results.
+    """
+    limit = get_page_size(request)
+    match = {'$text': {'$search': query}, 'status': status_filter}
+    if post_type:
+        match['type'] = post_type
+
+    pipeline = [
+        {'$match': match},
+        {'$addFields': {'score': {'$meta': 'textScore'}}}
+    ]
+    cursor = request.GET.get('cursor')
+    if cursor:
+        score, post_id = decode_search_cursor(cursor)
+        pipeline.append({'$match': {'$or': [
+            {'score': {'$lt': score}},
+            {'score': score, '_id': {'$lt': post_id}}
+        ]}})
+    # Fetch one extra result to know whether another page exists
+    pipeline += [
+        {'$sort': {'score': -1, '_id': -1}},
+        {'$limit': limit + 1}
+    ]
+
+    documents = list(Post._get_collection().aggregate(pipeline))
+    next_cursor = None
+    if len(documents) > limit:
+        last = documents[limit - 1]
+        next_cursor = encode_search_cursor(last['score'], last['_id'])
+    documents = documents[:limit]
+
+    scores = [document.pop('score') for document in documents]
+    posts = [Post._from_son(document) for document in documents]
+    terms = query_terms(query)
+
+    results = serialize_posts(posts)
+    for post, post_data, score in zip(posts, results, scores):
+        post_data['score'] = round(score, 4)
+        post_data['highlights'] = {
+            'title': highlight(post.title, terms, length=len(post.title or '')),
+            'description': highlight(post.description, terms)
+        }
+    return results, next_cursor
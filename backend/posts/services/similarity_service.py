@@ -0,0 +1,329 @@
+import re
+import tempfile
+import threading
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import islice
+import numpy as np
+from django.conf import settings
+from pymongo import UpdateOne
+from posts.models import Post, PostNeighbors, PostTermFrequency
+from posts.services.facet_service import AGE_RANGES
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+SPECIES_FEATURES = 64
+TEXT_FEATURES = 1024
+PET_SIZES = ('small', 'medium', 'large')
+# Share of the similarity each attribute block contributes. Posts are only
+# compared within their pet_type, so the type itself needs no block.
+BLOCK_WEIGHTS = {'species': 3.0, 'size': 1.0, 'age': 1.0, 'text': 2.0}
+VECTOR_FIELDS = {'pet_type': 1, 'pet_species': 1, 'pet_size': 1, 'pet_age': 1, 'title': 1, 'description': 1}
+VECTOR_WIDTH = SPECIES_FEATURES + len(PET_SIZES) + len(AGE_RANGES) + TEXT_FEATURES
+
+def tokenize(text):
+    return re.findall(r'[a-z0-9]{2,}', (text or '').lower())
+
+def feature_index(value, features):
+    """Stable hashed bucket for a token or attribute value (hash() is salted per process)"""
+    return zlib.crc32(value.encode()) % features
+
+def age_bucket(age):
+    for index, (_, low, high) in enumerate(AGE_RANGES):
+        if age >= low and (high is None or age < high):
+            return index
+    return None
+
+def text_terms(row):
+    """Hashed text feature -> count for a post's title and description"""
+    return Counter(feature_index(token, TEXT_FEATURES) for token in tokenize(f"{row.get('title') or ''} {row.get('description') or ''}"))
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+def partition_query(pet_type):
+    return {'status': 'active', 'pet_type': pet_type}
+
+def partition_chunks(pet_type, chunk_size, projection=VECTOR_FIELDS):
+    """Yield the active posts of a pet type chunk_size raw documents at a time"""
+    cursor = Post._get_collection().find(partition_query(pet_type), projection, batch_size=chunk_size)
+    while True:
+        chunk = list(islice(cursor, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def idf_weights(document_count, document_frequency):
+    """Smoothed IDF of each hashed text feature"""
+    return (np.log((1 + document_count) / (1 + np.asarray(document_frequency, dtype=np.float64))) + 1).astype(np.float32)
+
+def build_partition_idf(pet_type, chunk_size=2048):
+    """Count text feature document frequencies over a pet type's active posts, store them and return the IDF"""
+    document_frequency = np.zeros(TEXT_FEATURES, dtype=np.int64)
+    document_count = 0
+    for chunk in partition_chunks(pet_type, chunk_size, {'title': 1, 'description': 1}):
+        for row in chunk:
+            document_frequency[list(text_terms(row))] += 1
+        document_count += len(chunk)
+    PostTermFrequency._get_collection().update_one(
+        {'_id': pet_type or ''},
+        {'$set': {
+            'document_count': document_count,
+            'document_frequency': document_frequency.tolist(),
+            'updated_at': datetime.utcnow()
+        }},
+        upsert=True
+    )
+    return idf_weights(document_count, document_frequency)
+
+def get_partition_idf(pet_type):
+    """IDF a pet type's posts are scored with, as stored by the last rebuild.
+
+    Full rebuilds and incremental refreshes share it, so a neighbor list
+    scores the same whichever path wrote it; it is built on first use.
+    """
+    stored = PostTermFrequency._get_collection().find_one({'_id': pet_type or ''})
+    if stored is None:
+        return build_partition_idf(pet_type)
+    return idf_weights(stored['document_count'], stored['document_frequency'])
+
+def vectorize(rows, idf):
+    """L2-normalised feature matrix for raw post documents.
+
+    Each block (hashed one-hot species, one-hot size and age range, hashed
+    TF-IDF of title and description) is normalised on its own and scaled by
+    the square root of its weight, so a dot product is the weighted average
+    of the per-block cosine similarities.
+    """
+    count = len(rows)
+    species = np.zeros((count, SPECIES_FEATURES), dtype=np.float32)
+    size = np.zeros((count, len(PET_SIZES)), dtype=np.float32)
+    age = np.zeros((count, len(AGE_RANGES)), dtype=np.float32)
+    text = np.zeros((count, TEXT_FEATURES), dtype=np.float32)
+
+    for index, row in enumerate(rows):
+        if row.get('pet_species'):
+            species[index, feature_index(row['pet_species'].strip().lower(), SPECIES_FEATURES)] = 1
+        if row.get('pet_size') in PET_SIZES:
+            size[index, PET_SIZES.index(row['pet_size'])] = 1
+        if row.get('pet_age') is not None:
+            bucket = age_bucket(row['pet_age'])
+            if bucket is not None:
+                age[index, bucket] = 1
+        terms = text_terms(row)
+        if terms:
+            text[index, list(terms)] = list(terms.values())
+
+    # Sublinear term counts weighted by the partition's IDF
+    text = np.log1p(text) * idf
+
+    total = sum(BLOCK_WEIGHTS.values())
+    blocks = {'species': species, 'size': size, 'age': age, 'text': text}
+    return np.hstack([normalize_rows(blocks[name]) * np.float32(np.sqrt(weight / total)) for name, weight in BLOCK_WEIGHTS.items()])
+
+def top_neighbors(vectors, targets, k, batch_size=512, chunk_size=8192):
+    """Yield (row, [(neighbor row, score), ...]) for each target row, best first.
+
+    Targets are scored batch_size at a time against chunk_size rows per matrix
+    product, keeping a running top k, so memory stays at batch_size x
+    chunk_size scores however many rows there are. vectors may be a
+    disk-backed memmap; only the rows in use are read.
+    """
+    k = min(k, len(vectors) - 1)
+    for start in range(0, len(targets), batch_size):
+        batch = np.asarray(targets[start:start + batch_size])
+        if k <= 0:
+            for row in batch:
+                yield int(row), []
+            continue
+        batch_vectors = np.asarray(vectors[batch])
+        best_rows = np.empty((len(batch), 0), dtype=np.int64)
+        best_scores = np.empty((len(batch), 0), dtype=np.float32)
+        for chunk_start in range(0, len(vectors), chunk_size):
+            chunk = np.asarray(vectors[chunk_start:chunk_start + chunk_size])
+            scores = batch_vectors @ chunk.T
+            own = np.flatnonzero((batch >= chunk_start) & (batch < chunk_start + len(chunk)))
+            scores[own, batch[own] - chunk_start] = -np.inf
+            rows = np.broadcast_to(np.arange(chunk_start, chunk_start + len(chunk)), scores.shape)
+            best_scores, best_rows = np.hstack([best_scores, scores]), np.hstack([best_rows, rows])
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        for row, neighbors, neighbor_scores in zip(batch, best_rows, best_scores):
+            yield int(row), [(int(neighbor), float(score)) for neighbor, score in zip(neighbors, neighbor_scores) if score > 0]
+
+def neighbor_update(post_id, neighbor_ids, scores, now):
+    return UpdateOne(
+        {'_id': post_id},
+        {'$set': {
+            'neighbors': list(neighbor_ids),
+            'scores': [round(score, 4) for score in scores],
+            'updated_at': now
+        }},
+        upsert=True
+    )
+
+def rebuild_partition(pet_type, k, batch_size=512, chunk_size=2048):
+    """Recompute the neighbor lists of every active post of one pet type; returns how many were written.
+
+    The IDF is recounted first, then posts are read and vectorized
+    chunk_size at a time into a temporary disk-backed matrix, so memory
+    holds the post ids, one chunk of documents and one batch's scores
+    rather than the whole partition.
+    """
+    idf = build_partition_idf(pet_type, chunk_size)
+    post_ids = []
+    with tempfile.TemporaryFile() as spill:
+        for chunk in partition_chunks(pet_type, chunk_size):
+            vectorize(chunk, idf).astype(np.float32, copy=False).tofile(spill)
+            post_ids.extend(row['_id'] for row in chunk)
+        if not post_ids:
+            return 0
+        spill.flush()
+        vectors = np.memmap(spill, dtype=np.float32, mode='r', shape=(len(post_ids), VECTOR_WIDTH))
+
+        now = datetime.utcnow()
+        operations = []
+        for row, neighbors in top_neighbors(vectors, np.arange(len(post_ids)), k, batch_size, chunk_size):
+            operations.append(neighbor_update(post_ids[row], [post_ids[neighbor] for neighbor, _ in neighbors], [score for _, score in neighbors], now))
+            if len(operations) >= 1000:
+                PostNeighbors._get_collection().bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            PostNeighbors._get_collection().bulk_write(operations, ordered=False)
+        del vectors
+    return len(post_ids)
+
+def refresh_posts(post_ids):
+    """Bring the stored neighbor lists up to date after these posts were created, edited or closed.
+
+    Closed posts lose their own list; every list that pointed at a changed
+    post is recomputed; active posts get a fresh list and are merged into the
+    lists of the candidates they now outrank.
+    """
+    post_ids = list(set(post_ids))
+    posts = Post._get_collection()
+    neighbors = PostNeighbors._get_collection()
+    k = settings.SIMILAR_POSTS_COUNT
+
+    active = {row['_id']: row for row in posts.find({'_id': {'$in': post_ids}, 'status': 'active'}, VECTOR_FIELDS)}
+    closed = [post_id for post_id in post_ids if post_id not in active]
+    if closed:
+        neighbors.delete_many({'_id': {'$in': closed}})
+    # Lists holding a changed post scored its previous version
+    affected_ids = [row['_id'] for row in neighbors.find({'neighbors': {'$in': post_ids}}, {'_id': 1}) if row['_id'] not in post_ids]
+    affected = list(posts.find({'_id': {'$in': affected_ids}, 'status': 'active'}, VECTOR_FIELDS)) if affected_ids else []
+
+    partitions = defaultdict(list)
+    for row in [*active.values(), *affected]:
+        partitions[row.get('pet_type')].append(row)
+
+    now = datetime.utcnow()
+    for pet_type, targets in partitions.items():
+        # One indexed range read on (status, pet_type, -created_at, -id)
+        candidates = list(posts.find(partition_query(pet_type), VECTOR_FIELDS).sort([('created_at', -1), ('_id', -1)]).limit(settings.SIMILAR_POSTS_CANDIDATES))
+        known = {row['_id'] for row in candidates}
+        rows = candidates + [row for row in targets if row['_id'] not in known]
+        position = {row['_id']: index for index, row in enumerate(rows)}
+        target_rows = [position[row['_id']] for row in targets]
+        vectors = vectorize(rows, get_partition_idf(pet_type))
+
+        operations = [
+            neighbor_update(rows[row]['_id'], [rows[neighbor]['_id'] for neighbor, _ in found], [score for _, score in found], now)
+            for row, found in top_neighbors(vectors, target_rows, k)
+        ]
+
+        # Merge the changed active posts into the lists of the candidates they
+        # now outrank; candidates without a list yet get one on the next rebuild
+        changed_rows = [position[row['_id']] for row in targets if row['_id'] in active]
+        if changed_rows:
+            scores = vectors[changed_rows] @ vectors.T
+            recomputed = {row['_id'] for row in targets}
+            reached = [rows[row]['_id'] for row in np.flatnonzero(scores.max(axis=0) > 0) if rows[row]['_id'] not in recomputed]
+            for entry in neighbors.find({'_id': {'$in': reached}}):
+                row = position[entry['_id']]
+                merged = dict(zip(entry['neighbors'], entry['scores']))
+                for changed, score in zip(changed_rows, scores[:, row]):
+                    if changed != row and score > 0:
+                        merged[rows[changed]['_id']] = round(float(score), 4)
+                best = sorted(merged.items(), key=lambda item: -item[1])[:k]
+                if [post_id for post_id, _ in best] != entry['neighbors']:
+                    operations.append(UpdateOne(
+                        {'_id': entry['_id']},
+                        {'$set': {'neighbors': [post_id for post_id, _ in best], 'scores': [score for _, score in best], 'updated_at': now}}
+                    ))
+        if operations:
+            neighbors.bulk_write(operations, ordered=False)
+
+class SimilarityRefresher:
+    """Applies post changes to the neighbor lists on a background thread.
+
+    Changes queued while a refresh runs are coalesced and applied together,
+    so a burst of new posts costs one candidate read per pet type.
+    """
+
+    def __init__(self):
+        self._pending = set()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, post_id):
+        with self._condition:
+            self._pending.add(str(post_id))
+            self._condition.notify()
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._work, name='similarity-refresher', daemon=True)
+                self._thread.start()
+
+    def _take(self, timeout=None):
+        with self._condition:
+            if not self._pending and not self._condition.wait_for(lambda: self._pending, timeout):
+                return []
+            pending, self._pending = self._pending, set()
+            return list(pending)
+
+    def _work(self):
+        while True:
+            post_ids = self._take(timeout=60)
+            if not post_ids:
+                continue
+            try:
+                refresh_posts(post_ids)
+            except Exception:
+                logger.exception("Error refreshing similar posts for %d posts", len(post_ids))
+
+    def process_pending(self):
+        """Apply everything queued right now on the calling thread instead of waiting for the background one"""
+        post_ids = self._take(timeout=0)
+        if post_ids:
+            refresh_posts(post_ids)
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+def get_similarity_refresher():
+    global _refresher
+    if _refresher is None:
+        with _refresher_lock:
+            if _refresher is None:
+                _refresher = SimilarityRefresher()
+    return _refresher
+
+def schedule_similarity_refresh(post_id):
+    """Queue a post whose similar-pets neighbors may have changed; returns immediately"""
+    get_similarity_refresher().schedule(post_id)
+
+def get_similar_posts(post_id):
+    """Return the stored (post, score) neighbors of a post that are still active, most similar first"""
+    entry = PostNeighbors._get_collection().find_one({'_id': post_id})
+    if not entry:
+        return []
+    posts = {post.id: post for post in Post.objects(id__in=entry['neighbors'], status='active')}
+    return [(posts[neighbor], score) for neighbor, score in zip(entry['neighbors'], entry['scores']) if neighbor in posts]
@@ -0,0 +1,88 @@
+import base64
+import heapq
+import json
+from itertools import islice
+from datetime import datetime
+from mongoengine import Q
+from donations.models import Donation
+from donations.serializers.donation_serializer import DonationCardSerializer
+from posts.models import Post, PostUpdate, Comment
+from posts.serializers.post_serializer import PostUpdateListSerializer, CommentListSerializer
+from users.models import User
+from utils.fieldsets import nested_projection
+from utils.helpers import prefetch_references
+from utils.pagination import InvalidCursor, get_page_size
+
+# Each source is read newest-first from its (post, -created_at, -id) index.
+# Events are ordered by (created_at, type, id) so ties between sources still
+# have a single, stable position for the cursor to point at.
+TIMELINE_SOURCES = {
+    'comment': (Comment, {}, CommentListSerializer),
+    'donation': (Donation, {'status': 'verified'}, DonationCardSerializer),
+    'update': (PostUpdate, {}, PostUpdateListSerializer),
+}
+
+def encode_timeline_cursor(created_at, event_type, event_id):
+    """Build an opaque cursor pointing just past the given timeline event"""
+    payload = json.dumps([created_at.isoformat(), event_type, str(event_id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_timeline_cursor(cursor):
+    """Turn a timeline cursor back into its (created_at, type, id) position"""
+    try:
+        created_at, event_type, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if event_type not in TIMELINE_SOURCES:
+            raise ValueError(event_type)
+        return datetime.fromisoformat(created_at), event_type, str(event_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+def events_after(event_type, position):
+    """Filter selecting a source's events that sort after the cursor position"""
+    created_at, cursor_type, cursor_id = position
+    if event_type < cursor_type:
+        return Q(created_at__lte=created_at)
+    if event_type > cursor_type:
+        return Q(created_at__lt=created_at)
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=cursor_id)
+
+def read_source(event_type, post_id, position, limit):
+    """Up to limit newest events of one type, as (created_at, type, id, document) tuples"""
+    document_cls, query, _ = TIMELINE_SOURCES[event_type]
+    queryset = document_cls.objects(post=post_id, **query)
+    if position:
+        queryset = queryset.filter(events_after(event_type, position))
+    documents = queryset.order_by('-created_at', '-id').limit(limit)
+    return [(document.created_at, event_type, str(document.id), document) for document in documents]
+
+def get_post_timeline(post_id, request):
+    """Return one newest-first page of a post's updates, comments and donations.
+
+    Every source contributes at most limit + 1 events from an index range scan
+    and heapq.merge interleaves them, so a page reads a bounded number of
+    documents however long the post's history is.
+    """
+    limit = get_page_size(request)
+    cursor = request.GET.get('cursor')
+    position = decode_timeline_cursor(cursor) if cursor else None
+
+    sources = [read_source(event_type, post_id, position, limit + 1) for event_type in TIMELINE_SOURCES]
+    merged = heapq.merge(*sources, key=lambda event: event[:3], reverse=True)
+    # One extra event tells whether another page exists
+    events = list(islice(merged, limit + 1))
+    next_cursor = encode_timeline_cursor(*events[limit - 1][:3]) if len(events) > limit else None
+    events = events[:limit]
+
+    # Authors and the (shared) post are resolved with one lookup per field
+    by_type = {event_type: [event[3] for event in events if event[1] == event_type] for event_type in TIMELINE_SOURCES}
+    author_only = nested_projection(CommentListSerializer, 'user')
+    prefetch_references(by_type['comment'] + by_type['update'], 'user', User, only=author_only)
+    prefetch_references(by_type['donation'], 'donor', User, only=author_only)
+    prefetch_references(by_type['comment'] + by_type['update'], 'post', Post, only=('id', 'title'))
+
+    serialized = {}
+    for event_type, documents in by_type.items():
+        serializer_class = TIMELINE_SOURCES[event_type][2]
+        serialized.update(zip((id(document) for document in documents), serializer_class(documents, many=True).data))
+    results = [{'type': event_type, 'data': serialized[id(document)]} for _, event_type, _, document in events]
+    return results, next_cursor
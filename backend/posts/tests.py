@@ -1,3 +1,391 @@
-from django.test import TestCase
+import copy
+import math
+from datetime import datetime, timedelta
+from unittest import mock
+import mongomock
+from django.conf import settings
+from django.test import override_settings
+from donations.models import Donation
+from posts.models import Bookmark, Comment, FeedPreference, Post, PostImage
+from posts.services import ranking_service
+from posts.services.search_service import decode_search_cursor, encode_search_cursor, highlight, query_terms
+from posts.views.post_views import get_posts, nearby_posts, search_posts
+from users.views.user_views import get_all_posts
+from utils.geo import geohash_encode
+from utils.benchmark import best_time
+from utils.testing import MongoTestCase, count_queries, run_in_threads
 
-# Create your tests here.
+class FeedQueryCountTests(MongoTestCase):
+    """Serializing a feed page costs the same number of queries whatever its size"""
+
+    def setUp(self):
+        super().setUp()
+        owners = [self.make_user(f'owner{index}') for index in range(5)]
+        for index in range(60):
+            post = Post(user=owners[index % len(owners)], type='adoption', title=f'Pet {index}')
+            post.save()
+            for image in range(2):
+                PostImage(post=post, image_url=f'post_images/{index}-{image}.jpg').save()
+
+    def feed_queries(self, view, limit, **headers):
+        with count_queries() as queries:
+            response = view(self.factory.get('/api/posts/', {'limit': limit}, **headers))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data['data']), limit)
+        return queries['count']
+
+    def test_feed_query_count_is_constant_as_limit_grows(self):
+        counts = {limit: self.feed_queries(get_posts, limit) for limit in (5, 20, 60)}
+        self.assertEqual(len(set(counts.values())), 1, counts)
+        # One page read, one owner lookup and one image lookup
+        self.assertLessEqual(counts[5], 3, counts)
+
+    def test_admin_post_list_query_count_is_constant_as_limit_grows(self):
+        headers = self.auth(self.make_user('admin', is_staff=True))
+        # The first request loads the admin into the authenticated user cache
+        get_all_posts(self.factory.get('/api/admin/posts/', **headers))
+        counts = {limit: self.feed_queries(get_all_posts, limit, **headers) for limit in (5, 20, 60)}
+        self.assertEqual(len(set(counts.values())), 1, counts)
+
+    def test_feed_cards_carry_their_owner_and_images(self):
+        response = get_posts(self.factory.get('/api/posts/', {'limit': 5}))
+        for card in response.data['data']:
+            self.assertTrue(card['user']['username'].startswith('owner'))
+            self.assertEqual(len(card['images']), 2)
+
+class BookmarkCounterConcurrencyTests(MongoTestCase):
+    """bookmark_count matches the stored bookmarks however requests interleave"""
+
+    def setUp(self):
+        super().setUp()
+        self.post = Post(user=self.make_user('owner'), type='adoption', title='Milo')
+        self.post.save()
+        self.users = [self.make_user(f'reader{index}') for index in range(6)]
+
+    def stored_count(self):
+        return Post._get_collection().find_one({'_id': self.post.id})['bookmark_count']
+
+    def test_duplicate_adds_count_once(self):
+        created = []
+        run_in_threads(*[lambda user=user: created.append(Bookmark.add(user.id, self.post.id)) for user in self.users for _ in range(4)])
+
+        self.assertEqual(created.count(True), len(self.users))
+        self.assertEqual(self.stored_count(), len(self.users))
+        self.assertEqual(Bookmark.objects(post=self.post).count(), len(self.users))
+
+    def test_interleaved_adds_and_removes_match_stored_bookmarks(self):
+        def toggle(user):
+            def run():
+                for _ in range(20):
+                    Bookmark.add(user.id, self.post.id)
+                    Bookmark.remove(user.id, self.post.id)
+                    Bookmark.add(user.id, self.post.id)
+            return run
+
+        run_in_threads(*[toggle(user) for user in self.users for _ in range(2)])
+
+        self.assertEqual(self.stored_count(), Bookmark.objects(post=self.post).count())
+        self.assertGreaterEqual(self.stored_count(), 0)
+
+def emulate_text_search(aggregate):
+    """mongomock has no $text; match on a stored search_score field and use it as the text score"""
+    def run(self, pipeline, *args, **kwargs):
+        if '$text' not in pipeline[0].get('$match', {}):
+            return aggregate(self, pipeline, *args, **kwargs)
+        pipeline = copy.deepcopy(pipeline)
+        del pipeline[0]['$match']['$text']
+        pipeline[0]['$match']['search_score'] = {'$gt': 0}
+        assert pipeline[1] == {'$addFields': {'score': {'$meta': 'textScore'}}}
+        pipeline[1]['$addFields']['score'] = '$search_score'
+        pipeline.append({'$project': {'search_score': 0}})
+        return aggregate(self, pipeline, *args, **kwargs)
+    return run
+
+class PostSearchTests(MongoTestCase):
+    """Search pages through text matches by score, with the matched words highlighted"""
+
+    def setUp(self):
+        super().setUp()
+        patch = mock.patch.object(mongomock.collection.Collection, 'aggregate', emulate_text_search(mongomock.collection.Collection.aggregate))
+        patch.start()
+        self.addCleanup(patch.stop)
+        owner = self.make_user('owner')
+        self.posts = {}
+        for title, score, post_type, post_status in (
+            ('Playful puppy', 9.0, 'adoption', 'active'),
+            ('Puppy needs surgery', 7.5, 'donation', 'active'),
+            ('Lost puppy near the park', 7.5, 'donation', 'active'),
+            ('Senior dog, calm puppy at heart', 3.0, 'adoption', 'active'),
+            ('Adopted puppy', 8.0, 'adoption', 'completed'),
+            ('Kitten', 0, 'adoption', 'active'),
+        ):
+            post = Post(user=owner, type=post_type, status=post_status, title=title, description=f'{title} <looking for help>')
+            post.save()
+            Post._get_collection().update_one({'_id': post.id}, {'$set': {'search_score': score}})
+            self.posts[title] = post
+
+    def search(self, **params):
+        return search_posts(self.factory.get('/api/posts/search/', params))
+
+    def titles(self, response):
+        self.assertEqual(response.status_code, 200, response.data)
+        return [post['title'] for post in response.data['data']]
+
+    def test_results_are_ordered_by_score_and_filtered_by_status_and_type(self):
+        self.assertEqual(self.titles(self.search(q='puppy')), [
+            'Playful puppy',
+            # Equal scores fall back to the newest id first
+            *sorted(['Puppy needs surgery', 'Lost puppy near the park'], key=lambda title: self.posts[title].id, reverse=True),
+            'Senior dog, calm puppy at heart',
+        ])
+        self.assertEqual(self.titles(self.search(q='puppy', type='adoption')), ['Playful puppy', 'Senior dog, calm puppy at heart'])
+        self.assertEqual(self.titles(self.search(q='puppy', status='completed')), ['Adopted puppy'])
+
+    def test_pages_continue_past_tied_scores_without_repeats(self):
+        seen = []
+        response = self.search(q='puppy', limit=2)
+        while True:
+            seen += self.titles(response)
+            if not response.data['next_cursor']:
+                break
+            response = self.search(q='puppy', limit=2, cursor=response.data['next_cursor'])
+        self.assertEqual(seen, self.titles(self.search(q='puppy')))
+
+    def test_results_carry_score_and_escaped_highlights(self):
+        result = self.search(q='puppies', limit=1).data['data'][0]
+        self.assertEqual(result['score'], 9.0)
+        self.assertEqual(result['highlights']['title'], 'Playful <mark>puppy</mark>')
+        self.assertEqual(result['highlights']['description'], 'Playful <mark>puppy</mark> &lt;looking for help&gt;')
+
+    def test_missing_query_and_bad_cursor_are_bad_requests(self):
+        self.assertEqual(self.search(q='  ').status_code, 400)
+        self.assertEqual(self.search(q='puppy', cursor='not-a-cursor').status_code, 400)
+
+    def test_query_terms_are_stemmed_and_skip_negations(self):
+        self.assertEqual(query_terms('Puppies -cats dogs'), ['pupp', 'dog'])
+
+    def test_highlight_windows_long_text_around_the_first_match(self):
+        text = 'filler ' * 60 + 'a friendly puppy ' + 'more ' * 60
+        snippet = highlight(text, ['pupp'], length=80)
+        self.assertTrue(snippet.startswith('…'))
+        self.assertTrue(snippet.endswith('…'))
+        self.assertIn('<mark>puppy</mark>', snippet)
+        self.assertEqual(highlight('<b>', []), '&lt;b&gt;')
+
+    def test_search_cursor_round_trips(self):
+        self.assertEqual(decode_search_cursor(encode_search_cursor(7.5, 'abc')), (7.5, 'abc'))
+
+EARTH_RADIUS_METRES = 6378100
+
+def spherical_distance(a, b):
+    (lng1, lat1), (lng2, lat2) = ([math.radians(value) for value in point] for point in (a, b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METRES * math.asin(math.sqrt(h))
+
+def emulate_geo_near(aggregate):
+    """mongomock has no $geoNear; compute its output in Python and run the rest of the pipeline on it"""
+    def run(self, pipeline, *args, **kwargs):
+        if '$geoNear' not in pipeline[0]:
+            return aggregate(self, pipeline, *args, **kwargs)
+        geo_near = pipeline[0]['$geoNear']
+        rows = []
+        for document in self.find(geo_near.get('query', {})):
+            point = document.get(geo_near['key'])
+            if not point:
+                continue
+            distance = spherical_distance(geo_near['near']['coordinates'], point['coordinates'])
+            if geo_near.get('minDistance', 0) <= distance <= geo_near['maxDistance']:
+                rows.append({**document, geo_near['distanceField']: distance})
+        results = self.database['geo_near_results']
+        results.drop()
+        if rows:
+            results.insert_many(rows)
+        return aggregate(results, pipeline[1:], *args, **kwargs)
+    return run
+
+class NearbyPostTests(MongoTestCase):
+    """Posts are geocoded from their location and listed nearest first"""
+
+    def setUp(self):
+        super().setUp()
+        patch = mock.patch.object(mongomock.collection.Collection, 'aggregate', emulate_geo_near(mongomock.collection.Collection.aggregate))
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.owner = self.make_user('owner')
+        for title, location, post_status in (
+            ('Dhaka A', 'Dhaka', 'active'), ('Dhaka B', 'Mirpur 10, Dhaka', 'active'), ('Dhaka C', 'dhaka', 'active'),
+            ('Narayanganj', 'Narayanganj', 'active'), ('Savar', 'Savar', 'active'), ('Gazipur', 'Gazipur', 'active'),
+            ('Khulna', 'Khulna', 'active'), ('Dhaka closed', 'Dhaka', 'completed'), ('Nowhere', 'Atlantis', 'active'),
+        ):
+            self.make_post(title, location, status=post_status)
+
+    def make_post(self, title, location, **fields):
+        post = Post(user=self.owner, type='adoption', title=title, location=location, **fields)
+        post.save()
+        return post
+
+    def nearby(self, **params):
+        return nearby_posts(self.factory.get('/api/posts/nearby/', params))
+
+    def test_locations_are_geocoded_on_save(self):
+        post = Post.objects.get(title='Dhaka B')
+        self.assertEqual(post.location_point['coordinates'], [90.4125, 23.8103])
+        self.assertEqual(post.location_geohash, geohash_encode(90.4125, 23.8103))
+        self.assertIsNone(Post.objects.get(title='Nowhere').location_point)
+
+        post.location = 'Khulna'
+        post.save()
+        stored = Post._get_collection().find_one({'_id': post.id})
+        self.assertEqual(stored['location_point']['coordinates'], [89.5403, 22.8456])
+        self.assertEqual(stored['location_geohash'], geohash_encode(89.5403, 22.8456))
+
+    def test_results_are_nearest_first_within_the_radius(self):
+        response = self.nearby(near='Dhaka', radius='30')
+        self.assertEqual(response.status_code, 200, response.data)
+        results = [(post['title'], post['distance_km']) for post in response.data['data']]
+
+        self.assertEqual(sorted(title for title, distance in results[:3]), ['Dhaka A', 'Dhaka B', 'Dhaka C'])
+        self.assertEqual([distance for _, distance in results[:3]], [0, 0, 0])
+        self.assertEqual([title for title, _ in results[3:]], ['Savar', 'Gazipur', 'Narayanganj'])
+        self.assertEqual([distance for _, distance in results], sorted(distance for _, distance in results))
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_pages_continue_past_tied_distances_without_repeats(self):
+        expected = [post['title'] for post in self.nearby(lat='23.8103', lng='90.4125', radius='30').data['data']]
+        seen = []
+        response = self.nearby(lat='23.8103', lng='90.4125', radius='30', limit=2)
+        while True:
+            self.assertEqual(response.status_code, 200, response.data)
+            seen += [post['title'] for post in response.data['data']]
+            if not response.data['next_cursor']:
+                break
+            response = self.nearby(lat='23.8103', lng='90.4125', radius='30', limit=2, cursor=response.data['next_cursor'])
+        self.assertEqual(seen, expected)
+
+    def test_status_filter_selects_closed_posts(self):
+        response = self.nearby(near='Dhaka', status='completed')
+        self.assertEqual([post['title'] for post in response.data['data']], ['Dhaka closed'])
+
+    def test_unusable_location_or_cursor_is_a_bad_request(self):
+        for params in ({}, {'lat': 'north', 'lng': '90'}, {'near': 'Atlantis'}, {'near': 'Dhaka', 'radius': '-1'}, {'near': 'Dhaka', 'cursor': 'bad'}):
+            self.assertEqual(self.nearby(**params).status_code, 400, params)
+
+class RankedFeedTests(MongoTestCase):
+    """?sort=for_you ranks the newest posts by the reader's history, within the latency budget"""
+
+    def setUp(self):
+        super().setUp()
+        owner = self.make_user('owner')
+        self.reader = self.make_user('reader')
+        self.headers = self.auth(self.reader)
+        started = datetime.utcnow() - timedelta(hours=1)
+        self.posts = []
+        for index in range(20):
+            # Dogs are the older half, so a newest-first feed would lead with cats
+            pet_type = 'dog' if index < 10 else 'cat'
+            post = Post(user=owner, type='adoption', title=f'{pet_type} {index}', pet_type=pet_type, created_at=started + timedelta(minutes=index))
+            post.save()
+            self.posts.append(post)
+        Post(user=owner, type='adoption', title='dog adopted', pet_type='dog', status='completed').save()
+        for post in self.posts[:2]:
+            Bookmark.add(self.reader.id, post.id)
+
+    def ranked(self, **params):
+        response = get_posts(self.factory.get('/api/posts/', {'sort': 'for_you', **params}, **self.headers))
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_preferences_are_built_from_history(self):
+        weights = ranking_service.get_preference_weights(self.reader.id)
+        self.assertEqual(weights['pet_type:dog'], 2 * ranking_service.INTERACTION_WEIGHTS['bookmark'])
+        self.assertNotIn('pet_type:cat', weights)
+        self.assertIsNotNone(FeedPreference._get_collection().find_one({'_id': self.reader.id}))
+
+    def test_posts_matching_the_history_rank_first(self):
+        titles = [post['title'] for post in self.ranked(limit=10)['data']]
+        self.assertTrue(all(title.startswith('dog') for title in titles), titles)
+        # The bookmarked posts are also the most popular dogs
+        self.assertEqual(set(titles[:2]), {'dog 0', 'dog 1'})
+
+    def test_preferences_use_the_newest_history(self):
+        reader = self.make_user('commenter')
+        old, new = datetime.utcnow() - timedelta(days=30), datetime.utcnow()
+        # Older interactions come first in natural order, so an unsorted capped read would keep them
+        rows = [(post, old + timedelta(minutes=index)) for index, post in enumerate(self.posts[10:15])]
+        rows += [(post, new - timedelta(minutes=index)) for index, post in enumerate(self.posts[2:5])]
+        for index, (post, created_at) in enumerate(rows):
+            Comment._get_collection().insert_one({'_id': f'comment-{index}', 'post': post.id, 'user': reader.id, 'content': 'Lovely', 'created_at': created_at})
+            Donation._get_collection().insert_one({'_id': f'donation-{index}', 'post': post.id, 'donor': reader.id, 'amount': 5.0, 'status': 'verified', 'created_at': created_at})
+
+        with mock.patch.object(ranking_service, 'HISTORY_LIMIT', 3):
+            weights = ranking_service.build_preference_weights(reader.id)
+
+        interactions = ranking_service.INTERACTION_WEIGHTS
+        self.assertEqual(weights['pet_type:dog'], 3 * (interactions['comment'] + interactions['donation']))
+        self.assertNotIn('pet_type:cat', weights)
+
+    def test_new_interactions_update_stored_preferences(self):
+        ranking_service.get_preference_weights(self.reader.id)
+        for post in self.posts[10:15]:
+            Bookmark.add(self.reader.id, post.id)
+        weights = ranking_service.get_preference_weights(self.reader.id)
+        self.assertEqual(weights['pet_type:cat'], 5 * ranking_service.INTERACTION_WEIGHTS['bookmark'])
+        Bookmark.remove(self.reader.id, self.posts[0].id)
+        self.assertEqual(ranking_service.get_preference_weights(self.reader.id)['pet_type:dog'], ranking_service.INTERACTION_WEIGHTS['bookmark'])
+
+    def test_status_filter_applies_to_ranked_feeds(self):
+        self.assertEqual([post['title'] for post in self.ranked(status='completed')['data']], ['dog adopted'])
+
+    def test_pages_cover_every_candidate_once(self):
+        seen = []
+        data = self.ranked(limit=6)
+        while True:
+            seen += [post['title'] for post in data['data']]
+            if not data['next_cursor']:
+                break
+            data = self.ranked(limit=6, cursor=data['next_cursor'])
+        self.assertEqual(sorted(seen), sorted(post.title for post in self.posts))
+        response = get_posts(self.factory.get('/api/posts/', {'sort': 'for_you', 'cursor': 'bad'}, **self.headers))
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(FEED_RANKING_CANDIDATES=20, FEED_RANKING_MIN_CANDIDATES=5)
+    def test_later_pages_rank_the_first_page_candidates(self):
+        first = self.ranked(limit=5)
+        ranking_service._candidate_budget._limit = 5
+        seen = [post['title'] for post in first['data']]
+        data = self.ranked(limit=5, cursor=first['next_cursor'])
+        seen += [post['title'] for post in data['data']]
+        self.assertIsNotNone(data['next_cursor'])
+        self.assertEqual(len(set(seen)), 10)
+
+    @override_settings(FEED_RANKING_CANDIDATES=500, FEED_RANKING_MIN_CANDIDATES=100, FEED_RANKING_BUDGET_MS=50)
+    def test_candidate_budget_shrinks_when_slow_and_grows_back_when_fast(self):
+        budget = ranking_service.CandidateBudget()
+        self.assertEqual(budget.observe(100, 500), 250)
+        self.assertEqual(budget.observe(1000, 250), 100)
+        # Between half and all of the budget leaves the count alone
+        self.assertEqual(budget.observe(40, 100), 100)
+        self.assertEqual(budget.observe(10, 100), 125)
+        for _ in range(10):
+            budget.observe(10, budget.limit())
+        self.assertEqual(budget.limit(), 500)
+
+    @override_settings(FEED_RANKING_BUDGET_MS=0.001, FEED_RANKING_MIN_CANDIDATES=5)
+    def test_over_budget_ranking_is_logged_and_reads_fewer_candidates_next_time(self):
+        with self.assertLogs('pet_adoption.posts.services.ranking_service', 'WARNING'):
+            self.ranked(limit=5)
+        self.assertEqual(ranking_service._candidate_budget.limit(), 5)
+
+    def test_scoring_a_full_candidate_set_fits_the_latency_budget(self):
+        now = datetime.utcnow()
+        candidates = [
+            {
+                '_id': str(index), 'type': 'adoption', 'pet_type': f'type{index % 12}', 'pet_species': f'species{index % 40}',
+                'pet_size': ('small', 'medium', 'large')[index % 3], 'pet_age': index % 15,
+                'created_at': now - timedelta(minutes=index), 'comment_count': index % 7, 'bookmark_count': index % 5, 'donor_count': 0,
+            }
+            for index in range(settings.FEED_RANKING_CANDIDATES)
+        ]
+        weights = {feature: 1.0 for candidate in candidates[:60] for feature in ranking_service.post_features(candidate)}
+        elapsed_ms = best_time(lambda: ranking_service.score_candidates(candidates, weights, now)) * 1000
+        self.assertLess(elapsed_ms, settings.FEED_RANKING_BUDGET_MS, f'{elapsed_ms:.1f} ms for {len(candidates)} candidates')
@@ -3,56 +3,193 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from posts.models import Post, PostImage, PostUpdate, Comment, Bookmark
-from posts.serializers.post_serializer import PostSerializer, PostUpdateSerializer, PostImageSerializer, CommentSerializer, BookmarkSerializer
+from posts.serializers.post_serializer import PostSerializer, PostCardSerializer, PostUpdateSerializer, PostImageSerializer, CommentSerializer, CommentListSerializer, BookmarkSerializer
+from posts.services.feed_service import serialize_posts, serialize_post, get_cached_feed_page, bookmarked_post_ids
+from posts.services.search_service import search_posts as run_post_search
+from posts.services.facet_service import browse_posts as run_post_browse, InvalidFacetFilter
+from posts.services.timeline_service import get_post_timeline as build_post_timeline
+from posts.services.map_service import get_post_map_tile, InvalidTile
+from posts.services.similarity_service import get_similar_posts as find_similar_posts
+from posts.services.ranking_service import rank_posts
 from users.models import User
 from utils.jwt_auth import get_user_from_token
+from utils.pagination import paginate_queryset, get_page_size, InvalidCursor, MAX_PAGE_SIZE
+from utils.etag import make_etag, fetch_versions, conditional_response
+from utils.fieldsets import select_serializer, document_projection, nested_projection, fieldset_key, InvalidFieldset
+from utils.helpers import prefetch_references
+from utils.geo import parse_nearby, nearby_documents, InvalidLocation
+from utils.cascade import cascade_deletion
+from utils.log import get_logger
 import os
 import uuid
 from django.conf import settings
 
+logger = get_logger(__name__)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_posts(request):
     try:
         post_type = request.GET.get('type')
         status_filter = request.GET.get('status', 'active')
-        limit = int(request.GET.get('limit', 20))
+        
+        serializer_class, fields = select_serializer(request, PostSerializer, PostCardSerializer)
         
         query = Post.objects(status=status_filter)
         if post_type:
             query = query.filter(type=post_type)
-        
-        posts = query.order_by('-created_at').limit(limit)
-        
-        posts_with_images = []
-        for post in posts:
-            post_data = PostSerializer(post).data
-            images = PostImage.objects(post=post)
-            post_data['images'] = PostImageSerializer(images, many=True).data
-            posts_with_images.append(post_data)
+        projection = document_projection(Post, fields)
+        if projection:
+            query = query.only(*projection)
+        
+        def build_page():
+            posts, next_cursor = paginate_queryset(query, request)
+            return serialize_posts(posts, serializer_class, fields), next_cursor
+        
+        if 'HTTP_AUTHORIZATION' in request.META:
+            user = get_user_from_token(request)
+            if user and request.GET.get('sort') == 'for_you':
+                # Ranking reads a slim projection of the candidates; only the
+                # page itself is loaded with the requested fields
+                post_ids, next_cursor = rank_posts(user, request, post_type, status_filter)
+                posts_by_id = query.in_bulk(post_ids)
+                posts = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+            else:
+                posts, next_cursor = paginate_queryset(query, request)
+            posts_with_images = serialize_posts(posts, serializer_class, fields)
+            if user:
+                # One indexed lookup replaces a bookmark-status call per card;
+                # ids come from the documents since ?fields= may leave 'id' out
+                bookmarked = bookmarked_post_ids(user, [post.id for post in posts])
+                for post, post_data in zip(posts, posts_with_images):
+                    post_data['bookmarked'] = post.id in bookmarked
+        else:
+            # Anonymous feeds are identical for everyone, so they share one cached copy
+            cache_key = (
+                f"posts:{post_type or ''}:{status_filter}:{get_page_size(request)}:"
+                f"{request.GET.get('cursor', '')}:{fieldset_key(serializer_class, fields)}"
+            )
+            posts_with_images, next_cursor = get_cached_feed_page(cache_key, build_page)
         
         return Response({
             'data': posts_with_images,
             'total': len(posts_with_images),
+            'next_cursor': next_cursor,
             'success': True
         })
+    except (InvalidCursor, InvalidFieldset) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
-def get_post_detail(request, post_id):
+def search_posts(request):
     try:
-        post = Post.objects.get(id=post_id)
-        post_data = PostSerializer(post).data
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Search query is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results, next_cursor = run_post_search(
+            query,
+            request,
+            post_type=request.GET.get('type'),
+            status_filter=request.GET.get('status', 'active')
+        )
         
-        images = PostImage.objects(post=post)
-        post_data['images'] = PostImageSerializer(images, many=True).data
+        return Response({
+            'data': results,
+            'total': len(results),
+            'next_cursor': next_cursor,
+            'success': True
+        })
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def browse_posts(request):
+    try:
+        posts, facets, next_cursor = run_post_browse(request, status_filter=request.GET.get('status', 'active'))
         
         return Response({
-            'data': post_data,
+            'data': posts,
+            'facets': facets,
+            'total': facets['total'],
+            'next_cursor': next_cursor,
+            'success': True
+        })
+    except (InvalidCursor, InvalidFacetFilter) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def nearby_posts(request):
+    try:
+        point, max_distance = parse_nearby(request)
+        query = {'status': request.GET.get('status', 'active')}
+        if request.GET.get('type'):
+            query['type'] = request.GET['type']
+        
+        results, next_cursor = nearby_documents(Post, 'location_point', point, max_distance, query, request)
+        data = serialize_posts([post for post, _ in results], PostCardSerializer)
+        for post_data, (_, distance) in zip(data, results):
+            post_data['distance_km'] = round(distance / 1000, 2)
+        
+        return Response({
+            'data': data,
+            'next_cursor': next_cursor,
+            'success': True
+        })
+    except (InvalidLocation, InvalidCursor) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_post_map(request, zoom, x, y):
+    try:
+        tile = get_post_map_tile(zoom, x, y, post_type=request.GET.get('type'))
+        return Response({
+            'data': tile,
             'success': True
         })
+    except InvalidTile as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_post_detail(request, post_id):
+    try:
+        # The ETag comes from projections of the post, its owner and its images,
+        # so an unchanged post is answered without loading or serializing it
+        post_version = Post._get_collection().find_one(
+            {'_id': post_id},
+            {'updated_at': 1, 'user': 1, 'comment_count': 1, 'bookmark_count': 1, 'donor_count': 1}
+        )
+        if not post_version:
+            raise Post.DoesNotExist
+        etag = make_etag(
+            post_version,
+            fetch_versions(User, {'_id': post_version.get('user')}),
+            fetch_versions(PostImage, {'post': post_id}, fields=('image_url', 'caption', 'uploaded_at'), sort=[('_id', 1)])
+        )
+        
+        def build_response():
+            post = Post.objects.get(id=post_id)
+            return Response({
+                'data': serialize_post(post),
+                'success': True
+            })
+        
+        return conditional_response(request, etag, build_response)
     except Post.DoesNotExist:
         return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
@@ -66,18 +203,13 @@ def create_post(request):
         if not user:
             return Response({'error': 'Authentication required. Please provide a valid JWT token in the Authorization header.'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        print(f"Creating post for user: {user.username}")
-        print(f"Request data: {request.data}")
-        print(f"Request FILES: {request.FILES}")
+        logger.debug("Creating post", extra={'user_id': str(user.id), 'fields': list(request.data.keys()), 'files': list(request.FILES.keys())})
         
         data = request.data.copy()
         data['user'] = str(user.id)
         
-        print(f"Processed data: {data}")
-        
         serializer = PostSerializer(data=data, context={'user': user})
         if serializer.is_valid():
-            print(f"Serializer is valid, validated data: {serializer.validated_data}")
             post = serializer.save()
             
             if 'images' in request.FILES:
@@ -99,7 +231,7 @@ def create_post(request):
                             image_url=f"post_images/{filename}"
                         ).save()
                     except Exception as e:
-                        print(f"Image upload error: {e}")
+                        logger.warning("Image upload error: %s", e)
             
             return Response({
                 'data': PostSerializer(post).data,
@@ -107,12 +239,10 @@ def create_post(request):
                 'success': True
             }, status=status.HTTP_201_CREATED)
         else:
-            print(f"Serializer errors: {serializer.errors}")
+            logger.debug("Rejected post data", extra={'errors': serializer.errors})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        print(f"Error creating post: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error creating post")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
@@ -163,7 +293,7 @@ def update_post(request, post_id):
                         image_url=image_path
                     ).save()
                 except Exception as e:
-                    print(f"Image upload error: {e}")
+                    logger.warning("Image upload error: %s", e)
             
             update.new_images = image_paths
         
@@ -192,6 +322,44 @@ def get_post_updates(request, post_id):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_post_timeline(request, post_id):
+    try:
+        if not Post.objects(id=post_id).only('id').first():
+            return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        events, next_cursor = build_post_timeline(post_id, request)
+        return Response({
+            'data': events,
+            'next_cursor': next_cursor,
+            'success': True
+        })
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_similar_posts(request, post_id):
+    try:
+        # Neighbor lists are precomputed, so this is one lookup by post id
+        # plus one query for the neighboring posts
+        similar = find_similar_posts(post_id)
+        if not similar and not Post.objects(id=post_id).only('id').first():
+            return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        data = serialize_posts([post for post, _ in similar], PostCardSerializer)
+        for post_data, (_, score) in zip(data, similar):
+            post_data['similarity'] = score
+        return Response({
+            'data': data,
+            'success': True
+        })
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['DELETE'])
 @permission_classes([AllowAny])
 def delete_post(request, post_id):
@@ -204,7 +372,9 @@ def delete_post(request, post_id):
         if str(post.user.id) != str(user.id) and not user.is_staff:
             return Response({'error': 'Not authorized to delete this post'}, status=status.HTTP_403_FORBIDDEN)
         
-        post.delete()
+        # Images, comments, bookmarks and donations are removed in the background
+        with cascade_deletion('post', post.id):
+            post.delete()
         return Response({'message': 'Post deleted successfully', 'success': True})
     except Post.DoesNotExist:
         return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -215,12 +385,19 @@ def delete_post(request, post_id):
 @permission_classes([AllowAny])
 def get_post_comments(request, post_id):
     try:
-        comments = Comment.objects(post=post_id).order_by('-created_at')
-        serializer = CommentSerializer(comments, many=True)
+        # Served from the (post, -created_at, -id) index, so a page costs the same
+        # however many comments the post has
+        comments, next_cursor = paginate_queryset(Comment.objects(post=post_id), request)
+        prefetch_references(comments, 'user', User, only=nested_projection(CommentListSerializer, 'user'))
+        prefetch_references(comments, 'post', Post, only=('id', 'title'))
+        serializer = CommentListSerializer(comments, many=True)
         return Response({
             'data': serializer.data,
+            'next_cursor': next_cursor,
             'success': True
         })
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -267,36 +444,40 @@ def delete_comment(request, comment_id):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-@api_view(['POST'])
+@api_view(['POST', 'PUT', 'DELETE'])
 @permission_classes([AllowAny])
 def toggle_bookmark(request, post_id):
+    """PUT bookmarks the post and DELETE removes it, both idempotently; POST toggles"""
     try:
         user = get_user_from_token(request)
         if not user:
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        existing_bookmark = Bookmark.objects(user=user, post=post_id).first()
+        if request.method == 'DELETE':
+            Bookmark.remove(user.id, post_id)
+            return Response({
+                'message': 'Bookmark removed successfully',
+                'is_bookmarked': False,
+                'success': True
+            })
         
-        if existing_bookmark:
-            existing_bookmark.delete()
+        # A toggle that removes nothing means the post wasn't bookmarked yet
+        if request.method == 'POST' and Bookmark.remove(user.id, post_id):
             return Response({
                 'message': 'Bookmark removed successfully',
                 'is_bookmarked': False,
                 'success': True
             })
-        else:
-            data = {'post': post_id}
-            serializer = BookmarkSerializer(data=data, context={'user': user})
-            if serializer.is_valid():
-                bookmark = serializer.save()
-                return Response({
-                    'data': BookmarkSerializer(bookmark).data,
-                    'message': 'Post bookmarked successfully',
-                    'is_bookmarked': True,
-                    'success': True
-                }, status=status.HTTP_201_CREATED)
-            else:
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not Post.objects(id=post_id).only('id').first():
+            return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        created = Bookmark.add(user.id, post_id)
+        return Response({
+            'message': 'Post bookmarked successfully',
+            'is_bookmarked': True,
+            'success': True
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -308,12 +489,26 @@ def get_user_bookmarks(request):
         if not user:
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        bookmarks = Bookmark.objects(user=user).order_by('-created_at')
-        serializer = BookmarkSerializer(bookmarks, many=True)
+        bookmarks, next_cursor = paginate_queryset(Bookmark.objects(user=user).only('post', 'created_at'), request, MAX_PAGE_SIZE)
+        # Every bookmark on the page is the requesting user's, who is already loaded
+        for bookmark in bookmarks:
+            bookmark.user = user
+        
+        # Hydrate every bookmarked post on the page with one batched query
+        posts = Post.objects.in_bulk([bookmark.post_id for bookmark in bookmarks])
+        post_cards = dict(zip(posts, serialize_posts(posts.values(), PostCardSerializer, PostCardSerializer.default_fields)))
+        
+        data = BookmarkSerializer(bookmarks, many=True).data
+        for bookmark_data in data:
+            bookmark_data['post_detail'] = post_cards.get(bookmark_data['post'])
+        
         return Response({
-            'data': serializer.data,
+            'data': data,
+            'next_cursor': next_cursor,
             'success': True
         })
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -330,6 +525,26 @@ def check_bookmark_status(request, post_id):
     except Exception as e:
         return Response({'is_bookmarked': False})
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_bookmark_statuses(request):
+    try:
+        user = get_user_from_token(request)
+        if not user:
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        post_ids = [post_id.strip() for post_id in request.GET.get('post_ids', '').split(',') if post_id.strip()]
+        if len(post_ids) > MAX_PAGE_SIZE:
+            return Response({'error': f'At most {MAX_PAGE_SIZE} post ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        bookmarked = bookmarked_post_ids(user, post_ids)
+        return Response({
+            'bookmarked': [post_id for post_id in post_ids if post_id in bookmarked],
+            'success': True
+        })
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['PUT'])
 @permission_classes([AllowAny])
 def edit_post(request, post_id):
@@ -378,7 +593,7 @@ def edit_post(request, post_id):
                     if img.image_url not in existing_image_ids and str(img.id) not in existing_image_ids:
                         img.delete()
             except (json.JSONDecodeError, Exception) as e:
-                print(f"Error handling existing images: {e}")
+                logger.warning("Error handling existing images: %s", e)
         
         # Handle new images
         if 'new_images' in request.FILES:
@@ -400,14 +615,12 @@ def edit_post(request, post_id):
                         image_url=f"post_images/{filename}"
                     ).save()
                 except Exception as e:
-                    print(f"Image upload error: {e}")
+                    logger.warning("Image upload error: %s", e)
         
         post.save()
         
         # Get updated post with images
-        post_images = PostImage.objects(post=post)
-        post_data = PostSerializer(post).data
-        post_data['images'] = [{'id': str(img.id), 'image_url': img.image_url} for img in post_images]
+        post_data = serialize_post(post)
         
         return Response({
             'data': post_data,
@@ -417,6 +630,5 @@ def edit_post(request, post_id):
     except Post.DoesNotExist:
         return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        print(f"Error editing post: {e}")
-        traceback.print_exc()
+        logger.exception("Error editing post %s", post_id)
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
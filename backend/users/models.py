@@ -62,7 +62,7 @@ class User(Document):
         'indexes': [
             'username',
             'email',
-            'created_at'
+            ('-created_at', '-id')
         ]
     }
     
@@ -88,7 +88,16 @@ class User(Document):
         if not self.id:
             self.id = str(uuid.uuid4())
         self.updated_at = datetime.utcnow()
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        from utils.jwt_auth import invalidate_cached_user
+        invalidate_cached_user(self.id)
+        return result
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from utils.jwt_auth import invalidate_cached_user
+        invalidate_cached_user(self.id)
+        return result
     
     @classmethod
     def ensure_indexes(cls):
@@ -96,7 +105,7 @@ class User(Document):
         try:
             cls._get_collection().create_index([("username", 1)], unique=True)
             cls._get_collection().create_index([("email", 1)], unique=True)
-            cls._get_collection().create_index([("created_at", 1)])
+            cls._get_collection().create_index([("created_at", -1), ("_id", -1)])
             print("✅ User model indexes created successfully")
         except Exception as e:
             print(f"⚠️ Warning: Could not create indexes: {e}")
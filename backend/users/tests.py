@@ -1,3 +1,53 @@
-from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+from users.models import User
+from users.views.profile_views import get_profile
+from users.views.user_views import toggle_user_status, delete_user
+from utils.jwt_auth import JWTAuthentication, get_user_from_token, get_user_cache_stats
+from utils.testing import MongoTestCase, count_queries
 
-# Create your tests here.
+class AuthenticatedUserCacheTests(MongoTestCase):
+    """Token lookups are served from memory, but never for a user who was deactivated or deleted"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user('alice')
+        self.admin = self.make_user('admin', is_staff=True)
+        self.headers = self.auth(self.user)
+        self.admin_headers = self.auth(self.admin)
+
+    def profile(self):
+        return get_profile(self.factory.get('/api/users/profile/', **self.headers))
+
+    def test_repeat_lookups_for_a_token_need_no_query(self):
+        self.assertEqual(self.profile().status_code, 200)
+        with count_queries() as queries:
+            request = APIRequestFactory().get('/', **self.headers)
+            self.assertEqual(get_user_from_token(request).id, self.user.id)
+            user, _ = JWTAuthentication().authenticate(request)
+            self.assertEqual(user.id, self.user.id)
+        self.assertEqual(queries['count'], 0)
+        self.assertGreaterEqual(get_user_cache_stats()['hits'], 2)
+
+    def test_deactivated_user_cached_token_is_rejected_immediately(self):
+        self.assertEqual(self.profile().status_code, 200)
+        response = toggle_user_status(self.factory.put(f'/api/users/{self.user.id}/toggle-status/', **self.admin_headers), self.user.id)
+        self.assertFalse(response.data['data']['is_active'])
+
+        self.assertEqual(self.profile().status_code, 401)
+        self.assertIsNone(JWTAuthentication().authenticate(APIRequestFactory().get('/', **self.headers)))
+
+        toggle_user_status(self.factory.put(f'/api/users/{self.user.id}/toggle-status/', **self.admin_headers), self.user.id)
+        self.assertEqual(self.profile().status_code, 200)
+
+    def test_saved_changes_are_seen_by_the_next_request(self):
+        self.profile()
+        user = User.objects.get(id=self.user.id)
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.profile().status_code, 401)
+
+    def test_deleted_user_cached_token_is_rejected(self):
+        self.assertEqual(self.profile().status_code, 200)
+        response = delete_user(self.factory.delete(f'/api/users/{self.user.id}/delete/', **self.admin_headers), self.user.id)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.profile().status_code, 401)
@@ -5,11 +5,14 @@ from rest_framework.response import Response
 from users.serializers.user_serializer import UserRegistrationSerializer, UserProfileSerializer
 from users.models import User
 from utils.jwt_auth import generate_jwt_token, get_user_from_token
+from utils.log import get_logger
 import hashlib
 import os
 import uuid
 from django.conf import settings
 
+logger = get_logger(__name__)
+
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
@@ -25,15 +28,10 @@ def test_connection(request):
 @permission_classes([AllowAny])
 def user_register(request):
     try:
-        # Debug: Print received data
-        print("Received data:", request.data)
-        print("Received files:", request.FILES)
-        
         serializer = UserRegistrationSerializer(data=request.data)
         
-        # Debug: Check if serializer is valid and what errors occur
         if not serializer.is_valid():
-            print("Serializer validation errors:", serializer.errors)
+            logger.debug("Rejected registration data", extra={'errors': serializer.errors})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         if serializer.is_valid():
@@ -6,10 +6,16 @@ from users.models import User
 from users.serializers.user_serializer import UserSerializer, UserProfileSerializer
 from posts.models import Post, Comment
 from utils.jwt_auth import get_user_from_token
+from utils.pagination import paginate_queryset, InvalidCursor
+from utils.helpers import prefetch_references
+from utils.cascade import cascade_deletion
+from utils.log import get_logger
 import os
 import uuid
 from django.conf import settings
 
+logger = get_logger(__name__)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_user_profile(request, user_id):
@@ -54,7 +60,7 @@ def update_user_profile(request, user_id):
                 
                 data['nid_photo'] = f"nid_photos/{filename}"
             except Exception as e:
-                print(f"Photo upload error: {e}")
+                logger.warning("Photo upload error: %s", e)
         
         if 'profile_photo' in request.FILES:
             try:
@@ -71,7 +77,7 @@ def update_user_profile(request, user_id):
                 
                 data['profile_photo'] = f"profile_photos/{filename}"
             except Exception as e:
-                print(f"Photo upload error: {e}")
+                logger.warning("Photo upload error: %s", e)
         
         serializer = UserProfileSerializer(user, data=data, partial=True)
         if serializer.is_valid():
@@ -96,12 +102,15 @@ def get_all_users(request):
         if not user or not user.is_staff:
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        users = User.objects.all().order_by('-created_at')
+        users, next_cursor = paginate_queryset(User.objects.all(), request)
         serializer = UserSerializer(users, many=True)
         return Response({
             'data': serializer.data,
+            'next_cursor': next_cursor,
             'success': True
         })
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -117,7 +126,9 @@ def delete_user(request, user_id):
             return Response({'error': 'Cannot delete your own account'}, status=status.HTTP_400_BAD_REQUEST)
         
         user = User.objects.get(id=user_id)
-        user.delete()
+        # Everything the user owns is removed in the background
+        with cascade_deletion('user', user.id, files=[user.nid_photo, user.profile_photo]):
+            user.delete()
         return Response({'message': 'User deleted successfully', 'success': True})
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -157,13 +168,15 @@ def get_all_posts(request):
         if not user or not user.is_staff:
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        posts = Post.objects.all().order_by('-created_at')
-        from posts.serializers.post_serializer import PostSerializer
-        serializer = PostSerializer(posts, many=True)
+        posts, next_cursor = paginate_queryset(Post.objects.all(), request)
+        from posts.services.feed_service import serialize_posts
         return Response({
-            'data': serializer.data,
+            'data': serialize_posts(posts),
+            'next_cursor': next_cursor,
             'success': True
         })
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -176,7 +189,8 @@ def admin_delete_post(request, post_id):
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
         post = Post.objects.get(id=post_id)
-        post.delete()
+        with cascade_deletion('post', post.id):
+            post.delete()
         return Response({'message': 'Post deleted successfully', 'success': True})
     except Post.DoesNotExist:
         return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -191,13 +205,18 @@ def get_all_comments(request):
         if not user or not user.is_staff:
             return Response({'error': 'Admin access required'}, status=status.HTTP_403_FORBIDDEN)
         
-        comments = Comment.objects.all().order_by('-created_at')
+        comments, next_cursor = paginate_queryset(Comment.objects.all(), request)
         from posts.serializers.post_serializer import CommentSerializer
+        prefetch_references(comments, 'user', User)
+        prefetch_references(comments, 'post', Post, only=('id', 'title'))
         serializer = CommentSerializer(comments, many=True)
         return Response({
             'data': serializer.data,
+            'next_cursor': next_cursor,
             'success': True
         })
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -0,0 +1,20 @@
+import os
+import sys
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class UtilsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'utils'
+
+    def ready(self):
+        # Resume cascade deletions a previous process left queued or running.
+        # Management commands other than runserver don't serve requests, and
+        # run_cascade_deletions drains the queue on its own thread.
+        if not settings.CASCADE_WORKER_AUTOSTART:
+            return
+        if os.path.basename(sys.argv[0]) == 'manage.py' and sys.argv[1:2] != ['runserver']:
+            return
+        from utils.cascade import start_cascade_worker
+        start_cascade_worker()
@@ -0,0 +1,348 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from django.conf import settings
+from mongoengine import Document, StringField, ListField, IntField, DateTimeField
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from badges.models import UserBadge, UserContribution, UserContributionStats
+from blogs.models import Blog
+from donations.models import Donation, DonationRollup
+from items.models import Item, Store, Product, Order, VolunteerDonation
+from posts.models import Post, PostImage, PostUpdate, Comment, Bookmark, PostNeighbors, FeedPreference
+from users.models import User
+from utils.helpers import delete_media_file
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+class CascadeDeletion(Document):
+    """Dependents still to be removed after a post, user or store was deleted"""
+    id = StringField(primary_key=True)  # target_type:target_id
+    target_type = StringField(choices=['post', 'user', 'store'], required=True)
+    target_id = StringField(required=True)
+    files = ListField(StringField())  # Uploads of the deleted document itself
+    status = StringField(choices=['scheduled', 'pending', 'running', 'failed'], default='pending')
+    completed_steps = ListField(StringField())
+    attempts = IntField(default=0)
+    error = StringField()
+    created_at = DateTimeField(default=datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'cascade_deletions',
+        'indexes': [
+            ('status', 'created_at')
+        ]
+    }
+
+def delete_in_batches(document_cls, query, batch_size, files=(), fields=(), before_delete=None, heartbeat=None):
+    """Delete matching documents batch_size at a time, removing their uploaded files first.
+
+    Each batch is deleted by _id, so an interrupted run simply finds the
+    remaining documents again when it resumes. heartbeat is called before
+    every batch so a long step keeps its job's lease.
+    """
+    collection = document_cls._get_collection()
+    projection = {field: 1 for field in (*files, *fields)} or {'_id': 1}
+    deleted = 0
+    while True:
+        batch = list(collection.find(query, projection).limit(batch_size))
+        if not batch:
+            return deleted
+        if heartbeat:
+            heartbeat()
+        for document in batch:
+            for field in files:
+                value = document.get(field)
+                for path in value if isinstance(value, list) else [value]:
+                    delete_media_file(path)
+        if before_delete:
+            before_delete(batch)
+        deleted += collection.delete_many({'_id': {'$in': [document['_id'] for document in batch]}}).deleted_count
+
+def decrement_post_counter(counter):
+    """before_delete hook keeping a post counter in step with the removed documents"""
+    def hook(batch):
+        per_post = Counter(document.get('post') for document in batch)
+        operations = [UpdateOne({'_id': post_id}, {'$inc': {counter: -count}}) for post_id, count in per_post.items() if post_id]
+        if operations:
+            Post._get_collection().bulk_write(operations, ordered=False)
+            from posts.services.feed_service import invalidate_post_feed
+            invalidate_post_feed()
+    return hook
+
+def retract_donations(batch):
+    """before_delete hook taking a deleted donor's donations out of other posts' totals and rollups"""
+    deleted_ids = [document['_id'] for document in batch]
+    amounts = Counter()
+    donor_posts = set()
+    rollups = {}
+    for document in batch:
+        status = document.get('status')
+        amount = float(document.get('amount') or 0)
+        if status == 'verified':
+            amounts[document.get('post')] += amount
+            donor_posts.add((document.get('post'), document.get('donor')))
+        for bucket_id, fields, inc in DonationRollup.bucket_increments(
+            document.get('created_at'), document.get('post'), document.get('payment_method'), amount, {status: -1}
+        ):
+            merged = rollups.setdefault(bucket_id, (fields, Counter()))[1]
+            merged.update(inc)
+
+    operations = [UpdateOne({'_id': post_id}, {'$inc': {'current_amount': -amount}}) for post_id, amount in amounts.items() if post_id]
+    # A donor stops counting towards a post only once their last verified
+    # donation to it is gone, which may be in a later batch
+    for post_id, donor_id in donor_posts:
+        remaining = Donation._get_collection().find_one(
+            {'post': post_id, 'donor': donor_id, 'status': 'verified', '_id': {'$nin': deleted_ids}},
+            {'_id': 1}
+        )
+        if post_id and remaining is None:
+            operations.append(UpdateOne({'_id': post_id}, {'$inc': {'donor_count': -1}}))
+    if operations:
+        Post._get_collection().bulk_write(operations, ordered=False)
+        from posts.services.feed_service import invalidate_post_feed
+        invalidate_post_feed()
+    if rollups:
+        DonationRollup._get_collection().bulk_write(
+            [DonationRollup.build_update(bucket_id, fields, dict(inc)) for bucket_id, (fields, inc) in rollups.items()],
+            ordered=False
+        )
+
+def delete_post_dependents(post_id, batch_size, heartbeat=None):
+    delete_in_batches(PostImage, {'post': post_id}, batch_size, files=('image_url',), heartbeat=heartbeat)
+    delete_in_batches(PostUpdate, {'post': post_id}, batch_size, files=('new_images',), heartbeat=heartbeat)
+    delete_in_batches(Comment, {'post': post_id}, batch_size, heartbeat=heartbeat)
+    delete_in_batches(Bookmark, {'post': post_id}, batch_size, heartbeat=heartbeat)
+    delete_in_batches(Donation, {'post': post_id}, batch_size, files=('receipt_image',), heartbeat=heartbeat)
+    delete_in_batches(DonationRollup, {'post': post_id}, batch_size, heartbeat=heartbeat)
+    delete_in_batches(PostNeighbors, {'_id': post_id}, batch_size, heartbeat=heartbeat)
+
+def delete_store_dependents(store_id, batch_size, heartbeat=None):
+    delete_in_batches(Product, {'store': store_id}, batch_size, files=('image_url',), heartbeat=heartbeat)
+    delete_in_batches(Order, {'store': store_id}, batch_size, heartbeat=heartbeat)
+
+def delete_owned(document_cls, owner_query, delete_dependents, batch_size, heartbeat=None):
+    """Delete documents a user owns, each one's dependents before the document itself"""
+    collection = document_cls._get_collection()
+    while True:
+        ids = [document['_id'] for document in collection.find(owner_query, {'_id': 1}).limit(batch_size)]
+        if not ids:
+            return
+        if heartbeat:
+            heartbeat()
+        for document_id in ids:
+            delete_dependents(document_id, batch_size, heartbeat)
+        collection.delete_many({'_id': {'$in': ids}})
+
+def build_plan(target_type, target_id, batch_size, heartbeat=None):
+    """Ordered (step name, action) pairs that remove everything hanging off a deleted document"""
+    if target_type == 'post':
+        return [('dependents', lambda: delete_post_dependents(target_id, batch_size, heartbeat))]
+    if target_type == 'store':
+        return [('dependents', lambda: delete_store_dependents(target_id, batch_size, heartbeat))]
+
+    def delete_posts():
+        delete_owned(Post, {'user': target_id}, delete_post_dependents, batch_size, heartbeat)
+        from posts.services.feed_service import invalidate_post_feed
+        from posts.services.map_service import invalidate_post_map
+        invalidate_post_feed()
+        invalidate_post_map()
+
+    return [
+        ('posts', delete_posts),
+        ('stores', lambda: delete_owned(Store, {'owner': target_id}, delete_store_dependents, batch_size, heartbeat)),
+        ('comments', lambda: delete_in_batches(Comment, {'user': target_id}, batch_size, fields=('post',), before_delete=decrement_post_counter('comment_count'), heartbeat=heartbeat)),
+        ('bookmarks', lambda: delete_in_batches(Bookmark, {'user': target_id}, batch_size, fields=('post',), before_delete=decrement_post_counter('bookmark_count'), heartbeat=heartbeat)),
+        ('donations', lambda: delete_in_batches(
+            Donation, {'donor': target_id}, batch_size, files=('receipt_image',),
+            fields=('post', 'donor', 'status', 'amount', 'payment_method', 'created_at'), before_delete=retract_donations, heartbeat=heartbeat
+        )),
+        ('items', lambda: delete_in_batches(Item, {'donor': target_id}, batch_size, heartbeat=heartbeat)),
+        ('orders', lambda: delete_in_batches(Order, {'customer': target_id}, batch_size, heartbeat=heartbeat)),
+        ('volunteer_donations', lambda: delete_in_batches(VolunteerDonation, {'donor': target_id}, batch_size, heartbeat=heartbeat)),
+        ('blogs', lambda: delete_in_batches(Blog, {'author': target_id}, batch_size, files=('image',), heartbeat=heartbeat)),
+        ('badges', lambda: delete_in_batches(UserBadge, {'user': target_id}, batch_size, heartbeat=heartbeat)),
+        ('contributions', lambda: delete_in_batches(UserContribution, {'user': target_id}, batch_size, heartbeat=heartbeat)),
+        ('contribution_stats', lambda: UserContributionStats._get_collection().delete_one({'_id': target_id})),
+        ('feed_preferences', lambda: FeedPreference._get_collection().delete_one({'_id': target_id})),
+    ]
+
+class LeaseLost(Exception):
+    """Raised when a job's lease ran out and another worker claimed it"""
+
+class CascadeDeletionWorker:
+    """Runs queued cascade deletions on a background thread.
+
+    A job is recorded as 'scheduled' before its document is deleted and
+    released to 'pending' afterwards, so a crash in between leaves a job
+    behind rather than orphaned dependents. Jobs record each finished step
+    and renew their lease after every batch; the worker is started with the
+    app, so a job interrupted by a restart is picked up again once its lease
+    runs out and continues from the first unfinished step.
+    """
+
+    lease = timedelta(minutes=10)
+    idle_timeout = 60
+    # Documents whose deletion schedules a cascade, to check a stranded
+    # 'scheduled' job's document really is gone
+    targets = {'post': Post, 'user': User, 'store': Store}
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.collection = CascadeDeletion._get_collection()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def schedule(self, target_type, target_id, files=()):
+        """Record a job the worker won't run until it is released; returns the job id"""
+        job_id = f'{target_type}:{target_id}'
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {'_id': job_id},
+            {'$setOnInsert': {
+                'target_type': target_type,
+                'target_id': str(target_id),
+                'files': [path for path in files if path],
+                'status': 'scheduled',
+                'completed_steps': [],
+                'attempts': 0,
+                'created_at': now,
+                'updated_at': now
+            }},
+            upsert=True
+        )
+        return job_id
+
+    def release(self, job_id):
+        """Hand a scheduled job to the worker once its document is deleted"""
+        self.collection.update_one(
+            {'_id': job_id, 'status': 'scheduled'},
+            {'$set': {'status': 'pending', 'updated_at': datetime.utcnow()}}
+        )
+        self.start()
+
+    def cancel(self, job_id):
+        """Drop a scheduled job whose document could not be deleted"""
+        self.collection.delete_one({'_id': job_id, 'status': 'scheduled'})
+
+    def start(self):
+        """Start the background thread if needed and have it look for work now"""
+        self._ensure_thread()
+        self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._work, name='cascade-deletion-worker', daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            self._wakeup.wait(timeout=self.idle_timeout)
+            self._wakeup.clear()
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception("Cascade deletion worker error")
+
+    def claim(self):
+        """Take the oldest pending job, or a running or scheduled one left behind by a stopped worker"""
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {'$or': [
+                {'status': 'pending'},
+                {'status': {'$in': ['running', 'scheduled']}, 'updated_at': {'$lt': now - self.lease}}
+            ]},
+            {'$set': {'status': 'running', 'updated_at': now}, '$inc': {'attempts': 1}},
+            sort=[('created_at', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def heartbeat(self, job):
+        """Renew a claimed job's lease, failing if another worker has claimed it since"""
+        renewed = self.collection.update_one(
+            {'_id': job['_id'], 'attempts': job['attempts']},
+            {'$set': {'updated_at': datetime.utcnow()}}
+        )
+        if not renewed.matched_count:
+            raise LeaseLost(job['_id'])
+
+    def run_job(self, job):
+        target_cls = self.targets[job['target_type']]
+        if target_cls._get_collection().find_one({'_id': job['target_id']}, {'_id': 1}):
+            # Scheduled before a delete that never happened
+            logger.warning("Cascade deletion %s dropped: %s still exists", job['_id'], job['target_type'])
+            self.collection.delete_one({'_id': job['_id'], 'attempts': job['attempts']})
+            return False
+
+        completed = set(job.get('completed_steps', []))
+        try:
+            for path in job.get('files', []):
+                delete_media_file(path)
+            for step, action in build_plan(job['target_type'], job['target_id'], self.batch_size, lambda: self.heartbeat(job)):
+                if step in completed:
+                    continue
+                action()
+                self.heartbeat(job)
+                self.collection.update_one(
+                    {'_id': job['_id'], 'attempts': job['attempts']},
+                    {'$addToSet': {'completed_steps': step}}
+                )
+        except LeaseLost:
+            logger.warning("Cascade deletion %s was claimed by another worker; stopping", job['_id'])
+            return False
+        except Exception as e:
+            logger.exception("Cascade deletion %s failed", job['_id'])
+            self.collection.update_one({'_id': job['_id'], 'attempts': job['attempts']}, {'$set': {'status': 'failed', 'error': str(e)}})
+            return False
+        self.collection.delete_one({'_id': job['_id'], 'attempts': job['attempts']})
+        logger.info("Cascade deletion %s finished", job['_id'])
+        return True
+
+    def run_pending(self):
+        """Run every claimable job on the calling thread; returns (succeeded, failed)"""
+        succeeded = failed = 0
+        while True:
+            job = self.claim()
+            if not job:
+                return succeeded, failed
+            if self.run_job(job):
+                succeeded += 1
+            else:
+                failed += 1
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_cascade_worker():
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = CascadeDeletionWorker(batch_size=getattr(settings, 'CASCADE_DELETE_BATCH_SIZE', 500))
+    return _worker
+
+def start_cascade_worker():
+    """Start the background worker so jobs left by a previous process are resumed"""
+    get_cascade_worker().start()
+
+@contextmanager
+def cascade_deletion(target_type, target_id, files=()):
+    """Delete a post, user or store inside the block; its dependents and files are removed in the background.
+
+    The job is stored before the block runs, so a crash right after the
+    delete still leaves it queued, and is dropped if the block raises.
+    """
+    worker = get_cascade_worker()
+    job_id = worker.schedule(target_type, target_id, files)
+    try:
+        yield
+    except Exception:
+        worker.cancel(job_id)
+        raise
+    worker.release(job_id)
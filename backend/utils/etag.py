@@ -0,0 +1,43 @@
+import hashlib
+import json
+from rest_framework import status
+from rest_framework.response import Response
+
+def make_etag(*parts):
+    """Strong ETag hashed from the version markers a response is built from"""
+    payload = json.dumps(parts, default=str, sort_keys=True, separators=(',', ':'))
+    return '"%s"' % hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def fetch_versions(document_cls, query, fields=('updated_at',), sort=None, limit=0):
+    """Read only the version fields of the matching documents, skipping hydration"""
+    projection = {field: 1 for field in fields}
+    cursor = document_cls._get_collection().find(query, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
+
+def etag_matches(request, etag):
+    """Whether the client's If-None-Match already names this ETag"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag in tags
+
+def conditional_response(request, etag, build_response):
+    """Answer 304 if the client has this ETag, otherwise build the response and tag it"""
+    if etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = build_response()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+    response['ETag'] = etag
+    # Let clients store the response but revalidate it on every use
+    response['Cache-Control'] = 'no-cache'
+    return response
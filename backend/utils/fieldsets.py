@@ -0,0 +1,52 @@
+class InvalidFieldset(ValueError):
+    """Raised when ?fields= names a field the serializer doesn't have"""
+
+class SparseFieldsetMixin:
+    """Serializer mixin that keeps only the fields passed as `fields`.
+
+    Subclasses can set default_fields to the set used when none is passed.
+    """
+
+    default_fields = None
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            fields = self.default_fields
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+def requested_fields(request, allowed):
+    """Parse ?fields=a,b into a set, or None when every field was asked for"""
+    raw = request.GET.get('fields')
+    if not raw:
+        return None
+    fields = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = fields - set(allowed)
+    if unknown:
+        raise InvalidFieldset(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+def select_serializer(request, serializer_class, card_serializer_class):
+    """Pick the serializer and field set for a list request from ?view=card and ?fields="""
+    if request.GET.get('view') == 'card':
+        serializer_class = card_serializer_class
+    fields = requested_fields(request, serializer_class._declared_fields)
+    if fields is None:
+        fields = serializer_class.default_fields
+    return serializer_class, fields
+
+def document_projection(document_cls, fields, always=('id', 'created_at')):
+    """Document fields to load for a field set, for QuerySet.only(); None loads everything"""
+    if fields is None:
+        return None
+    return [name for name in document_cls._fields if name in fields or name in always]
+
+def nested_projection(serializer_class, field_name):
+    """Fields a nested serializer renders, so the referenced documents can be projected"""
+    return list(type(serializer_class._declared_fields[field_name])._declared_fields)
+
+def fieldset_key(serializer_class, fields):
+    """Stable description of a representation, for cache keys and ETags"""
+    return f"{serializer_class.__name__}:{','.join(sorted(fields)) if fields is not None else '*'}"
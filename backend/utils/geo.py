@@ -0,0 +1,223 @@
+import base64
+import csv
+import json
+import math
+import re
+import threading
+from django.conf import settings
+from utils.log import get_logger
+from utils.pagination import InvalidCursor, get_page_size
+
+logger = get_logger(__name__)
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # Cells of roughly 5 x 5 metres
+
+class InvalidLocation(ValueError):
+    """Raised when a nearby search has no usable point or radius"""
+
+def normalize_place(name):
+    return re.sub(r'\s+', ' ', name or '').strip().lower()
+
+class Gazetteer:
+    """Place names mapped to [longitude, latitude], read from a name,latitude,longitude CSV"""
+
+    def __init__(self, path):
+        self.path = path
+        self._places = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        places = {}
+        try:
+            with open(self.path, newline='', encoding='utf-8') as handle:
+                for row in csv.DictReader(handle):
+                    try:
+                        point = [float(row['longitude']), float(row['latitude'])]
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    places.setdefault(normalize_place(row.get('name')), point)
+        except FileNotFoundError:
+            logger.warning("Gazetteer %s not found; locations will not be geocoded", self.path)
+        return places
+
+    @property
+    def places(self):
+        if self._places is None:
+            with self._lock:
+                if self._places is None:
+                    self._places = self._load()
+        return self._places
+
+    def lookup(self, text):
+        """Coordinates for a free-text location: the whole text, else its most specific known part"""
+        name = normalize_place(text)
+        if not name:
+            return None
+        point = self.places.get(name)
+        if point is None:
+            # "Mirpur 10, Dhaka" falls back to "Dhaka" when the area isn't listed
+            point = next((self.places[part.strip()] for part in name.split(',') if part.strip() in self.places), None)
+        return list(point) if point else None
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer():
+    """Return the process-wide gazetteer, loaded from GAZETTEER_PATH on first lookup"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer(settings.GAZETTEER_PATH)
+    return _gazetteer
+
+def geocode(text):
+    """GeoJSON point for a location string, or None when the gazetteer doesn't know it"""
+    coordinates = get_gazetteer().lookup(text)
+    return {'type': 'Point', 'coordinates': coordinates} if coordinates else None
+
+def point_coordinates(point):
+    """[longitude, latitude] of a stored GeoJSON point, or None"""
+    if isinstance(point, dict):
+        point = point.get('coordinates')
+    return list(point) if point else None
+
+def geohash_encode(lng, lat, precision=GEOHASH_PRECISION):
+    """Geohash of a point; each extra character narrows the cell by 5 bits"""
+    lng_range, lat_range = [-180.0, 180.0], [-90.0, 90.0]
+    chars = []
+    value = bits = 0
+    even = True
+    while len(chars) < precision:
+        target, span = (lng, lng_range) if even else (lat, lat_range)
+        mid = (span[0] + span[1]) / 2
+        value <<= 1
+        if target >= mid:
+            value |= 1
+            span[0] = mid
+        else:
+            span[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            value = bits = 0
+    return ''.join(chars)
+
+def geohash_bounds(geohash):
+    """(west, south, east, north) of a geohash cell"""
+    lng_range, lat_range = [-180.0, 180.0], [-90.0, 90.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            span = lng_range if even else lat_range
+            mid = (span[0] + span[1]) / 2
+            if value >> shift & 1:
+                span[0] = mid
+            else:
+                span[1] = mid
+            even = not even
+    return lng_range[0], lat_range[0], lng_range[1], lat_range[1]
+
+def geohash_cell_size(precision):
+    """(width, height) in degrees of geohash cells of a given precision"""
+    lng_bits = (5 * precision + 1) // 2
+    return 360 / 2 ** lng_bits, 180 / 2 ** (5 * precision - lng_bits)
+
+def geohash_cover(west, south, east, north, precision):
+    """Geohash cells of a given precision that intersect a bounding box"""
+    width, height = geohash_cell_size(precision)
+    # Edges that fall exactly on a cell boundary shouldn't pull in the next cell
+    first_col, last_col = math.floor((west + 180) / width), math.ceil((east + 180) / width) - 1
+    first_row, last_row = math.floor((south + 90) / height), math.ceil((north + 90) / height) - 1
+    return sorted({
+        geohash_encode(-180 + (col + 0.5) * width, -90 + (row + 0.5) * height, precision)
+        for col in range(max(first_col, 0), min(last_col, round(360 / width) - 1) + 1)
+        for row in range(max(first_row, 0), min(last_row, round(180 / height) - 1) + 1)
+    })
+
+def update_point(document, text_field, point_field):
+    """Geocode a new or changed text location into its point field before saving"""
+    changed = document._get_changed_fields()
+    if (document._created or text_field in changed) and point_field not in changed:
+        document[point_field] = geocode(document[text_field])
+
+def parse_nearby(request):
+    """Read the search point (?lat=&lng= or ?near=place) and radius (?radius= km) from a request"""
+    lat, lng, near = request.GET.get('lat'), request.GET.get('lng'), request.GET.get('near')
+    if lat is not None and lng is not None:
+        try:
+            point = [float(lng), float(lat)]
+        except ValueError:
+            raise InvalidLocation('lat and lng must be numbers')
+        if not (-180 <= point[0] <= 180 and -90 <= point[1] <= 90):
+            raise InvalidLocation('lat or lng out of range')
+    elif near:
+        point = get_gazetteer().lookup(near)
+        if point is None:
+            raise InvalidLocation(f'Unknown place: {near}')
+    else:
+        raise InvalidLocation('Provide lat and lng, or near')
+
+    try:
+        radius = float(request.GET.get('radius', settings.NEARBY_DEFAULT_RADIUS_KM))
+    except ValueError:
+        raise InvalidLocation('radius must be a number')
+    if radius <= 0:
+        raise InvalidLocation('radius must be positive')
+    return point, min(radius, settings.NEARBY_MAX_RADIUS_KM) * 1000
+
+def encode_distance_cursor(distance, doc_id):
+    """Build an opaque cursor pointing just past the result at this distance and id"""
+    payload = json.dumps([distance, str(doc_id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_distance_cursor(cursor):
+    """Turn a nearby cursor back into its (distance, id) position"""
+    try:
+        distance, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(distance), str(doc_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+def nearby_pipeline(point_field, point, max_distance, query, limit, position=None):
+    """$geoNear pipeline for one page of documents within max_distance metres, nearest first"""
+    geo_near = {
+        'near': {'type': 'Point', 'coordinates': point},
+        'key': point_field,
+        'distanceField': '_distance',
+        'maxDistance': max_distance,
+        'spherical': True,
+        'query': query
+    }
+    pipeline = [{'$geoNear': geo_near}]
+    if position:
+        distance, doc_id = position
+        # minDistance lets the 2dsphere scan start at the previous page's last
+        # result instead of walking out from the centre again
+        geo_near['minDistance'] = distance
+        pipeline.append({'$match': {'$or': [
+            {'_distance': {'$gt': distance}},
+            {'_distance': distance, '_id': {'$gt': doc_id}}
+        ]}})
+    # Geocoded documents often share a place's coordinates, so ties are broken
+    # by _id to give the cursor a stable position; the radius bounds the sort
+    pipeline += [{'$sort': {'_distance': 1, '_id': 1}}, {'$limit': limit + 1}]
+    return pipeline
+
+def nearby_documents(document_cls, point_field, point, max_distance, query, request):
+    """Return one page of (document, distance in metres) pairs and the cursor for the next page"""
+    limit = get_page_size(request)
+    cursor = request.GET.get('cursor')
+    position = decode_distance_cursor(cursor) if cursor else None
+
+    pipeline = nearby_pipeline(point_field, point, max_distance, query, limit, position)
+    rows = list(document_cls._get_collection().aggregate(pipeline))
+    next_cursor = encode_distance_cursor(rows[limit - 1]['_distance'], rows[limit - 1]['_id']) if len(rows) > limit else None
+    results = []
+    for row in rows[:limit]:
+        distance = row.pop('_distance')
+        results.append((document_cls._from_son(row), distance))
+    return results, next_cursor
@@ -1,4 +1,7 @@
+import os
 import uuid
+from bson import DBRef
+from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 
@@ -15,6 +18,22 @@ def save_uploaded_file(uploaded_file, folder_path):
         return saved_path
     return None
 
+def delete_media_file(path):
+    """Remove an uploaded file by the path stored on a document; returns whether a file was removed"""
+    if not path or '://' in path:
+        return False
+    media_root = os.path.realpath(os.path.join(settings.BASE_DIR, 'media'))
+    relative_path = path.removeprefix(settings.MEDIA_URL).lstrip('/')
+    full_path = os.path.realpath(os.path.join(media_root, relative_path))
+    # Never follow a stored path outside the media directory
+    if not full_path.startswith(media_root + os.sep):
+        return False
+    try:
+        os.remove(full_path)
+        return True
+    except FileNotFoundError:
+        return False
+
 def calculate_donation_progress(current_amount, goal_amount):
     if goal_amount and goal_amount > 0:
         return min((current_amount / goal_amount) * 100, 100)
@@ -24,3 +43,27 @@ def is_donation_goal_reached(current_amount, goal_amount):
     if goal_amount and goal_amount > 0:
         return current_amount >= goal_amount
     return False
+
+def reference_id(document, field_name):
+    """Id stored in a reference field, without dereferencing it"""
+    value = document._data.get(field_name)
+    return getattr(value, 'id', value)
+
+def prefetch_references(documents, field_name, document_cls, only=None):
+    """Resolve a reference field on many documents with a single $in lookup"""
+    pending = {}
+    for document in documents:
+        value = document._data.get(field_name)
+        if isinstance(value, DBRef):
+            pending.setdefault(value.id, []).append(document)
+    
+    if pending:
+        queryset = document_cls.objects.only(*only) if only else document_cls.objects
+        resolved = queryset.in_bulk(list(pending.keys()))
+        for ref_id, owners in pending.items():
+            target = resolved.get(ref_id)
+            if target is None:
+                continue
+            for document in owners:
+                document._data[field_name] = target
+    return documents
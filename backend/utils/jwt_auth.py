@@ -1,15 +1,56 @@
 import jwt
 import datetime
+import threading
 from django.conf import settings
 from django.utils import timezone
 from rest_framework import authentication
 from rest_framework import exceptions
 from users.models import User
+from utils.cache import TTLCache
+from utils.log import get_logger
+
+logger = get_logger(__name__)
 
 # JWT Settings
 JWT_SECRET_KEY = getattr(settings, 'JWT_SECRET_KEY', 'your-jwt-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_DELTA = datetime.timedelta(days=1)  # 1 day
+JWT_USER_CACHE_SIZE = getattr(settings, 'JWT_USER_CACHE_SIZE', 1024)
+JWT_USER_CACHE_TTL = getattr(settings, 'JWT_USER_CACHE_TTL', 60)
+
+# Authenticated users keyed by (user_id, token iat); entries hold raw documents
+# so each request gets its own User instance
+_user_cache = TTLCache(maxsize=JWT_USER_CACHE_SIZE, ttl=JWT_USER_CACHE_TTL)
+_user_cache_lock = threading.Lock()
+_user_cache_generation = 0
+
+def get_cached_user(user_id, issued_at=None):
+    """Load a user by id, serving repeat lookups for the same token from memory"""
+    key = (str(user_id), issued_at)
+    son = _user_cache.get(key)
+    if son is not None:
+        return User._from_son(son)
+    
+    generation = _user_cache_generation
+    user = User.objects.get(id=user_id)
+    with _user_cache_lock:
+        # Skip the fill if a user was invalidated while we were reading, so a
+        # stale copy can never outlive a deactivation
+        if generation == _user_cache_generation:
+            _user_cache.set(key, user.to_mongo().to_dict())
+    return user
+
+def invalidate_cached_user(user_id):
+    """Drop every cached entry for a user after it changes or is deleted"""
+    global _user_cache_generation
+    user_id = str(user_id)
+    with _user_cache_lock:
+        _user_cache_generation += 1
+        _user_cache.delete_matching(lambda key: key[0] == user_id)
+
+def get_user_cache_stats():
+    """Hit/miss counters for the authenticated user cache"""
+    return _user_cache.stats()
 
 def generate_jwt_token(user):
     """Generate JWT token for a user"""
@@ -31,7 +72,7 @@ def generate_jwt_token(user):
         token = jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
         return token
     except Exception as e:
-        print(f"Error generating JWT token: {e}")
+        logger.error("Error generating JWT token: %s", e)
         raise
 
 def decode_jwt_token(token):
@@ -44,7 +85,7 @@ def decode_jwt_token(token):
     except jwt.InvalidTokenError:
         raise exceptions.AuthenticationFailed('Invalid token')
     except Exception as e:
-        print(f"Error decoding JWT token: {e}")
+        logger.warning("Error decoding JWT token: %s", e)
         raise exceptions.AuthenticationFailed('Invalid token')
 
 class JWTAuthentication(authentication.BaseAuthentication):
@@ -68,9 +109,9 @@ class JWTAuthentication(authentication.BaseAuthentication):
                 if not user_id:
                     raise exceptions.AuthenticationFailed('Invalid token payload')
                 
-                # Get user from database
+                # Get user from cache or database
                 try:
-                    user = User.objects.get(id=user_id)
+                    user = get_cached_user(user_id, payload.get('iat'))
                     if not user.is_active:
                         raise exceptions.AuthenticationFailed('User is inactive')
                     return (user, token)
@@ -84,7 +125,7 @@ class JWTAuthentication(authentication.BaseAuthentication):
             except Exception as e:
                 raise exceptions.AuthenticationFailed(f'Authentication failed: {str(e)}')
         except Exception as e:
-            print(f"Error in JWT authentication: {e}")
+            logger.info("JWT authentication failed: %s", e)
             return None
     
     def authenticate_header(self, request):
@@ -94,33 +135,29 @@ def get_user_from_token(request):
     """Helper function to get user from token without using DRF authentication"""
     try:
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        print(f"Auth header: {auth_header}")
         
         if not auth_header.startswith('Bearer '):
-            print("No Bearer token found")
+            logger.debug("No Bearer token found")
             return None
         
         token = auth_header.split(' ')[1]
-        print(f"Token: {token[:20]}...")
         
         try:
             payload = decode_jwt_token(token)
             user_id = payload.get('user_id')
-            print(f"User ID from token: {user_id}")
             
             if not user_id:
-                print("No user_id in token payload")
+                logger.debug("No user_id in token payload")
                 return None
             
-            user = User.objects.get(id=user_id)
-            print(f"User found: {user.username}")
+            user = get_cached_user(user_id, payload.get('iat'))
             if not user.is_active:
-                print("User is inactive")
+                logger.debug("Rejected token for inactive user %s", user_id)
                 return None
             return user
         except Exception as e:
-            print(f"Error processing token: {e}")
+            logger.debug("Error processing token: %s", e)
             return None
     except Exception as e:
-        print(f"Error getting user from token: {e}")
+        logger.warning("Error getting user from token: %s", e)
         return None
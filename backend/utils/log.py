@@ -0,0 +1,63 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+
+LOGGER_NAMESPACE = 'pet_adoption'
+
+# Attributes every LogRecord carries; anything else on a record came from `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+def get_logger(name):
+    """Return a logger under the backend namespace, e.g. get_logger(__name__)"""
+    return logging.getLogger(f"{LOGGER_NAMESPACE}.{name}")
+
+class StructuredFormatter(logging.Formatter):
+    """Render records as one JSON object per line, including `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class QueueStreamHandler(logging.handlers.QueueHandler):
+    """Enqueue records and write them to a stream from a background thread.
+
+    Request threads only pay for building the record; formatting and the
+    blocking write happen on the listener thread.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream)
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def setFormatter(self, fmt):
+        # Formatting is done by the target handler on the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Resolve the message now so later mutation of the args can't change it,
+        # but leave the structured rendering to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
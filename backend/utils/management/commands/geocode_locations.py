@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from items.models import Item, VolunteerDonation
+from posts.models import Post
+from utils.geo import geocode, geohash_encode
+
+# (document class, text field, point field, geohash field) for every geocoded location
+GEOCODED_FIELDS = [
+    (Post, 'location', 'location_point', 'location_geohash'),
+    (Item, 'location', 'location_point', None),
+    (VolunteerDonation, 'pickup_location', 'pickup_point', None),
+]
+
+class Command(BaseCommand):
+    help = 'Geocode stored post, item and pickup locations from the gazetteer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of documents read and written per batch')
+        parser.add_argument('--refresh', action='store_true', help='Re-geocode documents that already have a point, e.g. after updating the gazetteer')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for document_cls, text_field, point_field, geohash_field in GEOCODED_FIELDS:
+            collection = document_cls._get_collection()
+            query = {text_field: {'$nin': [None, '']}}
+            if not options['refresh']:
+                query[point_field] = None
+            located = unresolved = 0
+            last_id = None
+
+            # Walk the collection by _id so unresolvable locations are read once
+            while True:
+                batch_query = dict(query, _id={'$gt': last_id}) if last_id is not None else query
+                batch = list(collection.find(batch_query, {text_field: 1}).sort('_id', 1).limit(batch_size))
+                if not batch:
+                    break
+                last_id = batch[-1]['_id']
+                operations = []
+                for document in batch:
+                    point = geocode(document[text_field])
+                    if point:
+                        located += 1
+                        update = {point_field: point}
+                        if geohash_field:
+                            update[geohash_field] = geohash_encode(*point['coordinates'])
+                        operations.append(UpdateOne({'_id': document['_id']}, {'$set': update}))
+                    else:
+                        unresolved += 1
+                        if options['refresh']:
+                            cleared = {field: '' for field in (point_field, geohash_field) if field}
+                            operations.append(UpdateOne({'_id': document['_id']}, {'$unset': cleared}))
+                if operations:
+                    collection.bulk_write(operations, ordered=False)
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'{document_cls.__name__}: geocoded {located} locations, '
+                    f'{unresolved} not found in the gazetteer.'
+                )
+            )
+
+        from posts.services.feed_service import invalidate_post_feed
+        from posts.services.map_service import invalidate_post_map
+        invalidate_post_feed()
+        invalidate_post_map()
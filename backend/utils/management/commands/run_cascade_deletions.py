@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from utils.cascade import CascadeDeletion, get_cascade_worker
+
+class Command(BaseCommand):
+    help = 'Run queued or interrupted cascade deletions for deleted posts, users and stores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='Requeue jobs that failed on an earlier run')
+
+    def handle(self, *args, **options):
+        collection = CascadeDeletion._get_collection()
+        if options['retry_failed']:
+            requeued = collection.update_many({'status': 'failed'}, {'$set': {'status': 'pending'}, '$unset': {'error': ''}}).modified_count
+            self.stdout.write(f'Requeued {requeued} failed jobs')
+
+        succeeded, failed = get_cascade_worker().run_pending()
+        remaining = collection.count_documents({})
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Finished {succeeded} cascade deletions ({failed} failed). '
+                f'{remaining} jobs remain queued, running or failed.'
+            )
+        )
@@ -0,0 +1,49 @@
+import base64
+import json
+from datetime import datetime
+from django.conf import settings
+from mongoengine import Q
+
+DEFAULT_PAGE_SIZE = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+MAX_PAGE_SIZE = 100
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+def encode_cursor(document):
+    """Build an opaque cursor pointing just past the given document"""
+    payload = json.dumps([document.created_at.isoformat(), str(document.id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor):
+    """Turn an opaque cursor back into its (created_at, id) position"""
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), str(doc_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    """Read the requested page size from ?limit=, clamped to MAX_PAGE_SIZE"""
+    try:
+        limit = int(request.GET.get('limit', default))
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def paginate_queryset(queryset, request, default_limit=DEFAULT_PAGE_SIZE):
+    """Return one newest-first page of documents and the cursor for the next page.
+
+    Pages are keyed on (created_at, id) so every page is a bounded index range
+    scan instead of a skip, which keeps deep pages as cheap as the first one.
+    """
+    limit = get_page_size(request, default_limit)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=doc_id))
+
+    # Fetch one extra document to know whether another page exists
+    documents = list(queryset.order_by('-created_at', '-id').limit(limit + 1))
+    next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+    return documents[:limit], next_cursor
@@ -0,0 +1,171 @@
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from utils.cache import TTLCache
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
+class LocalCacheBackend:
+    """Per-process storage for cached responses"""
+
+    # Stands in for "no expiry" (a None timeout), matching Django's cache API
+    forever = 365 * 24 * 3600
+
+    def __init__(self, maxsize=1024):
+        self._store = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._store.get(key)
+
+    def get_many(self, keys):
+        found = {}
+        for key in keys:
+            value = self._store.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key, value, timeout):
+        self._store.set(key, value, ttl=self.forever if timeout is None else timeout)
+
+    def add(self, key, value, timeout):
+        """Store value only if key is absent; returns whether it was stored"""
+        with self._lock:
+            if self._store.get(key) is not None:
+                return False
+            self.set(key, value, timeout)
+            return True
+
+    def delete(self, key):
+        self._store.delete(key)
+
+class SharedCacheBackend:
+    """Storage shared by every worker through a Django cache alias.
+
+    Point RESPONSE_CACHE_ALIAS at a Redis or Memcached cache in production;
+    Django's default local-memory cache stands in for it during development.
+    """
+
+    def __init__(self, maxsize=None):
+        self._cache = caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def get_many(self, keys):
+        return self._cache.get_many(keys)
+
+    def set(self, key, value, timeout):
+        self._cache.set(key, value, timeout)
+
+    def add(self, key, value, timeout):
+        return self._cache.add(key, value, timeout)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+class ResponseCache:
+    """Caches built responses under tags, with one rebuild at a time per key.
+
+    Every tag has a random version token and each entry remembers the tokens
+    it was built under; invalidating a tag replaces its token, which retires
+    every entry carrying it. A token that was evicted also counts as changed,
+    so losing tag state can only cause a rebuild, never a stale hit.
+    """
+
+    key_prefix = 'response'
+    wait_interval = 0.05
+
+    def __init__(self, backend, ttl=60, stale_ttl=30, lock_timeout=5):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lock_timeout = lock_timeout
+
+    def _tag_key(self, tag):
+        return f'{self.key_prefix}:tag:{tag}'
+
+    def _tag_versions(self, tags, create=False):
+        keys = [self._tag_key(tag) for tag in tags]
+        versions = self.backend.get_many(keys)
+        if create:
+            for key in keys:
+                if key not in versions:
+                    version = uuid.uuid4().hex
+                    # Tags outlive entries so invalidation always reaches them
+                    if not self.backend.add(key, version, None):
+                        version = self.backend.get(key) or version
+                    versions[key] = version
+        return versions
+
+    def _usable(self, entry, tags):
+        """Return (value, fresh) for an entry whose tags are current, else (None, False)"""
+        if entry is None or entry['tags'] != self._tag_versions(tags):
+            return None, False
+        return entry['value'], entry['fresh_until'] > time.time()
+
+    def get_or_build(self, key, tags, build):
+        """Return the cached value for key, calling build() to fill it when needed.
+
+        Only the worker holding the key's rebuild lock calls build(). The others
+        serve the expired value while it is within stale_ttl, or wait briefly for
+        the rebuild and fall back to building it themselves if it doesn't arrive.
+        """
+        entry_key = f'{self.key_prefix}:entry:{key}'
+        lock_key = f'{self.key_prefix}:lock:{key}'
+
+        value, fresh = self._usable(self.backend.get(entry_key), tags)
+        if fresh:
+            return value
+
+        if not self.backend.add(lock_key, 1, self.lock_timeout):
+            if value is not None:
+                return value
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.wait_interval)
+                value, fresh = self._usable(self.backend.get(entry_key), tags)
+                if value is not None:
+                    return value
+            logger.warning("Timed out waiting for cache rebuild of %s", key)
+            return build()
+
+        try:
+            # Read the tag versions before building so a write that lands
+            # mid-build retires the entry instead of being masked by it
+            versions = self._tag_versions(tags, create=True)
+            value = build()
+            self.backend.set(entry_key, {
+                'value': value,
+                'tags': versions,
+                'fresh_until': time.time() + self.ttl
+            }, self.ttl + self.stale_ttl)
+            return value
+        finally:
+            self.backend.delete(lock_key)
+
+    def invalidate_tags(self, *tags):
+        for tag in tags:
+            self.backend.set(self._tag_key(tag), uuid.uuid4().hex, None)
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Return the process-wide response cache, built from RESPONSE_CACHE_BACKEND on first use"""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                backend_class = import_string(getattr(settings, 'RESPONSE_CACHE_BACKEND', 'utils.response_cache.LocalCacheBackend'))
+                _response_cache = ResponseCache(
+                    backend_class(maxsize=getattr(settings, 'RESPONSE_CACHE_SIZE', 1024)),
+                    ttl=getattr(settings, 'RESPONSE_CACHE_TTL', 60),
+                    stale_ttl=getattr(settings, 'RESPONSE_CACHE_STALE_TTL', 30)
+                )
+    return _response_cache
@@ -0,0 +1,134 @@
+import threading
+from contextlib import contextmanager
+from unittest import mock
+import mongoengine
+import mongomock
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+
+# Collection methods that each cost a round trip to the server
+QUERY_METHODS = ('find', 'find_one', 'aggregate', 'count_documents', 'distinct')
+# mongomock's internals for single-document writes; on a server each one is atomic
+WRITE_METHODS = ('_find_and_modify', '_update', '_insert', 'delete_one', 'delete_many')
+
+class RunningThread:
+    """Stands in for a background worker's thread so the worker never starts one"""
+
+    def is_alive(self):
+        return True
+
+class MongoTestCase(SimpleTestCase):
+    """Runs each test against a fresh in-memory mongomock database.
+
+    Process-wide caches are emptied between tests, and the background
+    workers (similar posts, badge queue, cascade deletions) only queue work;
+    tests run it on their own thread with the workers' process_pending or
+    run_pending.
+    """
+
+    def setUp(self):
+        super().setUp()
+        mongoengine.disconnect(alias='default')
+        mongoengine.connect('test_pet_adoption', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient, alias='default')
+        self.addCleanup(mongoengine.disconnect, alias='default')
+        self.factory = APIRequestFactory()
+        reset_process_state()
+        atomic_writes(self)
+
+    def make_user(self, username='alice', **fields):
+        from users.models import User
+        fields.setdefault('email', f'{username}@example.com')
+        fields.setdefault('password', 'secret')
+        user = User(username=username, **fields)
+        user.save()
+        return user
+
+    def auth(self, user):
+        """Request headers carrying a fresh token for user"""
+        from utils.jwt_auth import generate_jwt_token
+        return {'HTTP_AUTHORIZATION': f'Bearer {generate_jwt_token(user)}'}
+
+def reset_process_state():
+    from badges.services import badge_engine, badge_queue
+    from posts.services import facet_service, ranking_service, similarity_service
+    from utils import cascade, jwt_auth, response_cache
+
+    jwt_auth._user_cache.clear()
+    response_cache._response_cache = None
+    badge_engine.invalidate_badge_catalog()
+    facet_service._facet_cache.clear()
+    ranking_service._preference_cache.clear()
+    ranking_service._candidate_budget = ranking_service.CandidateBudget()
+
+    badge_queue._queue = badge_queue.BadgeEvaluationQueue(badge_queue.LocalQueueBackend(), workers=0)
+    similarity_service._refresher = similarity_service.SimilarityRefresher()
+    similarity_service._refresher._thread = RunningThread()
+    cascade._worker = cascade.CascadeDeletionWorker(batch_size=2)
+    cascade._worker._thread = RunningThread()
+
+def atomic_writes(test):
+    """Serialize mongomock's writes for the rest of a test.
+
+    mongomock runs find_one_and_update as a find followed by an update of that
+    _id, so two threads can both "win" a conditional update the server would
+    apply to only one of them.
+    """
+    lock = threading.RLock()
+    for name in WRITE_METHODS:
+        original = getattr(mongomock.collection.Collection, name)
+
+        def locked(self, *args, _original=original, **kwargs):
+            with lock:
+                return _original(self, *args, **kwargs)
+        patch = mock.patch.object(mongomock.collection.Collection, name, locked)
+        patch.start()
+        test.addCleanup(patch.stop)
+
+@contextmanager
+def count_queries():
+    """Count collection reads made inside the block; yields a dict whose 'count' is filled in as they happen"""
+    counter = {'count': 0}
+    # mongomock implements some of these on top of the others (distinct calls
+    # find); only the outermost call is a round trip
+    nesting = threading.local()
+    patches = []
+    for name in QUERY_METHODS:
+        original = getattr(mongomock.collection.Collection, name)
+
+        def counted(self, *args, _original=original, **kwargs):
+            depth = getattr(nesting, 'depth', 0)
+            if not depth:
+                counter['count'] += 1
+            nesting.depth = depth + 1
+            try:
+                return _original(self, *args, **kwargs)
+            finally:
+                nesting.depth = depth
+        patches.append(mock.patch.object(mongomock.collection.Collection, name, counted))
+    for patch in patches:
+        patch.start()
+    try:
+        yield counter
+    finally:
+        for patch in patches:
+            patch.stop()
+
+def run_in_threads(*functions):
+    """Call each function on its own thread, all released at once, and re-raise the first error"""
+    barrier = threading.Barrier(len(functions))
+    errors = []
+
+    def run(function):
+        barrier.wait()
+        try:
+            function()
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(function,)) for function in functions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
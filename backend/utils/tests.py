@@ -0,0 +1,124 @@
+import atexit
+import io
+import json
+import logging
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase
+from utils.geo import (
+    Gazetteer, InvalidLocation, decode_distance_cursor, encode_distance_cursor, geohash_bounds,
+    geohash_cover, geohash_encode, nearby_pipeline, parse_nearby
+)
+from utils.log import QueueStreamHandler, StructuredFormatter, get_logger
+from utils.pagination import InvalidCursor
+from utils.benchmark import best_time
+
+class Unformattable:
+    """Log argument that fails the test if it is ever rendered"""
+
+    def __str__(self):
+        raise AssertionError('disabled log call formatted its arguments')
+
+class LoggingOverheadTests(SimpleTestCase):
+    def setUp(self):
+        self.logger = get_logger('tests.overhead')
+        self.logger.setLevel(logging.WARNING)
+        self.addCleanup(self.logger.setLevel, logging.NOTSET)
+
+    def test_disabled_calls_do_not_format_their_arguments(self):
+        self.logger.debug("token %s", Unformattable())
+        self.logger.info("user %s", Unformattable())
+
+    def test_disabled_call_overhead_per_request(self):
+        # A request logs a handful of debug/info lines; with those levels off
+        # each call is a level check, well under a microsecond on a warm loop
+        per_call = best_time(lambda: self.logger.debug("Rejected token for inactive user %s", 'user-id'), repeat=5, number=10000)
+        self.assertLess(per_call, 5e-6, f'{per_call * 1e9:.0f} ns per disabled call')
+
+class QueueStreamHandlerTests(SimpleTestCase):
+    def test_records_are_written_as_json_from_the_listener_thread(self):
+        stream = io.StringIO()
+        handler = QueueStreamHandler(stream)
+        handler.setFormatter(StructuredFormatter())
+        logger = logging.getLogger('pet_adoption.tests.handler')
+        logger.addHandler(handler)
+        logger.propagate = False
+        self.addCleanup(logger.removeHandler, handler)
+
+        logger.warning("Post %s over budget", 'p1', extra={'elapsed_ms': 12.5})
+        # Stopping the listener drains the queue; the handler's own atexit stop is then redundant
+        handler.listener.stop()
+        atexit.unregister(handler.listener.stop)
+
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry['level'], 'WARNING')
+        self.assertEqual(entry['message'], 'Post p1 over budget')
+        self.assertEqual(entry['elapsed_ms'], 12.5)
+
+class GeohashTests(SimpleTestCase):
+    def test_encode_matches_the_reference_geohash(self):
+        self.assertEqual(geohash_encode(-5.6, 42.6, precision=5), 'ezs42')
+        self.assertEqual(len(geohash_encode(90.4125, 23.8103)), 9)
+
+    def test_cell_bounds_contain_the_encoded_point(self):
+        for lng, lat in ((90.4125, 23.8103), (-122.42, 37.77), (0, 0), (179.99, -89.99)):
+            west, south, east, north = geohash_bounds(geohash_encode(lng, lat, precision=6))
+            self.assertTrue(west <= lng <= east and south <= lat <= north, (lng, lat))
+
+    def test_cover_returns_every_cell_the_box_touches(self):
+        west, south, east, north = geohash_bounds('wh0r')
+        self.assertEqual(geohash_cover(west, south, east, north, 4), ['wh0r'])
+        # Nudging the east edge into the neighbouring cell pulls that cell in too
+        self.assertEqual(len(geohash_cover(west, south, east + 1e-6, north, 4)), 2)
+        self.assertEqual(len(geohash_cover(west, south, east, north, 5)), 32)
+
+class GazetteerTests(SimpleTestCase):
+    def test_lookup_normalizes_and_falls_back_to_a_known_part(self):
+        gazetteer = Gazetteer(settings.GAZETTEER_PATH)
+        self.assertEqual(gazetteer.lookup('  DHAKA '), [90.4125, 23.8103])
+        self.assertEqual(gazetteer.lookup('Mirpur 10, Dhaka'), [90.4125, 23.8103])
+        self.assertIsNone(gazetteer.lookup('Atlantis'))
+        self.assertIsNone(gazetteer.lookup(''))
+
+    def test_missing_file_geocodes_nothing(self):
+        with self.assertLogs('pet_adoption.utils.geo', 'WARNING'):
+            self.assertIsNone(Gazetteer('/nonexistent/gazetteer.csv').lookup('Dhaka'))
+
+class ParseNearbyTests(SimpleTestCase):
+    def parse(self, **params):
+        return parse_nearby(RequestFactory().get('/nearby/', params))
+
+    def test_point_from_coordinates_or_place_name(self):
+        self.assertEqual(self.parse(lat='23.5', lng='90.25', radius='10'), ([90.25, 23.5], 10000))
+        self.assertEqual(self.parse(near='Khulna'), ([89.5403, 22.8456], settings.NEARBY_DEFAULT_RADIUS_KM * 1000))
+
+    def test_radius_is_capped(self):
+        _, max_distance = self.parse(near='Dhaka', radius='100000')
+        self.assertEqual(max_distance, settings.NEARBY_MAX_RADIUS_KM * 1000)
+
+    def test_unusable_input_is_rejected(self):
+        for params in ({}, {'lat': '23.5'}, {'lat': 'north', 'lng': '90'}, {'lat': '95', 'lng': '90'},
+                       {'near': 'Atlantis'}, {'near': 'Dhaka', 'radius': 'far'}, {'near': 'Dhaka', 'radius': '0'}):
+            with self.assertRaises(InvalidLocation, msg=params):
+                self.parse(**params)
+
+class NearbyPipelineTests(SimpleTestCase):
+    def test_first_page_walks_out_from_the_point(self):
+        pipeline = nearby_pipeline('location_point', [90.4, 23.8], 5000, {'status': 'active'}, 10)
+        geo_near = pipeline[0]['$geoNear']
+        self.assertEqual(geo_near['maxDistance'], 5000)
+        self.assertEqual(geo_near['query'], {'status': 'active'})
+        self.assertNotIn('minDistance', geo_near)
+        self.assertEqual(pipeline[1:], [{'$sort': {'_distance': 1, '_id': 1}}, {'$limit': 11}])
+
+    def test_later_pages_start_at_the_previous_position(self):
+        pipeline = nearby_pipeline('location_point', [90.4, 23.8], 5000, {}, 10, position=(1200.5, 'abc'))
+        self.assertEqual(pipeline[0]['$geoNear']['minDistance'], 1200.5)
+        self.assertEqual(pipeline[1], {'$match': {'$or': [
+            {'_distance': {'$gt': 1200.5}},
+            {'_distance': 1200.5, '_id': {'$gt': 'abc'}}
+        ]}})
+
+    def test_distance_cursor_round_trips(self):
+        self.assertEqual(decode_distance_cursor(encode_distance_cursor(1200.5, 'abc')), (1200.5, 'abc'))
+        with self.assertRaises(InvalidCursor):
+            decode_distance_cursor('not-a-cursor')